@@ -0,0 +1,162 @@
+"""
+Benchmark de carga: views síncronas sob WSGI x views assíncronas sob ASGI
+
+Suba os dois servidores (com o mesmo banco) e rode, por exemplo:
+
+    gunicorn classroom_project.wsgi -w 4 --threads 8 -b 127.0.0.1:8000
+    uvicorn classroom_project.asgi:application --workers 4 --port 8001
+
+    python benchmark_async.py -c 500 -n 20000 \\
+        wsgi=http://127.0.0.1:8000/api/minhas-turmas/ \\
+        asgi=http://127.0.0.1:8001/api/async/minhas-turmas/
+
+Cada alvo é medido com ``-c`` conexões HTTP/1.1 keep-alive simultâneas
+(apenas biblioteca padrão). ``--atraso`` simula clientes lentos: cada
+conexão espera esse tempo entre enviar os cabeçalhos e o fim da
+requisição, segurando o worker do servidor.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+
+def obter_token(url, username, password):
+    partes = urlsplit(url)
+    requisicao = urllib.request.Request(
+        f'{partes.scheme}://{partes.netloc}/api/token/',
+        data=json.dumps({'username': username, 'password': password}).encode(),
+        headers={'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(requisicao) as resposta:
+        return json.load(resposta)['access']
+
+
+async def ler_resposta(reader):
+    status = int((await reader.readline()).split()[1])
+    cabecalhos = {}
+    while True:
+        linha = await reader.readline()
+        if linha in (b'\r\n', b''):
+            break
+        nome, _, valor = linha.decode('latin-1').partition(':')
+        cabecalhos[nome.strip().lower()] = valor.strip()
+
+    if 'content-length' in cabecalhos:
+        await reader.readexactly(int(cabecalhos['content-length']))
+    elif cabecalhos.get('transfer-encoding') == 'chunked':
+        while True:
+            tamanho = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(tamanho + 2)
+            if tamanho == 0:
+                break
+    return status, cabecalhos.get('connection') == 'close'
+
+
+async def conexao(url, token, restantes, latencias, erros, atraso):
+    partes = urlsplit(url)
+    caminho = partes.path + (f'?{partes.query}' if partes.query else '')
+    inicio_requisicao = (
+        f'GET {caminho} HTTP/1.1\r\n'
+        f'Host: {partes.netloc}\r\n'
+        f'Authorization: Bearer {token}\r\n'
+    ).encode()
+    fim_requisicao = b'Accept: application/json\r\n\r\n'
+
+    reader = writer = None
+    while restantes[0] > 0:
+        restantes[0] -= 1
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(
+                    partes.hostname, partes.port or 80
+                )
+            inicio = time.perf_counter()
+            writer.write(inicio_requisicao)
+            if atraso:
+                await writer.drain()
+                await asyncio.sleep(atraso)
+            writer.write(fim_requisicao)
+            await writer.drain()
+            status, fechar = await ler_resposta(reader)
+            latencias.append(time.perf_counter() - inicio)
+            if status != 200:
+                erros[status] = erros.get(status, 0) + 1
+            if fechar:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, ValueError) as exc:
+            erros[type(exc).__name__] = erros.get(type(exc).__name__, 0) + 1
+            if writer is not None:
+                writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def medir(url, token, conexoes, total, atraso):
+    restantes = [total]
+    latencias = []
+    erros = {}
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        conexao(url, token, restantes, latencias, erros, atraso)
+        for _ in range(conexoes)
+    ))
+    duracao = time.perf_counter() - inicio
+    return duracao, sorted(latencias), erros
+
+
+def percentil(valores, p):
+    if not valores:
+        return float('nan')
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        'alvos', nargs='+', metavar='nome=url',
+        help='Endpoints a medir (ex.: asgi=http://127.0.0.1:8001/api/...)'
+    )
+    parser.add_argument('-c', '--conexoes', type=int, default=500)
+    parser.add_argument('-n', '--requisicoes', type=int, default=10000)
+    parser.add_argument(
+        '--atraso', type=float, default=0,
+        help='Segundos de "cliente lento" por requisição'
+    )
+    parser.add_argument('--username', default='joao')
+    parser.add_argument('--password', default='senha123')
+    args = parser.parse_args()
+
+    alvos = [alvo.split('=', 1) for alvo in args.alvos]
+    token = obter_token(alvos[0][1], args.username, args.password)
+
+    print(
+        f'{args.conexoes} conexões, {args.requisicoes} requisições'
+        f'{f", atraso {args.atraso}s" if args.atraso else ""}\n'
+    )
+    print(
+        f'{"alvo":<10}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}'
+        f'{"p99 ms":>10}{"média ms":>10}  erros'
+    )
+    for nome, url in alvos:
+        duracao, latencias, erros = asyncio.run(
+            medir(url, token, args.conexoes, args.requisicoes, args.atraso)
+        )
+        media = statistics.fmean(latencias) if latencias else float('nan')
+        print(
+            f'{nome:<10}{len(latencias) / duracao:>10.1f}'
+            f'{percentil(latencias, 50) * 1000:>10.1f}'
+            f'{percentil(latencias, 95) * 1000:>10.1f}'
+            f'{percentil(latencias, 99) * 1000:>10.1f}'
+            f'{media * 1000:>10.1f}  {erros or "-"}'
+        )
+
+
+if __name__ == '__main__':
+    main()
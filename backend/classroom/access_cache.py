@@ -0,0 +1,132 @@
+"""
+Cache das decisões de acesso ao download de recursos.
+
+Cada decisão é guardada por (usuário, recurso) no cache do Django
+(``settings.RECURSO_ACESSO_CACHE_ALIAS``) por
+``RECURSO_ACESSO_CACHE_TIMEOUT`` segundos (padrão: 5). Com LocMemCache o
+cache, inclusive os contadores de geração abaixo, é por processo: a
+invalidação só vale no worker que gravou a alteração e os demais podem
+liberar um acesso já revogado até a decisão expirar, por isso o prazo
+padrão é curto. Com um backend compartilhado (Redis, Memcached) a
+invalidação é imediata em todos os workers e o prazo pode ser maior.
+
+A invalidação não varre chaves: cada turma e cada recurso têm um contador
+de geração, incrementado pelos signals em ``signals.py`` quando uma
+matrícula, turma ou recurso muda. Uma decisão só é válida se as gerações
+gravadas com ela ainda forem as atuais. Decisões que dependem da data de
+início da turma expiram sozinhas quando a turma começa.
+
+Atualizações em massa (``QuerySet.update``/``bulk_create``) não disparam
+signals e devem chamar ``invalidar_turma``/``invalidar_recurso``.
+"""
+
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Recurso
+from .visibility import MOTIVO_ANTES_INICIO
+
+
+# Metadados do arquivo usados no download (ETag, tamanho e tipo)
+CAMPOS_ARQUIVO = (
+    'arquivo_processado', 'arquivo_tamanho', 'arquivo_sha256', 'arquivo_mime'
+)
+
+
+def get_cache():
+    return caches[getattr(settings, 'RECURSO_ACESSO_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'RECURSO_ACESSO_CACHE_TIMEOUT', 5)
+
+
+def chave_decisao(user_id, recurso_id):
+    return f'acesso:decisao:{user_id}:{recurso_id}'
+
+
+def chave_turma(turma_id):
+    return f'acesso:geracao:turma:{turma_id}'
+
+
+def chave_recurso(recurso_id):
+    return f'acesso:geracao:recurso:{recurso_id}'
+
+
+def geracoes(turma_id, recurso_id):
+    """
+    Gerações atuais da turma e do recurso. Contadores ausentes (nunca
+    criados ou removidos do cache) recebem um valor novo, o que invalida
+    qualquer decisão antiga.
+    """
+    cache = get_cache()
+    chaves = [chave_turma(turma_id), chave_recurso(recurso_id)]
+    valores = cache.get_many(chaves)
+    for chave in chaves:
+        if chave not in valores:
+            cache.add(chave, time.time_ns(), timeout=None)
+            valores[chave] = cache.get(chave)
+    return valores[chaves[0]], valores[chaves[1]]
+
+
+def incrementar(chave):
+    cache = get_cache()
+    try:
+        cache.incr(chave)
+    except ValueError:
+        cache.set(chave, time.time_ns(), timeout=None)
+
+
+def invalidar_turma(turma_id):
+    incrementar(chave_turma(turma_id))
+
+
+def invalidar_recurso(recurso_id):
+    incrementar(chave_recurso(recurso_id))
+
+
+def obter(user_id, recurso_id):
+    """Retorna a decisão em cache ainda válida, ou None"""
+    decisao = get_cache().get(chave_decisao(user_id, recurso_id))
+    if decisao is None:
+        return None
+    if decisao['valido_ate'] and date.today() >= decisao['valido_ate']:
+        return None
+    if geracoes(decisao['turma_id'], recurso_id) != decisao['geracoes']:
+        return None
+    return decisao
+
+
+def registrar(user_id, recurso, motivo):
+    """Guarda a decisão tomada para o recurso (já com a turma carregada)"""
+    decisao = {
+        'motivo': motivo,
+        'turma_id': recurso.turma_id,
+        'geracoes': geracoes(recurso.turma_id, recurso.id),
+        # Bloqueio por data deixa de valer no início da turma
+        'valido_ate': (
+            recurso.turma.data_inicio if motivo == MOTIVO_ANTES_INICIO
+            else None
+        ),
+        'arquivo': recurso.arquivo.name or None,
+        'atualizado_em': recurso.atualizado_em,
+        **{campo: getattr(recurso, campo) for campo in CAMPOS_ARQUIVO},
+    }
+    get_cache().set(
+        chave_decisao(user_id, recurso.id), decisao, timeout=get_timeout()
+    )
+    return decisao
+
+
+def recurso_da_decisao(recurso_id, decisao):
+    """Recurso mínimo para servir o arquivo sem consultar o banco"""
+    return Recurso(
+        id=recurso_id,
+        turma_id=decisao['turma_id'],
+        arquivo=decisao['arquivo'],
+        atualizado_em=decisao['atualizado_em'],
+        **{campo: decisao.get(campo) for campo in CAMPOS_ARQUIVO},
+    )
@@ -1,5 +1,19 @@
 from django.contrib import admin
-from .models import Treinamento, Turma, Recurso, Aluno, Matricula
+from .models import (
+    Treinamento, Turma, Recurso, Aluno, Matricula, ProcessamentoArquivo
+)
+from .visibility import total_alunos_ativos
+
+
+class TurmaListFilter(admin.RelatedFieldListFilter):
+    """Filtro por turma: o nome do treinamento (__str__) vem no JOIN"""
+
+    def field_choices(self, field, request, model_admin):
+        ordering = self.field_admin_ordering(field, request, model_admin)
+        turmas = Turma.objects.select_related('treinamento')
+        if ordering:
+            turmas = turmas.order_by(*ordering)
+        return [(turma.pk, str(turma)) for turma in turmas]
 
 
 @admin.register(Treinamento)
@@ -15,6 +29,13 @@ class RecursoInline(admin.TabularInline):
     extra = 1
     fields = ['nome_recurso', 'tipo_recurso', 'acesso_previo', 'draft', 'ordem']
 
+    def get_queryset(self, request):
+        # Só as colunas editadas no inline (sem descrição nem arquivo);
+        # atualizado_em entra para o auto_now ser gravado no save()
+        return super().get_queryset(request).only(
+            'turma', 'atualizado_em', *self.fields
+        )
+
 
 @admin.register(Turma)
 class TurmaAdmin(admin.ModelAdmin):
@@ -23,40 +44,79 @@ class TurmaAdmin(admin.ModelAdmin):
     list_filter = ['treinamento', 'data_inicio']
     date_hierarchy = 'data_inicio'
     inlines = [RecursoInline]
-    
+
+    def get_queryset(self, request):
+        # Total anotado por subquery (mesmo da API), sem COUNT por linha;
+        # o treinamento (usado no __str__) vem no JOIN
+        return super().get_queryset(request).select_related(
+            'treinamento'
+        ).annotate(total_matriculas_ativas=total_alunos_ativos())
+
     def total_matriculas(self, obj):
-        return obj.matriculas.filter(ativo=True).count()
+        return obj.total_matriculas_ativas
     total_matriculas.short_description = 'Alunos Matriculados'
+    total_matriculas.admin_order_field = 'total_matriculas_ativas'
 
 
 @admin.register(Recurso)
 class RecursoAdmin(admin.ModelAdmin):
     list_display = ['nome_recurso', 'turma', 'tipo_recurso', 'acesso_previo', 'draft', 'ordem']
+    list_select_related = ['turma__treinamento']
     search_fields = ['nome_recurso', 'descricao_recurso']
-    list_filter = ['tipo_recurso', 'acesso_previo', 'draft', 'turma']
+    list_filter = ['tipo_recurso', 'acesso_previo', 'draft', ('turma', TurmaListFilter)]
     list_editable = ['ordem', 'acesso_previo', 'draft']
+    autocomplete_fields = ['turma']
+    # Preenchidos pelo pós-processamento do arquivo (ver processing.py)
+    readonly_fields = [
+        'arquivo_tamanho', 'arquivo_mime', 'arquivo_sha256',
+        'arquivo_paginas', 'arquivo_duracao_ms'
+    ]
 
 
 @admin.register(Aluno)
 class AlunoAdmin(admin.ModelAdmin):
     list_display = ['nome', 'email', 'telefone', 'username', 'criado_em']
+    list_select_related = ['user']
     search_fields = ['nome', 'email', 'user__username']
     list_filter = ['criado_em']
     date_hierarchy = 'criado_em'
-    
+    autocomplete_fields = ['user']
+
     def username(self, obj):
         return obj.user.username
     username.short_description = 'Username'
+    username.admin_order_field = 'user__username'
 
 
 @admin.register(Matricula)
 class MatriculaAdmin(admin.ModelAdmin):
     list_display = ['aluno', 'turma', 'treinamento', 'data_matricula', 'ativo']
+    # aluno e turma (com o treinamento do __str__) no mesmo JOIN
+    list_select_related = ['aluno', 'turma__treinamento']
     search_fields = ['aluno__nome', 'turma__nome']
     list_filter = ['ativo', 'turma__treinamento', 'data_matricula']
     date_hierarchy = 'data_matricula'
     list_editable = ['ativo']
-    
+    # Selects com todos os alunos/turmas seriam enormes no formulário
+    autocomplete_fields = ['aluno', 'turma']
+
     def treinamento(self, obj):
         return obj.turma.treinamento.nome
-    treinamento.short_description = 'Treinamento'
\ No newline at end of file
+    treinamento.short_description = 'Treinamento'
+    treinamento.admin_order_field = 'turma__treinamento__nome'
+
+
+@admin.register(ProcessamentoArquivo)
+class ProcessamentoArquivoAdmin(admin.ModelAdmin):
+    list_display = ['arquivo', 'recurso', 'status', 'tentativas', 'criado_em', 'concluido_em']
+    list_select_related = ['recurso']
+    list_filter = ['status']
+    search_fields = ['arquivo']
+    readonly_fields = [
+        'recurso', 'arquivo', 'status', 'tentativas', 'erro',
+        'criado_em', 'iniciado_em', 'concluido_em'
+    ]
+
+    def has_add_permission(self, request):
+        # Jobs são criados ao salvar o arquivo do recurso
+        return False
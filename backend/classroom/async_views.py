@@ -0,0 +1,256 @@
+"""
+Versões assíncronas (ASGI) dos endpoints de leitura mais acessados.
+
+Sob ASGI, as views síncronas do DRF rodam em uma thread do pool a cada
+requisição, e clientes lentos seguram essas threads. Estas views são
+``async def`` nativas: a autenticação JWT e as consultas usam o ORM
+assíncrono (``aget``, ``acount``, ``async for``), e a serialização é
+feita depois que todos os dados (inclusive prefetches) já foram
+carregados. As regras de autorização e visibilidade são as mesmas das
+views síncronas, pois os querysets vêm das mesmas funções.
+
+Ficam em ``/api/async/``; as views síncronas continuam disponíveis.
+"""
+
+import math
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import (
+    APIException, AuthenticationFailed, NotAuthenticated, NotFound,
+    PermissionDenied, ValidationError
+)
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .authentication import (
+    ClaimsJWTAuthentication, aluno_completo, tem_claims, user_id_do_token,
+    usuario_do_token, usuarios_com_aluno, validacao_estrita,
+    verificar_usuario
+)
+from .fieldsets import otimizar
+from .filters import RecursoFilter, TurmaFilter
+from .models import Aluno, Recurso, Turma
+from .pagination import ClassroomPagination
+from .renderers import OrjsonRenderer
+from .serializers import (
+    AlunoSerializer, RecursoSerializer, TurmaAlunoSerializer, TurmaSerializer
+)
+from .views import RecursoViewSet, TurmaViewSet
+from .visibility import turmas_matriculadas
+
+
+async def autenticar(request):
+    """
+    Mesmo fluxo do ``ClaimsJWTAuthentication``: usuário montado a partir
+    das claims ou, no modo estrito, buscado (com o aluno, no mesmo JOIN)
+    pelo ORM assíncrono.
+    """
+    autenticacao = ClaimsJWTAuthentication()
+    header = autenticacao.get_header(request)
+    if header is None:
+        return None
+    raw_token = autenticacao.get_raw_token(header)
+    if raw_token is None:
+        return None
+    token = autenticacao.get_validated_token(raw_token)
+    if tem_claims(token) and not validacao_estrita():
+        return usuario_do_token(token)
+
+    try:
+        user = await usuarios_com_aluno().aget(
+            **{jwt_settings.USER_ID_FIELD: user_id_do_token(token)}
+        )
+    except get_user_model().DoesNotExist:
+        raise AuthenticationFailed('User not found', code='user_not_found')
+    return verificar_usuario(user, token)
+
+
+def resposta_json(data, status=200):
+    """JSON idêntico ao do renderer das views síncronas"""
+    renderer = OrjsonRenderer()
+    return HttpResponse(
+        renderer.render(data), status=status, content_type=renderer.media_type
+    )
+
+
+async def paginar(request, queryset):
+    """Mesmo envelope e links da ``ClassroomPagination`` (por página)"""
+    tamanho = drf_settings.PAGE_SIZE
+    try:
+        numero = int(request.GET.get('page', 1))
+    except ValueError:
+        numero = 0
+
+    total = await queryset.acount()
+    paginas = max(1, math.ceil(total / tamanho))
+    if not 1 <= numero <= paginas:
+        raise NotFound(ClassroomPagination.invalid_page_message.format(
+            page_number=request.GET.get('page'), message=''
+        ))
+
+    inicio = (numero - 1) * tamanho
+    linhas = [obj async for obj in queryset[inicio:inicio + tamanho]]
+
+    url = request.build_absolute_uri()
+    anterior = None
+    if numero == 2:
+        anterior = remove_query_param(url, 'page')
+    elif numero > 2:
+        anterior = replace_query_param(url, 'page', numero - 1)
+    return linhas, {
+        'count': total,
+        'next': (
+            replace_query_param(url, 'page', numero + 1)
+            if numero < paginas else None
+        ),
+        'previous': anterior,
+    }
+
+
+def nao_encontrado(model):
+    # Mesma mensagem do get_object_or_404 usado pelos ViewSets
+    return NotFound(f'No {model._meta.object_name} matches the given query.')
+
+
+def filtrar(filterset_class, request, queryset):
+    filterset = filterset_class(request.GET, queryset=queryset)
+    if not filterset.is_valid():
+        raise ValidationError(filterset.errors)
+    return filterset.qs
+
+
+class AsyncAPIView(View):
+    """
+    Base das views assíncronas: autenticação JWT, ``IsAuthenticated``
+    (e ``IsAdminUser`` com ``somente_admin``) e erros no formato do DRF.
+    """
+    somente_admin = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await autenticar(request)
+            if request.user is None:
+                raise NotAuthenticated()
+            if self.somente_admin and not request.user.is_staff:
+                raise PermissionDenied()
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return self.resposta_erro(request, exc)
+
+    def resposta_erro(self, request, exc):
+        data = exc.detail
+        if not isinstance(data, (dict, list)):
+            data = {'detail': data}
+        response = resposta_json(data, status=exc.status_code)
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            response['WWW-Authenticate'] = (
+                ClaimsJWTAuthentication().authenticate_header(request)
+            )
+            response.status_code = 401
+        return response
+
+
+class AsyncMeusDadosView(AsyncAPIView):
+    """Versão assíncrona de ``MeusDadosView``"""
+
+    async def get(self, request):
+        try:
+            aluno = request.user.aluno
+        except Aluno.DoesNotExist:
+            return resposta_json(
+                {'error': 'Perfil de aluno não encontrado'}, status=404
+            )
+        aluno = await sync_to_async(aluno_completo)(aluno)
+        serializer = AlunoSerializer(aluno, context={'request': request})
+        return resposta_json(serializer.data)
+
+
+class AsyncMinhasTurmasView(AsyncAPIView):
+    """Versão assíncrona de ``MinhasTurmasView``"""
+
+    async def get(self, request):
+        try:
+            aluno = request.user.aluno
+        except Aluno.DoesNotExist:
+            return resposta_json(
+                {'error': 'Perfil de aluno não encontrado'}, status=404
+            )
+        contexto = {'hoje': date.today(), 'request': request}
+        queryset = otimizar(
+            turmas_matriculadas(aluno), TurmaAlunoSerializer(context=contexto)
+        )
+        turmas = [turma async for turma in queryset]
+        serializer = TurmaAlunoSerializer(turmas, many=True, context=contexto)
+        return resposta_json(serializer.data)
+
+
+class AsyncTurmaListView(AsyncAPIView):
+    """Versão assíncrona de ``GET /api/turmas/``"""
+
+    async def get(self, request):
+        contexto = {'request': request}
+        queryset = filtrar(
+            TurmaFilter, request, TurmaViewSet.queryset_para(request.user)
+        )
+        queryset = otimizar(queryset, TurmaSerializer(context=contexto))
+        turmas, pagina = await paginar(request, queryset)
+        pagina['results'] = TurmaSerializer(
+            turmas, many=True, context=contexto
+        ).data
+        return resposta_json(pagina)
+
+
+class AsyncTurmaDetailView(AsyncAPIView):
+    """Versão assíncrona de ``GET /api/turmas/{id}/``"""
+
+    async def get(self, request, pk):
+        contexto = {'request': request}
+        queryset = otimizar(
+            TurmaViewSet.queryset_para(request.user),
+            TurmaSerializer(context=contexto)
+        )
+        try:
+            turma = await queryset.aget(pk=pk)
+        except Turma.DoesNotExist:
+            raise nao_encontrado(Turma)
+        serializer = TurmaSerializer(turma, context=contexto)
+        return resposta_json(serializer.data)
+
+
+class AsyncRecursoListView(AsyncAPIView):
+    """Versão assíncrona de ``GET /api/recursos/`` (admin)"""
+    somente_admin = True
+
+    async def get(self, request):
+        contexto = {'request': request}
+        queryset = filtrar(
+            RecursoFilter, request, RecursoViewSet.queryset_para(request.GET)
+        )
+        queryset = otimizar(queryset, RecursoSerializer(context=contexto))
+        recursos, pagina = await paginar(request, queryset)
+        pagina['results'] = RecursoSerializer(
+            recursos, many=True, context=contexto
+        ).data
+        return resposta_json(pagina)
+
+
+class AsyncRecursoDetailView(AsyncAPIView):
+    """Versão assíncrona de ``GET /api/recursos/{id}/`` (admin)"""
+    somente_admin = True
+
+    async def get(self, request, pk):
+        contexto = {'request': request}
+        queryset = otimizar(
+            RecursoViewSet.queryset_para({}), RecursoSerializer(context=contexto)
+        )
+        try:
+            recurso = await queryset.aget(pk=pk)
+        except Recurso.DoesNotExist:
+            raise nao_encontrado(Recurso)
+        serializer = RecursoSerializer(recurso, context=contexto)
+        return resposta_json(serializer.data)
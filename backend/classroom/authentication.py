@@ -0,0 +1,178 @@
+"""
+Autenticação JWT baseada em claims.
+
+Os tokens emitidos em ``/api/token/`` carregam ``is_staff`` e ``aluno_id``.
+``ClaimsJWTAuthentication`` monta o ``request.user`` a partir dessas claims,
+sem consultar ``User`` nem ``Aluno``: o usuário é uma instância de ``User``
+com apenas ``id``, ``is_staff`` e ``is_active`` carregados, e ``user.aluno``
+já vem preenchido com o id do aluno (ou levanta ``Aluno.DoesNotExist``).
+Assim ``user.is_staff``, ``user.aluno``, filtros como ``filter(user=user)``
+e atribuições a FKs funcionam sem mudanças nas views. Os demais campos são
+adiados (deferred) e carregados do banco só se forem acessados.
+
+As claims valem até o token expirar: um usuário desativado ou que perdeu o
+``is_staff`` mantém o acesso até lá. Com ``JWT_VALIDACAO_ESTRITA = True``
+o usuário (e o aluno, no mesmo JOIN) é relido do banco a cada requisição e
+os valores do banco prevalecem sobre as claims. Tokens sem as claims
+(emitidos antes delas existirem) também são validados no banco.
+
+O refresh (``ClassroomTokenRefreshSerializer``) relê o usuário e o aluno
+do banco: um usuário desativado não obtém novo access e as claims do
+access novo refletem o ``is_staff``/aluno atuais, não os do login.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer, TokenRefreshSerializer
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import Aluno
+
+
+CLAIM_IS_STAFF = 'is_staff'
+CLAIM_ALUNO_ID = 'aluno_id'
+
+
+def validacao_estrita():
+    return getattr(settings, 'JWT_VALIDACAO_ESTRITA', False)
+
+
+def tem_claims(token):
+    return CLAIM_IS_STAFF in token and CLAIM_ALUNO_ID in token
+
+
+def user_id_do_token(token):
+    try:
+        return token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken(
+            _('Token contained no recognizable user identification')
+        )
+
+
+def instancia_parcial(model, **valores):
+    """Instância de ``model`` sem consultar o banco; os demais campos ficam adiados"""
+    campos = [
+        campo.attname for campo in model._meta.concrete_fields
+        if campo.attname in valores
+    ]
+    return model.from_db(None, campos, [valores[campo] for campo in campos])
+
+
+def usuario_do_token(token):
+    """``User`` leve montado a partir das claims do token"""
+    User = get_user_model()
+    user = instancia_parcial(User, **{
+        api_settings.USER_ID_FIELD: user_id_do_token(token),
+        'is_staff': token[CLAIM_IS_STAFF],
+        'is_active': True,
+    })
+    aluno = None
+    if token[CLAIM_ALUNO_ID] is not None:
+        aluno = instancia_parcial(
+            Aluno, id=token[CLAIM_ALUNO_ID], user_id=user.pk
+        )
+        Aluno.user.field.set_cached_value(aluno, user)
+    # user.aluno não consulta o banco (None levanta Aluno.DoesNotExist)
+    User.aluno.related.set_cached_value(user, aluno)
+    return user
+
+
+def usuarios_com_aluno():
+    return get_user_model()._default_manager.select_related('aluno')
+
+
+def verificar_usuario(user, token):
+    """Mesmas verificações do ``JWTAuthentication.get_user`` do simplejwt"""
+    if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+    if api_settings.CHECK_REVOKE_TOKEN and token.get(
+        api_settings.REVOKE_TOKEN_CLAIM
+    ) != get_md5_hash_password(user.password):
+        raise AuthenticationFailed(
+            _("The user's password has been changed."),
+            code='password_changed'
+        )
+    return user
+
+
+def aluno_completo(aluno):
+    """Carrega todos os campos (e o user) de um aluno vindo das claims"""
+    if not aluno.get_deferred_fields():
+        return aluno
+    return Aluno.objects.select_related('user').get(pk=aluno.pk)
+
+
+def escrever_claims(token, user):
+    token[CLAIM_IS_STAFF] = user.is_staff
+    try:
+        token[CLAIM_ALUNO_ID] = user.aluno.pk
+    except Aluno.DoesNotExist:
+        token[CLAIM_ALUNO_ID] = None
+    return token
+
+
+class ClassroomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Par de tokens com ``is_staff`` e ``aluno_id`` (herdados pelo access)"""
+
+    @classmethod
+    def get_token(cls, user):
+        return escrever_claims(super().get_token(user), user)
+
+
+class ClassroomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh que relê o usuário e reescreve as claims do novo access"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        try:
+            user = usuarios_com_aluno().get(**{
+                api_settings.USER_ID_FIELD: user_id_do_token(refresh)
+            })
+        except get_user_model().DoesNotExist:
+            user = None
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(
+                self.error_messages['no_active_account'], 'no_active_account'
+            )
+        escrever_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # App token_blacklist não instalado
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` sem consultas ao banco (ver docstring do módulo)"""
+
+    def get_user(self, validated_token):
+        if tem_claims(validated_token) and not validacao_estrita():
+            return usuario_do_token(validated_token)
+
+        # Modo estrito (ou token sem claims): User e Aluno em uma query
+        try:
+            user = usuarios_com_aluno().get(**{
+                api_settings.USER_ID_FIELD: user_id_do_token(validated_token)
+            })
+        except get_user_model().DoesNotExist:
+            raise AuthenticationFailed(
+                _('User not found'), code='user_not_found'
+            )
+        return verificar_usuario(user, validated_token)
@@ -0,0 +1,390 @@
+"""
+Benchmark em processo dos endpoints da API (latência, queries e tamanho).
+
+Cada rota de ``classroom/urls.py`` tem um caso em ``CASOS`` (ou está em
+``IGNORADAS``, com o motivo). As requisições passam pelo cliente de testes
+do Django com autenticação JWT real, sem servidor nem rede. Para cada caso
+são medidos p50/p95 da latência, o número de queries e o tamanho da
+resposta; o resultado é comparado com um baseline salvo em JSON.
+
+O cache é limpo antes de cada requisição, então a medida é sempre a do
+caminho sem cache (e o número de queries é determinístico). Os dados vêm
+de ``dataset.gerar_dados``; ver o comando ``benchmark_api``.
+
+``medir_renderizacao`` compara só a etapa de renderização (tempo e tamanho)
+do JSON do DRF com os renderers de ``renderers.py`` em páginas de turmas e
+matrículas de vários tamanhos; ver o comando ``benchmark_renderizacao``.
+"""
+
+import json
+import os
+import statistics
+import time
+from collections import namedtuple
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import metrics, processing
+from .authentication import ClassroomTokenObtainPairSerializer
+from .dataset import SENHA_PADRAO
+from .models import Aluno, Matricula, Recurso
+from .renderers import MessagePackRenderer, OrjsonRenderer, msgpack_disponivel
+from .views import MatriculaViewSet, TurmaViewSet
+
+
+# Tolerâncias padrão para considerar uma medida uma regressão
+TOLERANCIA_LATENCIA = 0.50
+FOLGA_LATENCIA_MS = 5.0
+TOLERANCIA_BYTES = 0.10
+
+TAMANHO_ARQUIVO = 256 * 1024
+
+ADMIN_USERNAME = 'benchmark-admin'
+
+Caso = namedtuple(
+    'Caso',
+    ['nome', 'rota', 'perfil', 'metodo', 'argumentos', 'dados', 'maximo',
+     'parametros'],
+    defaults=('GET', None, None, None, None)
+)
+
+# perfil: 'aluno' (joao), 'admin' ou None (sem autenticação).
+# argumentos/dados recebem o contexto (ids dos objetos usados).
+CASOS = [
+    Caso('token', 'token_obtain_pair', None, 'POST',
+         dados=lambda c: {'username': 'joao', 'password': SENHA_PADRAO},
+         # O hash da senha é lento de propósito
+         maximo=5),
+    Caso('token-refresh', 'token_refresh', None, 'POST',
+         dados=lambda c: {'refresh': c['refresh']}),
+    Caso('meus-dados', 'meus-dados', 'aluno'),
+    Caso('minhas-turmas', 'minhas-turmas', 'aluno'),
+    Caso('download-recurso', 'download-recurso', 'aluno',
+         argumentos=lambda c: [c['recurso']]),
+    Caso('turma-list:aluno', 'turma-list', 'aluno'),
+    Caso('turma-list', 'turma-list', 'admin'),
+    Caso('turma-list:fields', 'turma-list', 'admin',
+         parametros={'fields': 'id,nome,data_inicio'}),
+    Caso('turma-detail', 'turma-detail', 'admin',
+         argumentos=lambda c: [c['turma']]),
+    Caso('treinamento-list', 'treinamento-list', 'admin'),
+    Caso('treinamento-list:fields', 'treinamento-list', 'admin',
+         parametros={'fields': 'id,nome'}),
+    Caso('treinamento-detail', 'treinamento-detail', 'admin',
+         argumentos=lambda c: [c['treinamento']]),
+    Caso('recurso-list', 'recurso-list', 'admin'),
+    Caso('recurso-detail', 'recurso-detail', 'admin',
+         argumentos=lambda c: [c['recurso']]),
+    Caso('aluno-list', 'aluno-list', 'admin'),
+    Caso('aluno-detail', 'aluno-detail', 'admin',
+         argumentos=lambda c: [c['aluno']]),
+    Caso('matricula-list', 'matricula-list', 'admin'),
+    Caso('matricula-list:expand', 'matricula-list', 'admin',
+         parametros={'expand': 'aluno,turma', 'omit': 'turma.recursos'}),
+    Caso('matricula-detail', 'matricula-detail', 'admin',
+         argumentos=lambda c: [c['matricula']]),
+    # Exportações: todas as linhas em cada requisição
+    Caso('matricula-exportar', 'matricula-exportar', 'admin', maximo=5),
+    Caso('aluno-exportar', 'aluno-exportar', 'admin', maximo=5,
+         parametros={'formato': 'ndjson'}),
+    Caso('recurso-exportar', 'recurso-exportar', 'admin', maximo=5),
+    Caso('async-meus-dados', 'async-meus-dados', 'aluno'),
+    Caso('async-minhas-turmas', 'async-minhas-turmas', 'aluno'),
+    Caso('async-turma-list', 'async-turma-list', 'admin'),
+    Caso('async-turma-detail', 'async-turma-detail', 'admin',
+         argumentos=lambda c: [c['turma']]),
+    Caso('async-recurso-list', 'async-recurso-list', 'admin'),
+    Caso('async-recurso-detail', 'async-recurso-detail', 'admin',
+         argumentos=lambda c: [c['recurso']]),
+    # Busca textual (FTS5): o aluno filtra por matrículas e visibilidade
+    Caso('busca', 'busca', 'aluno', parametros={'q': 'aula'}),
+    Caso('busca:admin', 'busca', 'admin', parametros={'q': 'python'}),
+    Caso('cache-estatisticas', 'cache-estatisticas', 'admin'),
+    Caso('metricas', 'metricas', 'admin'),
+    Caso('api-root', 'api-root', 'admin'),
+]
+
+# Rotas sem caso: criam ou alteram dados a cada chamada
+IGNORADAS = {
+    'registro': 'cria um usuário por requisição',
+    'aluno-importar': 'importação em massa (escrita)',
+    'matricula-em-lote': 'matrícula em massa (escrita)',
+    'upload-list': 'só POST: cria uma sessão de upload',
+    'upload-detail': 'envio de partes de um upload em andamento',
+    'upload-finalizar': 'grava o arquivo de um upload concluído',
+}
+
+
+def preparar_contexto():
+    """
+    Escolhe os objetos usados nos casos (a partir dos dados já gerados) e
+    cria o admin do benchmark e um recurso com arquivo para o download.
+    Requer os alunos de demonstração de ``gerar_dados``.
+    """
+    aluno = Aluno.objects.select_related('user').get(user__username='joao')
+    matricula = Matricula.objects.select_related('turma').filter(
+        aluno=aluno, ativo=True, turma__data_inicio__lte=date.today()
+    ).order_by('turma_id').first()
+    turma = matricula.turma
+
+    recurso = Recurso(
+        turma=turma, tipo_recurso='pdf', draft=False, acesso_previo=False,
+        nome_recurso='Benchmark', descricao_recurso='Arquivo do benchmark',
+    )
+    recurso.arquivo.save(
+        'benchmark.pdf', ContentFile(b'\0' * TAMANHO_ARQUIVO), save=False
+    )
+    recurso.save()
+    # Como em produção, com o worker de processing.py em execução
+    processing.executar(workers=1, uma_vez=True)
+
+    admin, _ = User.objects.get_or_create(
+        username=ADMIN_USERNAME, defaults={'is_staff': True}
+    )
+    return {
+        'aluno': aluno.pk,
+        'matricula': matricula.pk,
+        'turma': turma.pk,
+        'treinamento': turma.treinamento_id,
+        'recurso': recurso.pk,
+        'usuarios': {'aluno': aluno.user, 'admin': admin},
+    }
+
+
+def tokens(contexto):
+    """Tokens reais (com claims) para cada perfil"""
+    credenciais = {}
+    for perfil, user in contexto['usuarios'].items():
+        refresh = ClassroomTokenObtainPairSerializer.get_token(user)
+        credenciais[perfil] = f'Bearer {refresh.access_token}'
+        if perfil == 'aluno':
+            contexto['refresh'] = str(refresh)
+    return credenciais
+
+
+def executar(client, caso, contexto, credenciais):
+    argumentos = caso.argumentos(contexto) if caso.argumentos else []
+    url = reverse(caso.rota, args=argumentos)
+    headers = {}
+    if caso.perfil:
+        headers['Authorization'] = credenciais[caso.perfil]
+    if caso.metodo == 'POST':
+        response = client.post(
+            url, caso.dados(contexto), content_type='application/json',
+            headers=headers
+        )
+    else:
+        response = client.get(url, caso.parametros, headers=headers)
+
+    if response.streaming:
+        tamanho = sum(len(parte) for parte in response.streaming_content)
+        response.close()
+    else:
+        tamanho = len(response.content)
+    return response.status_code, tamanho
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def medir_caso(client, caso, contexto, credenciais, repeticoes, aquecimento):
+    cache = caches['default']
+    cache.clear()
+    # O request_started limpa o log no meio da captura; começa vazio
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        status, tamanho = executar(client, caso, contexto, credenciais)
+    # captured_queries lê o log atual: contar antes das próximas requisições
+    consultas = len(queries)
+    if status != 200:
+        raise RuntimeError(f'{caso.nome}: status {status}')
+
+    repeticoes = min(repeticoes, caso.maximo or repeticoes)
+    referencia = calibrar()
+    latencias = []
+    for numero in range(aquecimento + repeticoes):
+        cache.clear()
+        inicio = time.perf_counter()
+        executar(client, caso, contexto, credenciais)
+        if numero >= aquecimento:
+            latencias.append((time.perf_counter() - inicio) * 1000)
+    return {
+        'p50_ms': round(statistics.median(latencias), 3),
+        'p95_ms': round(percentil(latencias, 95), 3),
+        'queries': consultas,
+        'bytes': tamanho,
+        'referencia_ms': round((referencia + calibrar()) / 2, 3),
+    }
+
+
+def calibrar(repeticoes=7):
+    """
+    Mediana (ms) de uma carga fixa de CPU em Python, medida junto de cada
+    caso. A razão entre a referência atual e a do baseline corrige as
+    latências pela velocidade da máquina naquele momento (outro laptop,
+    modo de energia, outros processos).
+    """
+    dados = [
+        {'id': i, 'nome': f'Item {i}', 'valor': i * 0.5, 'ativo': i % 3 == 0}
+        for i in range(2000)
+    ]
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        ordenados = sorted(dados, key=lambda item: (-item['valor'], item['nome']))
+        json.loads(json.dumps(ordenados))
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return round(statistics.median(tempos), 3)
+
+
+def medir_rotas(repeticoes=30, aquecimento=3, casos=CASOS, progresso=None):
+    """Mede todos os ``casos`` no banco atual; retorna {nome: medidas}"""
+    # O tamanho de /api/_metrics depende das rotas já registradas
+    metrics.limpar()
+    contexto = preparar_contexto()
+    client = Client()
+    credenciais = tokens(contexto)
+    resultados = {}
+    for caso in casos:
+        resultados[caso.nome] = medir_caso(
+            client, caso, contexto, credenciais, repeticoes, aquecimento
+        )
+        if progresso:
+            progresso(caso.nome, resultados[caso.nome])
+    return resultados
+
+
+def comparar(atual, baseline, tolerancia=TOLERANCIA_LATENCIA,
+             folga_ms=FOLGA_LATENCIA_MS, tolerancia_bytes=TOLERANCIA_BYTES):
+    """
+    Regressões de ``atual`` em relação ao ``baseline`` (mesmo formato:
+    {escala: {caso: medidas}}). Qualquer query a mais é regressão; o p50
+    só acima da tolerância relativa e da folga absoluta, depois de ajustar
+    o baseline pela referência de ``calibrar`` das duas execuções. O p95
+    oscila demais entre execuções e é só informativo.
+    """
+    regressoes = []
+    for escala, casos in atual.items():
+        for nome, medidas in casos.items():
+            base = baseline.get(escala, {}).get(nome)
+            if base is None:
+                continue
+            fator = fator_maquina(medidas, base)
+            if medidas['queries'] > base['queries']:
+                regressoes.append(
+                    f"{escala}/{nome}: queries {base['queries']} -> "
+                    f"{medidas['queries']}"
+                )
+            esperado = base['p50_ms'] * fator
+            limite = max(esperado * (1 + tolerancia), esperado + folga_ms)
+            if medidas['p50_ms'] > limite:
+                regressoes.append(
+                    f"{escala}/{nome}: p50_ms {esperado:.1f} -> "
+                    f"{medidas['p50_ms']:.1f}"
+                )
+            if medidas['bytes'] > base['bytes'] * (1 + tolerancia_bytes):
+                regressoes.append(
+                    f"{escala}/{nome}: bytes {base['bytes']} -> "
+                    f"{medidas['bytes']}"
+                )
+    return regressoes
+
+
+def fator_maquina(medidas, base):
+    """Quanto a máquina estava mais lenta (>1) ou rápida (<1) que no baseline"""
+    try:
+        return medidas['referencia_ms'] / base['referencia_ms']
+    except (KeyError, ZeroDivisionError):
+        return 1.0
+
+
+def ler_baseline(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)['escalas']
+
+
+def salvar_baseline(caminho, resultados, escalas_mantidas=None):
+    dados = {'escalas': {**(escalas_mantidas or {}), **resultados}}
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo, indent=2, sort_keys=True)
+        arquivo.write('\n')
+
+
+# Páginas usadas em ``medir_renderizacao`` (listagens do admin)
+TAMANHOS_PAGINA = (20, 200, 2000)
+
+
+PAGINAS_RENDERIZADAS = {'turmas': TurmaViewSet, 'matriculas': MatriculaViewSet}
+
+
+def renderers_comparados():
+    """O JSON do DRF (``json`` da biblioteca padrão) e os de renderers.py"""
+    comparados = [('json', JSONRenderer()), ('orjson', OrjsonRenderer())]
+    if msgpack_disponivel():
+        comparados.append(('msgpack', MessagePackRenderer()))
+    return comparados
+
+
+def dados_da_pagina(viewset, tamanho, user):
+    """``response.data`` da primeira página da listagem com ``tamanho`` linhas"""
+    paginacao = type(
+        'PaginaBenchmark', (viewset.pagination_class,), {'page_size': tamanho}
+    )
+    view = viewset.as_view({'get': 'list'}, pagination_class=paginacao)
+    request = APIRequestFactory().get('/')
+    force_authenticate(request, user)
+    caches['default'].clear()
+    response = view(request)
+    if response.status_code != 200:
+        raise RuntimeError(f'{viewset.__name__}: status {response.status_code}')
+    return response.data
+
+
+def medir_renderizacao(tamanhos=TAMANHOS_PAGINA, repeticoes=20,
+                       progresso=None):
+    """
+    Tempo (p50) e tamanho de cada renderer para a mesma página já
+    serializada; retorna {'rota:tamanho': {'linhas', 'renderers'}}. Marca
+    se a saída do ``orjson`` é idêntica à do JSON do DRF.
+    """
+    admin, _ = User.objects.get_or_create(
+        username=ADMIN_USERNAME, defaults={'is_staff': True}
+    )
+    resultados = {}
+    for rota, viewset in PAGINAS_RENDERIZADAS.items():
+        for tamanho in tamanhos:
+            dados = dados_da_pagina(viewset, tamanho, admin)
+            medidas = {}
+            referencia = None
+            for nome, renderer in renderers_comparados():
+                tempos = []
+                for _ in range(repeticoes):
+                    inicio = time.perf_counter()
+                    conteudo = renderer.render(dados, renderer.media_type)
+                    tempos.append((time.perf_counter() - inicio) * 1000)
+                referencia = referencia or conteudo
+                medidas[nome] = {
+                    'p50_ms': round(statistics.median(tempos), 3),
+                    'bytes': len(conteudo),
+                }
+                if renderer.format == 'json':
+                    medidas[nome]['identico'] = conteudo == referencia
+            chave = f'{rota}:{tamanho}'
+            resultados[chave] = {
+                'linhas': len(dados['results']), 'renderers': medidas
+            }
+            if progresso:
+                progresso(chave, resultados[chave])
+    return resultados
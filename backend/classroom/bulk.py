@@ -0,0 +1,380 @@
+"""
+Operações em lote.
+
+As validações são feitas com queries por conjunto (``__in``) em vez de
+uma query por linha, e as inserções usam ``bulk_create`` em lotes.
+"""
+
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from . import access_cache, response_cache
+from .models import Turma, Aluno, Matricula
+
+
+BATCH_SIZE = 500
+
+# Abaixo disso o custo de subir o pool de processos não compensa
+MIN_LINHAS_POOL = 200
+
+STATUS_CRIADA = 'criada'
+STATUS_CRIADO = 'criado'
+STATUS_DUPLICADA = 'duplicada'
+STATUS_ERRO = 'erro'
+
+ERRO_CONCORRENTE = (
+    'Não foi possível gravar a linha (alteração simultânea); tente de novo.'
+)
+
+
+class CsvInvalido(ValueError):
+    """Conteúdo enviado não é um CSV em UTF-8"""
+
+
+def em_lotes(valores, tamanho=BATCH_SIZE):
+    valores = list(valores)
+    for inicio in range(0, len(valores), tamanho):
+        yield valores[inicio:inicio + tamanho]
+
+
+def ler_csv(conteudo):
+    """Lê um CSV com cabeçalho (ex.: ``turma,aluno``) em uma lista de dicts"""
+    try:
+        if isinstance(conteudo, bytes):
+            conteudo = conteudo.decode('utf-8-sig')
+        return list(csv.DictReader(io.StringIO(conteudo)))
+    except UnicodeDecodeError:
+        raise CsvInvalido('O CSV deve estar em UTF-8.')
+    except csv.Error as exc:
+        raise CsvInvalido(f'CSV inválido: {exc}')
+
+
+def ids_existentes(model, ids):
+    existentes = set()
+    for lote in em_lotes(ids):
+        existentes.update(
+            model.objects.filter(id__in=lote).values_list('id', flat=True)
+        )
+    return existentes
+
+
+def pares_matriculados(pares):
+    """Pares (turma_id, aluno_id) que já têm matrícula"""
+    por_turma = {}
+    for turma_id, aluno_id in pares:
+        por_turma.setdefault(turma_id, set()).add(aluno_id)
+
+    existentes = set()
+    for turmas in em_lotes(por_turma):
+        alunos = set().union(*(por_turma[t] for t in turmas))
+        for lote in em_lotes(alunos):
+            existentes.update(
+                Matricula.objects.filter(
+                    turma_id__in=turmas, aluno_id__in=lote
+                ).values_list('turma_id', 'aluno_id')
+            )
+    return existentes & set(pares)
+
+
+def para_bool(valor):
+    if valor is None or valor == '':
+        return True
+    if isinstance(valor, bool):
+        return valor
+    texto = str(valor).strip().lower()
+    if texto in ('1', 'true', 'sim', 's', 'yes'):
+        return True
+    if texto in ('0', 'false', 'nao', 'não', 'n', 'no'):
+        return False
+    raise ValueError(valor)
+
+
+def criar_matriculas(novas, tentativas=2):
+    """
+    Insere as matrículas de ``novas`` (pares resultado/ativo) e atualiza os
+    resultados. Se outra requisição matriculou algum par depois da
+    validação, o ``bulk_create`` falha inteiro: esses pares viram
+    ``duplicada`` e os demais são inseridos de novo.
+    """
+    for _ in range(tentativas):
+        # Instâncias novas a cada tentativa (sem pks de um lote desfeito)
+        matriculas = [
+            Matricula(
+                turma_id=resultado['turma'], aluno_id=resultado['aluno'],
+                ativo=ativo
+            )
+            for resultado, ativo in novas
+        ]
+        try:
+            with transaction.atomic():
+                criadas = Matricula.objects.bulk_create(
+                    matriculas, batch_size=BATCH_SIZE
+                )
+        except IntegrityError:
+            existentes = pares_matriculados(
+                {(r['turma'], r['aluno']) for r, _ in novas}
+            )
+            restantes = []
+            for resultado, ativo in novas:
+                if (resultado['turma'], resultado['aluno']) in existentes:
+                    resultado['status'] = STATUS_DUPLICADA
+                else:
+                    restantes.append((resultado, ativo))
+            novas = restantes
+            continue
+        for (resultado, _), matricula in zip(novas, criadas):
+            resultado.update(status=STATUS_CRIADA, id=matricula.pk)
+        return criadas
+
+    for resultado, _ in novas:
+        resultado.update(status=STATUS_ERRO, erro=ERRO_CONCORRENTE)
+    return []
+
+
+def matricular_em_lote(linhas):
+    """
+    Matricula os pares (turma, aluno) de ``linhas`` (dicts com ``turma``,
+    ``aluno`` e opcionalmente ``ativo``).
+
+    Retorna um resultado por linha. Matrículas já existentes (ou repetidas
+    no próprio lote) são reportadas como ``duplicada``, não como erro.
+    """
+    resultados = []
+    validas = []
+    for numero, linha in enumerate(linhas, start=1):
+        resultado = {'linha': numero}
+        resultados.append(resultado)
+        try:
+            resultado['turma'] = int(linha['turma'])
+            resultado['aluno'] = int(linha['aluno'])
+            ativo = para_bool(linha.get('ativo'))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            resultado.update(
+                status=STATUS_ERRO,
+                erro='Informe turma e aluno (ids numéricos) e ativo booleano.'
+            )
+            continue
+        validas.append((resultado, ativo))
+
+    turmas = ids_existentes(Turma, {r['turma'] for r, _ in validas})
+    alunos = ids_existentes(Aluno, {r['aluno'] for r, _ in validas})
+    ja_matriculados = pares_matriculados(
+        {(r['turma'], r['aluno']) for r, _ in validas}
+    )
+
+    novas = []
+    vistos = set()
+    for resultado, ativo in validas:
+        par = (resultado['turma'], resultado['aluno'])
+        if par[0] not in turmas:
+            resultado.update(status=STATUS_ERRO, erro='Turma não encontrada.')
+        elif par[1] not in alunos:
+            resultado.update(status=STATUS_ERRO, erro='Aluno não encontrado.')
+        elif par in ja_matriculados or par in vistos:
+            resultado['status'] = STATUS_DUPLICADA
+        else:
+            vistos.add(par)
+            novas.append((resultado, ativo))
+
+    criadas = criar_matriculas(novas)
+
+    # bulk_create não dispara signals
+    for turma_id in {m.turma_id for m in criadas}:
+        access_cache.invalidar_turma(turma_id)
+    if criadas:
+        response_cache.invalidar(Matricula)
+
+    return resultados
+
+
+def iniciar_worker():
+    """Inicializa o Django nos processos do pool (necessário com spawn)"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'classroom_project.settings')
+    django.setup()
+
+
+@contextmanager
+def gerador_de_hashes(workers=None, total=0):
+    """
+    Fornece uma função que gera os hashes de uma lista de senhas com
+    ``make_password``. O hash (PBKDF2 por padrão) é intencionalmente lento,
+    então com muitas senhas o trabalho é dividido entre processos; o pool
+    é criado uma vez e reaproveitado entre os lotes. Só para comandos: não
+    crie processos a partir de um worker web.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or total < MIN_LINHAS_POOL:
+        yield lambda senhas: [make_password(senha) for senha in senhas]
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=iniciar_worker
+    ) as pool:
+        def gerar(senhas):
+            chunksize = max(1, len(senhas) // (workers * 4))
+            return list(pool.map(make_password, senhas, chunksize=chunksize))
+        yield gerar
+
+
+def usernames_existentes(usernames):
+    existentes = set()
+    for lote in em_lotes(usernames):
+        existentes.update(
+            User.objects.filter(username__in=lote)
+            .values_list('username', flat=True)
+        )
+    return existentes
+
+
+def emails_existentes(emails):
+    existentes = set()
+    for lote in em_lotes(emails):
+        existentes.update(
+            Aluno.objects.filter(email__in=lote).values_list('email', flat=True)
+        )
+    return existentes
+
+
+def validar_aluno(linha):
+    """Normaliza e valida uma linha de importação (como no registro)"""
+    try:
+        username = User.normalize_username(str(linha['username']).strip())
+        email = User.objects.normalize_email(str(linha['email']).strip())
+        nome = str(linha['nome']).strip()
+        senha = str(linha['password'])
+    except (KeyError, TypeError, AttributeError):
+        raise ValueError('Informe username, password, nome e email.')
+    telefone = str(linha.get('telefone') or '').strip()
+
+    if not username or not nome:
+        raise ValueError('Informe username, password, nome e email.')
+    if len(username) > 150 or len(nome) > 200 or len(telefone) > 20:
+        raise ValueError('Campo excede o tamanho máximo.')
+    if len(senha) < 8:
+        raise ValueError('A senha deve ter pelo menos 8 caracteres.')
+    try:
+        validate_email(email)
+    except ValidationError:
+        raise ValueError('Email inválido.')
+    return {
+        'username': username, 'email': email, 'nome': nome,
+        'telefone': telefone, 'password': senha,
+    }
+
+
+def criar_alunos(lote, tentativas=2):
+    """
+    Insere ``User`` + ``Aluno`` do lote (resultado, dados, hash) em uma
+    transação. Se outra requisição criou um dos usernames/emails depois
+    da validação, essas linhas viram erro e as demais são inseridas de novo.
+    """
+    for _ in range(tentativas):
+        try:
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(
+                        username=dados['username'], email=dados['email'],
+                        password=senha_hash
+                    )
+                    for _, dados, senha_hash in lote
+                ])
+                alunos = Aluno.objects.bulk_create([
+                    Aluno(
+                        user=user, nome=dados['nome'], email=dados['email'],
+                        telefone=dados['telefone']
+                    )
+                    for (_, dados, _), user in zip(lote, users)
+                ])
+        except IntegrityError:
+            usernames = usernames_existentes(
+                {dados['username'] for _, dados, _ in lote}
+            )
+            emails = emails_existentes({dados['email'] for _, dados, _ in lote})
+            restantes = []
+            for resultado, dados, senha_hash in lote:
+                if dados['username'] in usernames:
+                    resultado.update(
+                        status=STATUS_ERRO, erro='Username já existe.'
+                    )
+                elif dados['email'] in emails:
+                    resultado.update(
+                        status=STATUS_ERRO, erro='Email já cadastrado.'
+                    )
+                else:
+                    restantes.append((resultado, dados, senha_hash))
+            lote = restantes
+            continue
+        for (resultado, _, _), aluno in zip(lote, alunos):
+            resultado.update(status=STATUS_CRIADO, id=aluno.pk)
+        return
+
+    for resultado, _, _ in lote:
+        resultado.update(status=STATUS_ERRO, erro=ERRO_CONCORRENTE)
+
+
+def importar_alunos(linhas, workers=1, batch_size=BATCH_SIZE,
+                    progresso=None):
+    """
+    Cria ``User`` + ``Aluno`` para cada linha (username, password, nome,
+    email, telefone).
+
+    Com ``workers`` > 1 (ou None, nº de CPUs) as senhas são processadas
+    em um pool de processos (``gerador_de_hashes``); só o comando
+    ``importar_alunos`` usa o pool, a API gera os hashes no próprio
+    processo. As inserções usam ``bulk_create`` por lote, cada lote em sua
+    transação. ``progresso(processadas, total)`` é chamado após cada lote.
+    Retorna um resultado por linha; usernames/emails repetidos viram erros
+    da linha.
+    """
+    resultados = []
+    validas = []
+    for numero, linha in enumerate(linhas, start=1):
+        resultado = {'linha': numero}
+        resultados.append(resultado)
+        try:
+            dados = validar_aluno(linha)
+        except ValueError as exc:
+            resultado.update(status=STATUS_ERRO, erro=str(exc))
+            continue
+        resultado['username'] = dados['username']
+        validas.append((resultado, dados))
+
+    usernames = usernames_existentes({d['username'] for _, d in validas})
+    emails = emails_existentes({d['email'] for _, d in validas})
+
+    novas = []
+    for resultado, dados in validas:
+        if dados['username'] in usernames:
+            resultado.update(status=STATUS_ERRO, erro='Username já existe.')
+        elif dados['email'] in emails:
+            resultado.update(status=STATUS_ERRO, erro='Email já cadastrado.')
+        else:
+            # Também marca repetições dentro do próprio arquivo
+            usernames.add(dados['username'])
+            emails.add(dados['email'])
+            novas.append((resultado, dados))
+
+    total = len(novas)
+    processadas = 0
+    with gerador_de_hashes(workers, total) as gerar_hashes:
+        for lote in em_lotes(novas, batch_size):
+            hashes = gerar_hashes([dados['password'] for _, dados in lote])
+            criar_alunos([
+                (resultado, dados, senha_hash)
+                for (resultado, dados), senha_hash in zip(lote, hashes)
+            ])
+            processadas += len(lote)
+            if progresso:
+                progresso(processadas, total)
+
+    return resultados
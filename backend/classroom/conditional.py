@@ -0,0 +1,222 @@
+"""
+Requisições condicionais (ETag / Last-Modified) para as views da API.
+
+O validador é calculado antes de serializar, com uma única query de
+agregação sobre o queryset da view (já restrito ao usuário): total de
+linhas e maior ``atualizado_em`` do model e das relações que aparecem na
+resposta (``condicional_relacoes``). Se o cliente já tem a versão atual
+(``If-None-Match``/``If-Modified-Since``), a resposta é ``304`` sem buscar
+os dados nem serializar. Nas listagens o total do validador também
+substitui o ``COUNT(*)`` da paginação; listagens por cursor ou com
+``?count=false`` não usam o validador, que varreria a tabela toda.
+
+Em PUT/PATCH/DELETE, ``If-Match``/``If-Unmodified-Since`` evitam
+sobrescrever uma alteração feita por outro cliente (``412 Precondition
+Failed``). A verificação e a escrita rodam na mesma transação, com a linha
+travada por ``select_for_update`` (no SQLite, que ignora o lock de linha,
+a serialização vem do ``BEGIN IMMEDIATE`` do perfil de produção): dois
+clientes com o mesmo ETag não passam os dois.
+"""
+
+import hashlib
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+CABECALHOS_CONDICIONAIS = (
+    'HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH',
+    'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_UNMODIFIED_SINCE',
+)
+
+Validador = namedtuple('Validador', ['estado', 'ultima', 'total'])
+
+
+def expressoes(model, relacoes):
+    """
+    Agregações do validador. Relações diretas (FK) entram por JOIN;
+    relações reversas (ex.: ``recursos``) por subquery correlacionada,
+    para não multiplicar as linhas.
+    """
+    exprs = {'total': Count('pk'), 'ultima': Max('atualizado_em')}
+    for lookup in relacoes:
+        campo = model._meta.get_field(lookup.split('__')[0])
+        if not campo.one_to_many:
+            exprs[f'{lookup}_ultima'] = Max(f'{lookup}__atualizado_em')
+            continue
+        relacionados = campo.related_model._default_manager.filter(
+            **{campo.field.name: OuterRef('pk')}
+        ).order_by().values(campo.field.name)
+        exprs[f'{lookup}_total'] = Sum(Coalesce(Subquery(
+            relacionados.annotate(valor=Count('*')).values('valor')
+        ), 0))
+        exprs[f'{lookup}_ultima'] = Max(Subquery(
+            relacionados.annotate(valor=Max('atualizado_em')).values('valor')
+        ))
+    return exprs
+
+
+def calcular_validador(queryset, relacoes=(), extras=()):
+    model = queryset.model
+    base = model._default_manager.all()
+    if queryset.query.has_filters():
+        base = base.filter(pk__in=queryset.values('pk'))
+    valores = base.aggregate(**expressoes(model, relacoes))
+
+    datas = [
+        valor for chave, valor in valores.items()
+        if chave.endswith('ultima') and valor is not None
+    ]
+    estado = repr((sorted(valores.items()), tuple(extras)))
+    return Validador(estado, max(datas, default=None), valores['total'])
+
+
+def gerar_etag(request, validador):
+    """ETag forte: estado dos dados + URL completa + formato negociado"""
+    partes = (
+        validador.estado,
+        request.get_full_path(),
+        getattr(request, 'accepted_media_type', ''),
+    )
+    digest = hashlib.md5(
+        '|'.join(partes).encode(), usedforsecurity=False
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def resposta_condicional(request, validador):
+    """``304``/``412`` quando as pré-condições da requisição decidem, ou None"""
+    ultima = validador.ultima
+    return get_conditional_response(
+        request,
+        etag=gerar_etag(request, validador),
+        last_modified=int(ultima.timestamp()) if ultima else None,
+    )
+
+
+def aplicar_cabecalhos(request, response, validador):
+    response['ETag'] = gerar_etag(request, validador)
+    if validador.ultima:
+        response['Last-Modified'] = http_date(validador.ultima.timestamp())
+    # Respostas por usuário: o cliente guarda, mas revalida a cada uso
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class CondicionalMixin:
+    """
+    ETag/Last-Modified em ``list``/``retrieve`` e ``If-Match`` em
+    ``update``/``partial_update``/``destroy``. ``condicional_relacoes``
+    lista os lookups (a partir do model da view) cujos dados aparecem na
+    resposta.
+    """
+    condicional_relacoes = ()
+
+    def escopo_condicional(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if getattr(self, 'detail', False):
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        return queryset
+
+    def extras_condicionais(self):
+        """Valores além dos dados que alteram a resposta (ex.: a data)"""
+        return ()
+
+    def validador_condicional(self):
+        try:
+            validador = calcular_validador(
+                self.escopo_condicional(),
+                self.condicional_relacoes,
+                self.extras_condicionais(),
+            )
+        except (TypeError, ValueError, ValidationError):
+            # Lookup inválido: o fluxo normal responde 404
+            return None
+        # Sem linhas não há o que economizar (e um detalhe será 404)
+        return validador if validador.total else None
+
+    def responder_condicional(self, request, gerar, *args, **kwargs):
+        self.validador = self.validador_condicional()
+        if self.validador is not None:
+            resposta = resposta_condicional(request, self.validador)
+            if resposta is not None:
+                return resposta
+
+        response = gerar(request, *args, **kwargs)
+        if self.validador is not None and response.status_code == 200:
+            aplicar_cabecalhos(request, response, self.validador)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        paginator = self.paginator
+        dispensa_contagem = getattr(paginator, 'dispensa_contagem', None)
+        if dispensa_contagem and dispensa_contagem(request):
+            # Cursor/?count=false: o validador varreria a tabela toda
+            return super().list(request, *args, **kwargs)
+        return self.responder_condicional(
+            request, self.listar, *args, **kwargs
+        )
+
+    def listar(self, request, *args, **kwargs):
+        # O total do validador substitui o COUNT(*) da paginação
+        if self.validador is not None and self.paginator is not None:
+            self.paginator.total_conhecido = self.validador.total
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.responder_condicional(
+            request, super().retrieve, *args, **kwargs
+        )
+
+    def travar_escopo(self):
+        """Trava as linhas do escopo até o fim da transação"""
+        try:
+            escopo = self.escopo_condicional()
+            list(escopo.model._default_manager.select_for_update().filter(
+                pk__in=escopo.values('pk')
+            ).values_list('pk', flat=True))
+        except (TypeError, ValueError, ValidationError):
+            # Lookup inválido: o fluxo normal responde 404
+            pass
+
+    def escrever_condicional(self, request, escrever, *args, **kwargs):
+        """Pré-condições e escrita na mesma transação, com a linha travada"""
+        condicional = any(
+            cabecalho in request.META for cabecalho in CABECALHOS_CONDICIONAIS
+        )
+        if not condicional:
+            return escrever(request, *args, **kwargs)
+
+        with transaction.atomic():
+            self.travar_escopo()
+            validador = self.validador_condicional()
+            if validador is not None:
+                resposta = resposta_condicional(request, validador)
+                if resposta is not None:
+                    return resposta
+            return escrever(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        """PUT/PATCH com ``If-Match`` só altera a versão que o cliente viu"""
+        response = self.escrever_condicional(
+            request, super().update, *args, **kwargs
+        )
+        if response.status_code == 200:
+            validador = self.validador_condicional()
+            if validador is not None:
+                aplicar_cabecalhos(request, response, validador)
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        """DELETE com ``If-Match`` só remove a versão que o cliente viu"""
+        return self.escrever_condicional(
+            request, super().destroy, *args, **kwargs
+        )
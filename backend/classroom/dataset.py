@@ -0,0 +1,354 @@
+"""
+Geração de dados sintéticos (desenvolvimento e benchmarks).
+
+Os dados são determinísticos para uma mesma semente e data de referência
+(``hoje``): turmas espalhadas entre passado, presente e futuro, recursos
+misturando ``draft``/``acesso_previo`` e o tamanho das turmas seguindo uma
+distribuição de cauda longa (poucas turmas muito cheias, muitas pequenas).
+
+As inserções são feitas em lotes, cada lote em sua transação, e só os ids
+ficam em memória; nas tabelas grandes (usuários, alunos e matrículas) com
+``executemany`` direto, sem o custo por campo do ``bulk_create``. Como
+todos os alunos têm a mesma senha, o hash é calculado uma vez e
+reaproveitado; com ``senhas_distintas`` cada aluno recebe seu próprio hash
+(salt), calculado em paralelo por ``bulk.gerador_de_hashes``.
+
+Os alunos de demonstração (joao, maria, pedro, ana / senha123) são sempre
+os primeiros, matriculados em três turmas fixas: uma em andamento, uma que
+começa hoje e uma futura.
+"""
+
+import random
+from datetime import date, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import response_cache
+from .bulk import em_lotes, gerador_de_hashes
+from .models import (
+    Treinamento, Turma, Recurso, Aluno, Matricula, UploadRecurso,
+    ProcessamentoArquivo
+)
+
+
+BATCH_SIZE = 5000
+
+SENHA_PADRAO = 'senha123'
+
+# username, nome, telefone e índices das turmas fixas em que é matriculado
+ALUNOS_DEMO = [
+    ('joao', 'Joao Silva', '(11) 98765-4321', (0, 1, 2)),
+    ('maria', 'Maria Santos', '(11) 91234-5678', (0, 1)),
+    ('pedro', 'Pedro Costa', '(11) 99876-5432', (0,)),
+    ('ana', 'Ana Oliveira', '(11) 98888-7777', (1,)),
+]
+
+# Início das turmas fixas em relação a hoje: em andamento, hoje e futura
+INICIO_TURMAS_FIXAS = (-10, 0, 60)
+
+TEMAS = [
+    'Python', 'Django', 'React', 'SQL', 'Docker', 'Kubernetes', 'Go',
+    'TypeScript', 'Machine Learning', 'Segurança', 'Git', 'Linux',
+]
+NIVEIS = ['Fundamentos', 'Intermediário', 'Avançado', 'Na Prática']
+NOMES = [
+    'Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Fábio', 'Gabriela',
+    'Heitor', 'Isabela', 'João', 'Larissa', 'Marcos', 'Natália', 'Otávio',
+    'Paula', 'Rafael', 'Sofia', 'Tiago', 'Vanessa', 'William',
+]
+SOBRENOMES = [
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa',
+    'Ferreira', 'Almeida', 'Ribeiro', 'Carvalho', 'Gomes', 'Martins',
+]
+
+# Expoente da distribuição de tamanho das turmas (Zipf)
+ASSIMETRIA_TURMAS = 1.1
+PROB_DRAFT = 0.15
+PROB_ACESSO_PREVIO = 0.25
+PROB_MATRICULA_INATIVA = 0.1
+
+
+def escala(alunos, turmas=None, treinamentos=None):
+    """Quantidades padrão de turmas e treinamentos para ``alunos``"""
+    turmas = turmas or max(len(INICIO_TURMAS_FIXAS), alunos // 100)
+    treinamentos = treinamentos or max(3, turmas // 10)
+    return turmas, treinamentos
+
+
+def tem_dados():
+    return (
+        Treinamento.objects.exists() or Aluno.objects.exists()
+        or User.objects.filter(is_staff=False, is_superuser=False).exists()
+    )
+
+
+def limpar_dados():
+    """
+    Remove treinamentos, turmas, recursos, uploads, jobs de processamento,
+    matrículas e os alunos (com seus usuários) que não são staff. Usa ``DELETE`` direto: o
+    ``QuerySet.delete`` carregaria cada linha para disparar os signals.
+    """
+    tabela = connection.ops.quote_name
+    user = tabela(User._meta.db_table)
+    aluno = tabela(Aluno._meta.db_table)
+    nao_staff = (
+        f'SELECT id FROM {user} WHERE NOT is_staff AND NOT is_superuser'
+    )
+    # As FKs do SQLite são verificadas só no commit
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in (UploadRecurso, ProcessamentoArquivo, Matricula, Recurso,
+                      Turma, Treinamento):
+            cursor.execute(f'DELETE FROM {tabela(model._meta.db_table)}')
+        cursor.execute(
+            f'DELETE FROM {user} WHERE id IN ('
+            f'SELECT user_id FROM {aluno} WHERE user_id IN ({nao_staff}))'
+        )
+        cursor.execute(
+            f'DELETE FROM {aluno} WHERE user_id NOT IN (SELECT id FROM {user})'
+        )
+        for through in (User.groups.through, User.user_permissions.through):
+            cursor.execute(
+                f'DELETE FROM {tabela(through._meta.db_table)} '
+                f'WHERE user_id NOT IN (SELECT id FROM {user})'
+            )
+    for model in (Treinamento, Turma, Recurso, Matricula):
+        response_cache.invalidar(model)
+
+
+def em_lotes_iter(iteravel, tamanho):
+    """Como ``bulk.em_lotes``, sem materializar o iterável inteiro"""
+    lote = []
+    for item in iteravel:
+        lote.append(item)
+        if len(lote) == tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def inserir(model, objetos, batch_size):
+    """``bulk_create`` em lotes; retorna os ids na ordem de ``objetos``"""
+    ids = []
+    for lote in em_lotes(objetos, batch_size):
+        with transaction.atomic():
+            ids.extend(o.pk for o in model.objects.bulk_create(lote))
+    return ids
+
+
+def gerar_treinamentos(rng, quantidade, batch_size):
+    objetos = []
+    for numero in range(1, quantidade + 1):
+        tema = TEMAS[(numero - 1) % len(TEMAS)]
+        nivel = rng.choice(NIVEIS)
+        objetos.append(Treinamento(
+            nome=f'{tema} {nivel} {numero}',
+            descricao=f'Treinamento de {tema} ({nivel.lower()})'
+        ))
+    return inserir(Treinamento, objetos, batch_size)
+
+
+def gerar_turmas(rng, treinamentos, quantidade, hoje, batch_size):
+    objetos = []
+    for numero in range(1, quantidade + 1):
+        if numero <= len(INICIO_TURMAS_FIXAS):
+            inicio = INICIO_TURMAS_FIXAS[numero - 1]
+        else:
+            # Um ano para trás até seis meses à frente
+            inicio = rng.randint(-365, 180)
+        data_inicio = hoje + timedelta(days=inicio)
+        objetos.append(Turma(
+            treinamento_id=rng.choice(treinamentos),
+            nome=f'Turma {numero:05d}',
+            data_inicio=data_inicio,
+            data_conclusao=data_inicio + timedelta(days=rng.randint(30, 120)),
+            link_acesso=f'https://meet.example.com/turma-{numero}',
+        ))
+    return inserir(Turma, objetos, batch_size)
+
+
+def gerar_recursos(rng, turmas, por_turma, batch_size):
+    def recursos():
+        for turma_id in turmas:
+            for ordem in range(1, rng.randint(1, 2 * por_turma - 1) + 1):
+                tipo = rng.choice(Recurso.TIPO_CHOICES)[0]
+                yield Recurso(
+                    turma_id=turma_id, tipo_recurso=tipo,
+                    acesso_previo=rng.random() < PROB_ACESSO_PREVIO,
+                    draft=rng.random() < PROB_DRAFT,
+                    nome_recurso=f'Aula {ordem:02d}',
+                    descricao_recurso=f'Material da aula {ordem} ({tipo})',
+                    url_recurso=(
+                        f'https://videos.example.com/{turma_id}/{ordem}'
+                        if tipo == 'video' else None
+                    ),
+                    ordem=ordem,
+                )
+
+    total = 0
+    for lote in em_lotes_iter(recursos(), batch_size):
+        with transaction.atomic():
+            Recurso.objects.bulk_create(lote)
+        total += len(lote)
+    return total
+
+
+def dados_aluno(rng, numero):
+    if numero < len(ALUNOS_DEMO):
+        username, nome, telefone, _ = ALUNOS_DEMO[numero]
+    else:
+        username = f'aluno{numero:07d}'
+        nome = f'{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}'
+        telefone = f'(11) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}'
+    return username, nome, f'{username}@example.com', telefone
+
+
+def inserir_linhas(model, campos, linhas):
+    """
+    ``INSERT`` com ``executemany`` e valores já no formato do banco. Usado
+    nas tabelas grandes (usuários, alunos e matrículas): o ``bulk_create``
+    prepara cada valor campo a campo e domina o tempo de geração.
+    """
+    tabela = connection.ops.quote_name
+    colunas = ', '.join(
+        tabela(model._meta.get_field(campo).column) for campo in campos
+    )
+    marcadores = ', '.join(['%s'] * len(campos))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {tabela(model._meta.db_table)} ({colunas}) '
+            f'VALUES ({marcadores})',
+            linhas
+        )
+
+
+def gerar_alunos(rng, quantidade, batch_size, senhas_distintas, workers,
+                 progresso):
+    agora = connection.ops.adapt_datetimefield_value(timezone.now())
+    ids = []
+    senha_unica = None if senhas_distintas else make_password(SENHA_PADRAO)
+    with gerador_de_hashes(
+        workers, quantidade if senhas_distintas else 0
+    ) as gerar_hashes:
+        for lote in em_lotes(range(quantidade), batch_size):
+            dados = [dados_aluno(rng, numero) for numero in lote]
+            if senhas_distintas:
+                hashes = gerar_hashes([SENHA_PADRAO] * len(lote))
+            else:
+                hashes = [senha_unica] * len(lote)
+            usernames = [username for username, *_ in dados]
+            with transaction.atomic():
+                inserir_linhas(User, [
+                    'username', 'email', 'password', 'first_name',
+                    'last_name', 'is_staff', 'is_superuser', 'is_active',
+                    'date_joined',
+                ], [
+                    (username, email, senha_hash, '', '', False, False, True,
+                     agora)
+                    for (username, _, email, _), senha_hash in zip(dados, hashes)
+                ])
+                users = dict(User.objects.filter(
+                    username__in=usernames
+                ).values_list('username', 'id'))
+                inserir_linhas(Aluno, [
+                    'user', 'nome', 'email', 'telefone', 'criado_em',
+                    'atualizado_em',
+                ], [
+                    (users[username], nome, email, telefone, agora, agora)
+                    for username, nome, email, telefone in dados
+                ])
+                alunos = dict(Aluno.objects.filter(
+                    user_id__in=users.values()
+                ).values_list('user_id', 'id'))
+            ids.extend(alunos[users[username]] for username in usernames)
+            if progresso:
+                progresso('alunos', len(ids), quantidade)
+    return ids
+
+
+def gerar_matriculas(rng, alunos, turmas, por_aluno, batch_size, progresso):
+    agora = connection.ops.adapt_datetimefield_value(timezone.now())
+    # Popularidade de cada turma ~ 1 / posição^s, em ordem aleatória
+    populares = list(turmas)
+    rng.shuffle(populares)
+    pesos = list(accumulate(
+        1 / posicao ** ASSIMETRIA_TURMAS
+        for posicao in range(1, len(populares) + 1)
+    ))
+
+    total = 0
+    for inicio in range(0, len(alunos), batch_size):
+        linhas = []
+        for posicao in range(inicio, min(inicio + batch_size, len(alunos))):
+            if posicao < len(ALUNOS_DEMO):
+                escolhidas = {turmas[i] for i in ALUNOS_DEMO[posicao][3]}
+            else:
+                quantidade = min(
+                    len(populares),
+                    max(1, round(rng.expovariate(1 / por_aluno)))
+                )
+                escolhidas = set(rng.choices(
+                    populares, cum_weights=pesos, k=quantidade
+                ))
+            for turma_id in sorted(escolhidas):
+                # Matrículas dos alunos de demonstração sempre ativas
+                ativo = (
+                    posicao < len(ALUNOS_DEMO)
+                    or rng.random() >= PROB_MATRICULA_INATIVA
+                )
+                linhas.append(
+                    (turma_id, alunos[posicao], ativo, agora, agora)
+                )
+        with transaction.atomic():
+            inserir_linhas(Matricula, [
+                'turma', 'aluno', 'ativo', 'data_matricula', 'atualizado_em',
+            ], linhas)
+        total += len(linhas)
+        if progresso:
+            progresso('matriculas', total, None)
+    return total
+
+
+def gerar_dados(alunos=100, turmas=None, treinamentos=None,
+                recursos_por_turma=6, matriculas_por_aluno=2.0, seed=42,
+                hoje=None, senhas_distintas=False, workers=None,
+                batch_size=BATCH_SIZE, progresso=None):
+    """
+    Gera o conjunto de dados e retorna a quantidade criada de cada model.
+    ``progresso(etapa, feitas, total)`` é chamado após cada lote de alunos
+    e de matrículas (``total`` None quando não é conhecido de antemão).
+    """
+    if alunos < len(ALUNOS_DEMO):
+        raise ValueError(f'Informe ao menos {len(ALUNOS_DEMO)} alunos.')
+    rng = random.Random(seed)
+    hoje = hoje or date.today()
+    turmas, treinamentos = escala(alunos, turmas, treinamentos)
+
+    ids_treinamentos = gerar_treinamentos(rng, treinamentos, batch_size)
+    ids_turmas = gerar_turmas(rng, ids_treinamentos, turmas, hoje, batch_size)
+    total_recursos = gerar_recursos(
+        rng, ids_turmas, recursos_por_turma, batch_size
+    )
+    ids_alunos = gerar_alunos(
+        rng, alunos, batch_size, senhas_distintas, workers, progresso
+    )
+    total_matriculas = gerar_matriculas(
+        rng, ids_alunos, ids_turmas, matriculas_por_aluno, batch_size,
+        progresso
+    )
+
+    # Inserções em lote não disparam signals
+    for model in (Treinamento, Turma, Recurso, Matricula):
+        response_cache.invalidar(model)
+
+    return {
+        'treinamentos': len(ids_treinamentos),
+        'turmas': len(ids_turmas),
+        'recursos': total_recursos,
+        'alunos': len(ids_alunos),
+        'matriculas': total_matriculas,
+    }
@@ -0,0 +1,302 @@
+"""
+Entrega de arquivos de recursos com suporte a HTTP Range e requisições
+condicionais (ETag / Last-Modified).
+
+O modo de entrega é definido por ``settings.RECURSO_DOWNLOAD_MODE``:
+
+- ``'django'``: o worker faz o streaming do arquivo (padrão).
+- ``'x-accel'``: o nginx entrega o arquivo via ``X-Accel-Redirect``.
+- ``'x-sendfile'``: Apache/lighttpd entregam o arquivo via ``X-Sendfile``.
+"""
+
+import mimetypes
+import os
+import secrets
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import (
+    FileResponse, Http404, HttpResponse, StreamingHttpResponse
+)
+from django.utils.cache import get_conditional_response
+from django.utils.http import (
+    content_disposition_header, http_date, parse_http_date_safe
+)
+
+from .file_metadata import MIME_PADRAO
+
+
+MODO_DJANGO = 'django'
+MODO_X_ACCEL = 'x-accel'
+MODO_X_SENDFILE = 'x-sendfile'
+MODOS = (MODO_DJANGO, MODO_X_ACCEL, MODO_X_SENDFILE)
+
+CHUNK_SIZE = 64 * 1024
+
+# Acima disso o cabeçalho Range é ignorado e o arquivo vai inteiro
+MAX_RANGES = 16
+
+
+def etag_arquivo(tamanho, versao, recurso):
+    """ETag forte: tamanho e versão do arquivo e última edição do recurso"""
+    atualizado = int(recurso.atualizado_em.timestamp() * 1_000_000)
+    return f'"{tamanho:x}-{versao}-{atualizado:x}"'
+
+
+def ultima_modificacao(stat, recurso):
+    return int(max(stat.st_mtime, recurso.atualizado_em.timestamp()))
+
+
+def tipo_do_arquivo(recurso, filename):
+    """Tipo identificado pelo conteúdo (se processado) ou pela extensão"""
+    if recurso.metadados_atuais and recurso.arquivo_mime \
+            and recurso.arquivo_mime != MIME_PADRAO:
+        return recurso.arquivo_mime
+    return mimetypes.guess_type(filename)[0] or MIME_PADRAO
+
+
+def validadores(recurso, file_path):
+    """
+    Tamanho, ETag e Last-Modified do arquivo. Com os metadados gravados
+    pelo pós-processamento (ver processing.py) não há stat: a versão do
+    arquivo é o SHA-256 e a data, a da última gravação do recurso (feita
+    depois do arquivo). Sem eles (job pendente), vêm do stat.
+    """
+    if recurso.metadados_atuais:
+        tamanho = recurso.arquivo_tamanho
+        return (
+            tamanho,
+            etag_arquivo(tamanho, recurso.arquivo_sha256[:16], recurso),
+            int(recurso.atualizado_em.timestamp()),
+        )
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        raise Http404("Arquivo não encontrado")
+    return (
+        stat.st_size,
+        etag_arquivo(stat.st_size, f'{stat.st_mtime_ns:x}', recurso),
+        ultima_modificacao(stat, recurso),
+    )
+
+
+def abrir_arquivo(file_path):
+    """404 se o arquivo não existe (com os metadados, o primeiro acesso ao disco)"""
+    try:
+        return open(file_path, 'rb')
+    except FileNotFoundError:
+        raise Http404("Arquivo não encontrado")
+
+
+def parse_range(header, tamanho):
+    """
+    Interpreta um cabeçalho ``Range: bytes=...``.
+
+    Retorna None quando o cabeçalho deve ser ignorado (ausente, inválido
+    ou com intervalos demais), uma lista vazia quando nenhum intervalo é
+    satisfatível e, caso contrário, a lista de pares (inicio, fim) inclusivos.
+    """
+    if not header:
+        return None
+    unidade, _, especificacao = header.partition('=')
+    if unidade.strip().lower() != 'bytes' or not especificacao:
+        return None
+
+    intervalos = []
+    partes = especificacao.split(',')
+    if len(partes) > MAX_RANGES:
+        return None
+    for parte in partes:
+        inicio, separador, fim = parte.strip().partition('-')
+        if not separador:
+            return None
+        try:
+            if inicio == '':
+                # Sufixo: últimos N bytes
+                sufixo = int(fim)
+                if sufixo <= 0:
+                    continue
+                intervalos.append((max(tamanho - sufixo, 0), tamanho - 1))
+                continue
+            inicio = int(inicio)
+            fim = int(fim) if fim else tamanho - 1
+        except ValueError:
+            return None
+        if inicio < 0 or fim < inicio:
+            return None
+        if inicio >= tamanho:
+            continue
+        intervalos.append((inicio, min(fim, tamanho - 1)))
+    return intervalos
+
+
+def if_range_confere(request, etag, last_modified):
+    """Verifica a pré-condição ``If-Range`` (RFC 9110, 13.1.5)"""
+    valor = request.META.get('HTTP_IF_RANGE')
+    if not valor:
+        return True
+    if valor.startswith('"'):
+        return valor == etag
+    data = parse_http_date_safe(valor)
+    return data is not None and data == last_modified
+
+
+def ler_intervalo(arquivo, inicio, fim):
+    arquivo.seek(inicio)
+    restante = fim - inicio + 1
+    while restante > 0:
+        bloco = arquivo.read(min(CHUNK_SIZE, restante))
+        if not bloco:
+            break
+        restante -= len(bloco)
+        yield bloco
+
+
+def stream_intervalos(arquivo, intervalos, content_type, tamanho, boundary):
+    with arquivo:
+        if boundary is None:
+            inicio, fim = intervalos[0]
+            yield from ler_intervalo(arquivo, inicio, fim)
+            return
+        for cabecalho, (inicio, fim) in zip(
+            cabecalhos_multipart(intervalos, content_type, tamanho, boundary),
+            intervalos
+        ):
+            yield cabecalho
+            yield from ler_intervalo(arquivo, inicio, fim)
+        yield f'\r\n--{boundary}--\r\n'.encode()
+
+
+def cabecalhos_multipart(intervalos, content_type, tamanho, boundary):
+    return [
+        (
+            f'\r\n--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {inicio}-{fim}/{tamanho}\r\n\r\n'
+        ).encode()
+        for inicio, fim in intervalos
+    ]
+
+
+def resposta_parcial(arquivo, intervalos, content_type, tamanho):
+    """
+    Resposta 206 para um ou vários intervalos (multipart/byteranges).
+    ``arquivo`` já vem aberto: um arquivo ausente é 404 antes do status e
+    dos cabeçalhos serem enviados, não um erro no meio do streaming.
+    """
+    if len(intervalos) == 1:
+        inicio, fim = intervalos[0]
+        response = StreamingHttpResponse(
+            stream_intervalos(
+                arquivo, intervalos, content_type, tamanho, None
+            ),
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {inicio}-{fim}/{tamanho}'
+        response['Content-Length'] = str(fim - inicio + 1)
+        return response
+
+    boundary = secrets.token_hex(16)
+    cabecalhos = cabecalhos_multipart(
+        intervalos, content_type, tamanho, boundary
+    )
+    total = sum(len(c) for c in cabecalhos)
+    total += sum(fim - inicio + 1 for inicio, fim in intervalos)
+    total += len(f'\r\n--{boundary}--\r\n')
+    response = StreamingHttpResponse(
+        stream_intervalos(
+            arquivo, intervalos, content_type, tamanho, boundary
+        ),
+        status=206,
+        content_type=f'multipart/byteranges; boundary={boundary}'
+    )
+    response['Content-Length'] = str(total)
+    return response
+
+
+def modo_download():
+    modo = getattr(settings, 'RECURSO_DOWNLOAD_MODE', MODO_DJANGO)
+    if modo not in MODOS:
+        raise ImproperlyConfigured(
+            f"RECURSO_DOWNLOAD_MODE inválido: {modo!r}. "
+            f"Opções: {', '.join(MODOS)}"
+        )
+    return modo
+
+
+def resposta_redirect_interno(recurso, modo):
+    """
+    Resposta vazia com o cabeçalho de redirect interno. O servidor web
+    da frente entrega o arquivo (inclusive Range e condicionais).
+    """
+    filename = os.path.basename(recurso.arquivo.name)
+    response = HttpResponse(content_type=tipo_do_arquivo(recurso, filename))
+    if modo == MODO_X_ACCEL:
+        prefixo = getattr(
+            settings, 'RECURSO_DOWNLOAD_INTERNAL_URL', '/protected/'
+        )
+        response['X-Accel-Redirect'] = (
+            prefixo.rstrip('/') + '/' + quote(recurso.arquivo.name)
+        )
+    else:
+        # Percent-encoded como no X-Accel: nomes com acento viram ASCII (o
+        # mod_xsendfile decodifica com XSendFileUnescape, ligado por padrão)
+        response['X-Sendfile'] = quote(recurso.arquivo.path)
+    response['Content-Disposition'] = content_disposition_header(
+        True, filename
+    )
+    return response
+
+
+def servir_arquivo(request, recurso):
+    """
+    Entrega o arquivo do recurso respeitando ``Range``, ``If-Range``,
+    ``If-None-Match`` e ``If-Modified-Since``. A autorização deve ter
+    sido feita antes.
+    """
+    modo = modo_download()
+    if modo != MODO_DJANGO:
+        return resposta_redirect_interno(recurso, modo)
+
+    file_path = recurso.arquivo.path
+    tamanho, etag, last_modified = validadores(recurso, file_path)
+
+    # 304 Not Modified / 412 Precondition Failed
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        return response
+
+    filename = os.path.basename(file_path)
+    content_type = tipo_do_arquivo(recurso, filename)
+
+    intervalos = None
+    if if_range_confere(request, etag, last_modified):
+        intervalos = parse_range(request.META.get('HTTP_RANGE'), tamanho)
+
+    if intervalos is None:
+        response = FileResponse(
+            abrir_arquivo(file_path),
+            as_attachment=True,
+            filename=filename,
+            content_type=content_type
+        )
+        response['Content-Length'] = str(tamanho)
+    elif not intervalos:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{tamanho}'
+    else:
+        response = resposta_parcial(
+            abrir_arquivo(file_path), intervalos, content_type, tamanho
+        )
+        response['Content-Disposition'] = content_disposition_header(
+            True, filename
+        )
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
@@ -0,0 +1,167 @@
+"""
+Exportação completa das listagens em CSV ou NDJSON (``GET .../exportar/``).
+
+A resposta é um ``StreamingHttpResponse``: o cabeçalho do CSV sai antes da
+consulta, e as linhas são lidas do banco em lotes de ``EXPORTACAO_LOTE``
+(``.iterator(chunk_size=...)``, sem cache do queryset) e enviadas a cada
+lote, então a memória não cresce com o total de linhas. As linhas vêm do
+``PlanoLeitura`` de ``fastpath.py`` (``.values()``, mesmo JSON da API); se
+o serializer não puder ser compilado, cada lote é serializado a partir
+das instâncias.
+
+Os filtros, a ordenação e a seleção de campos (``?fields=``, ``?omit=``,
+``?expand=``) são os da listagem; não há paginação. No CSV os objetos
+aninhados viram colunas com ponto (``turma.nome``) e as listas, JSON.
+Textos que começam com ``=``, ``+``, ``-``, ``@``, tab ou CR ganham um
+``'`` na frente no CSV, para a planilha não os executar como fórmula.
+"""
+
+import csv
+import io
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.response import Response
+
+from .fastpath import compilar
+from .renderers import OrjsonRenderer
+
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+FORMATO_PADRAO = 'csv'
+
+json_renderer = OrjsonRenderer()
+
+
+def tamanho_lote():
+    return getattr(settings, 'EXPORTACAO_LOTE', 2000)
+
+
+def em_lotes(iteravel, tamanho):
+    iterador = iter(iteravel)
+    while lote := list(islice(iterador, tamanho)):
+        yield lote
+
+
+def lotes_serializados(queryset, serializer, tamanho):
+    """Representações das linhas de ``queryset``, um lote por vez"""
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    plano = compilar(serializer)
+    if plano is not None:
+        linhas = plano.linhas(queryset).iterator(chunk_size=tamanho)
+        for lote in em_lotes(linhas, tamanho):
+            yield plano.mapear(lote)
+        return
+    for lote in em_lotes(queryset.iterator(chunk_size=tamanho), tamanho):
+        yield [serializer.to_representation(instancia) for instancia in lote]
+
+
+def colunas(serializer, prefixo=()):
+    """Caminhos das colunas do CSV (aninhados ``many`` em uma coluna só)"""
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    for nome, campo in serializer.fields.items():
+        if campo.write_only:
+            continue
+        caminho = prefixo + (nome,)
+        if isinstance(campo, serializers.BaseSerializer) \
+                and not isinstance(campo, serializers.ListSerializer):
+            yield from colunas(campo, caminho)
+        else:
+            yield caminho
+
+
+# Início de texto que planilhas interpretam como fórmula
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def celula(linha, caminho):
+    valor = linha
+    for nome in caminho:
+        if valor is None:
+            break
+        valor = valor[nome]
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'true' if valor else 'false'
+    if isinstance(valor, (list, dict)):
+        return json_renderer.render(valor).decode()
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def gerar_csv(lotes, caminhos):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def conteudo():
+        texto = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return texto.encode()
+
+    writer.writerow(['.'.join(caminho) for caminho in caminhos])
+    yield conteudo()
+    for lote in lotes:
+        for linha in lote:
+            writer.writerow([celula(linha, caminho) for caminho in caminhos])
+        yield conteudo()
+
+
+def gerar_ndjson(lotes):
+    for lote in lotes:
+        yield b''.join(json_renderer.render(linha) + b'\n' for linha in lote)
+
+
+def resposta_exportacao(queryset, serializer, formato, nome):
+    content_type, extensao = FORMATOS[formato]
+    tamanho = tamanho_lote()
+    lotes = lotes_serializados(queryset, serializer, tamanho)
+    if formato == 'csv':
+        conteudo = gerar_csv(lotes, list(colunas(serializer)))
+    else:
+        conteudo = gerar_ndjson(lotes)
+    response = StreamingHttpResponse(conteudo, content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="{nome}.{extensao}"'
+    )
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+class NegociacaoExportacao(DefaultContentNegotiation):
+    """O formato vem de ``?formato=``; erros sempre no renderer padrão"""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class ExportacaoMixin:
+    """Ação ``exportar`` (``?formato=csv|ndjson``) com os filtros da listagem"""
+    # Nome do arquivo baixado (sem extensão)
+    exportacao_nome = None
+
+    @action(detail=False, methods=['get'],
+            content_negotiation_class=NegociacaoExportacao)
+    def exportar(self, request):
+        formato = request.query_params.get('formato', FORMATO_PADRAO)
+        if formato not in FORMATOS:
+            return Response(
+                {'error': f"Formato inválido; use {' ou '.join(FORMATOS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        return resposta_exportacao(
+            queryset, self.get_serializer(), formato,
+            self.exportacao_nome or queryset.model._meta.model_name
+        )
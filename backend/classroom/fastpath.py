@@ -0,0 +1,303 @@
+"""
+Caminho rápido de leitura para as listagens.
+
+Na listagem normal o DRF cria uma instância de model por linha e chama o
+``get_attribute``/``to_representation`` de cada campo, percorrendo as FKs
+objeto por objeto. Aqui o serializer da requisição (já com a seleção de
+``fieldsets.py``) é compilado uma vez em um ``PlanoLeitura``: a lista de
+lookups para um único ``.values()`` (com os JOINs das FKs) e, para cada
+campo, uma função que lê a coluna do dicionário da linha e aplica o
+``to_representation`` do próprio campo do serializer. O JSON é idêntico ao
+do serializer (mesmas chaves, na mesma ordem, mesmos valores).
+
+Aninhados ``many`` viram uma segunda consulta ``.values()`` filtrada pelos
+ids da página, na ordenação padrão do model (a mesma do prefetch). Campos
+que não podem ser compilados (métodos sem anotação, ``source='*'``,
+propriedades, FKs anuláveis no meio de um caminho, prefetches filtrados)
+fazem a listagem usar o serializer normal.
+
+``LEITURA_RAPIDA = False`` em ``settings.py`` desliga o caminho rápido.
+"""
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.encoding import force_str
+from django.utils.hashable import make_hashable
+from rest_framework import serializers
+from rest_framework.relations import PKOnlyObject
+from rest_framework.response import Response
+
+from .fieldsets import SelecaoCamposMixin
+from .metrics import medir_serializacao
+
+
+PREFIXO_DISPLAY = 'get_'
+SUFIXO_DISPLAY = '_display'
+
+
+class NaoCompilavel(Exception):
+    """O serializer tem um campo que o caminho rápido não reproduz"""
+
+
+def leitura_rapida_ativa():
+    return getattr(settings, 'LEITURA_RAPIDA', True)
+
+
+class PlanoLeitura:
+    """Colunas do ``.values()`` e extratores dos campos de um serializer"""
+
+    def __init__(self, model):
+        self.model = model
+        self.colunas = []
+        self.anotacoes = {}
+        # (nome do campo, função(linha, grupos) -> valor)
+        self.campos = []
+        # (chave do id do pai na linha, FK do filho, plano do filho)
+        self.listas = []
+
+    def coluna(self, lookup):
+        if lookup not in self.colunas:
+            self.colunas.append(lookup)
+        return lookup
+
+    def compilar(self, serializer, model, prefixo=''):
+        """Extratores dos campos de ``serializer`` lidos em ``prefixo``"""
+        extratores = []
+        for nome, campo in serializer.fields.items():
+            if campo.write_only:
+                continue
+            extratores.append(
+                (nome, self.compilar_campo(serializer, nome, campo, model, prefixo))
+            )
+        return extratores
+
+    def compilar_campo(self, serializer, nome, campo, model, prefixo):
+        if nome in getattr(serializer, 'anotacoes', {}):
+            # O campo devolve o valor anotado (ver ``anotacoes``)
+            if prefixo:
+                raise NaoCompilavel(nome)
+            self.anotacoes[nome] = serializer.anotacoes[nome]
+            chave = self.coluna(nome)
+            return lambda linha, grupos: linha[chave]
+        if isinstance(campo, serializers.ListSerializer):
+            return self.compilar_lista(serializer, nome, campo, model, prefixo)
+        if isinstance(campo, serializers.BaseSerializer):
+            return self.compilar_aninhado(campo, model, prefixo)
+        if isinstance(campo, serializers.RelatedField):
+            return self.compilar_pk(campo, model, prefixo)
+        if campo.source == '*' or isinstance(
+                campo, serializers.SerializerMethodField):
+            raise NaoCompilavel(nome)
+        return self.compilar_coluna(campo, model, prefixo)
+
+    def caminho(self, model, prefixo, atributos):
+        """
+        Segue as FKs de ``atributos`` (exceto o último) a partir de
+        ``model``; retorna o model e o prefixo do último atributo.
+        """
+        for atributo in atributos[:-1]:
+            try:
+                fk = model._meta.get_field(atributo)
+            except FieldDoesNotExist:
+                raise NaoCompilavel(atributo)
+            # FK nula no meio do caminho: o DRF omite o campo (SkipField)
+            if not (fk.many_to_one or fk.one_to_one) or not fk.concrete \
+                    or fk.null:
+                raise NaoCompilavel(atributo)
+            model = fk.related_model
+            prefixo += atributo + LOOKUP_SEP
+        return model, prefixo
+
+    def compilar_coluna(self, campo, model, prefixo):
+        model, prefixo = self.caminho(model, prefixo, campo.source_attrs)
+        atributo = campo.source_attrs[-1]
+        to_representation = campo.to_representation
+
+        if (atributo.startswith(PREFIXO_DISPLAY)
+                and atributo.endswith(SUFIXO_DISPLAY)):
+            # get_FOO_display(): mesmo cálculo do Model._get_FIELD_display
+            nome_campo = atributo[len(PREFIXO_DISPLAY):-len(SUFIXO_DISPLAY)]
+            campo_modelo = self.campo_do_modelo(model, nome_campo)
+            if not campo_modelo.choices:
+                raise NaoCompilavel(atributo)
+            choices = dict(make_hashable(campo_modelo.flatchoices))
+            chave = self.coluna(prefixo + nome_campo)
+
+            def display(linha, grupos):
+                valor = linha[chave]
+                valor = force_str(
+                    choices.get(make_hashable(valor), valor),
+                    strings_only=True
+                )
+                return None if valor is None else to_representation(valor)
+            return display
+
+        campo_modelo = self.campo_do_modelo(model, atributo)
+        if campo_modelo.is_relation:
+            raise NaoCompilavel(atributo)
+        chave = self.coluna(prefixo + campo_modelo.name)
+
+        if isinstance(campo_modelo, models.FileField):
+            # O DRF recebe o FieldFile (url/nome a partir do storage)
+            classe = campo_modelo.attr_class
+
+            def arquivo(linha, grupos):
+                return to_representation(
+                    classe(None, campo_modelo, linha[chave])
+                )
+            return arquivo
+
+        def coluna(linha, grupos):
+            valor = linha[chave]
+            return None if valor is None else to_representation(valor)
+        return coluna
+
+    def campo_do_modelo(self, model, nome):
+        try:
+            campo = model._meta.get_field(nome)
+        except FieldDoesNotExist:
+            raise NaoCompilavel(nome)
+        if not campo.concrete or campo.many_to_many:
+            raise NaoCompilavel(nome)
+        return campo
+
+    def compilar_pk(self, campo, model, prefixo):
+        """``PrimaryKeyRelatedField``: o id da FK, sem carregar o objeto"""
+        if not isinstance(campo, serializers.PrimaryKeyRelatedField) \
+                or not campo.use_pk_only_optimization() \
+                or len(campo.source_attrs) != 1:
+            raise NaoCompilavel(campo.field_name)
+        fk = self.campo_do_modelo(model, campo.source)
+        if not fk.is_relation:
+            raise NaoCompilavel(campo.field_name)
+        chave = self.coluna(prefixo + fk.name)
+        to_representation = campo.to_representation
+
+        def pk(linha, grupos):
+            valor = linha[chave]
+            if valor is None:
+                return None
+            return to_representation(PKOnlyObject(pk=valor))
+        return pk
+
+    def compilar_aninhado(self, campo, model, prefixo):
+        """Serializer de uma FK: colunas do objeto relacionado pelo JOIN"""
+        if len(campo.source_attrs) != 1:
+            raise NaoCompilavel(campo.field_name)
+        fk = self.campo_do_modelo(model, campo.source)
+        if not (fk.many_to_one or fk.one_to_one):
+            raise NaoCompilavel(campo.field_name)
+        chave = self.coluna(prefixo + fk.name)
+        extratores = self.compilar(
+            campo, fk.related_model, prefixo + fk.name + LOOKUP_SEP
+        )
+
+        def aninhado(linha, grupos):
+            if linha[chave] is None:
+                return None
+            return {
+                nome: extrator(linha, grupos) for nome, extrator in extratores
+            }
+        return aninhado
+
+    def compilar_lista(self, serializer, nome, campo, model, prefixo):
+        """Aninhado ``many`` de uma relação reversa: segunda consulta"""
+        if type(serializer).prefetch is not SelecaoCamposMixin.prefetch:
+            # Prefetch filtrado pelo serializer (ex.: recursos visíveis)
+            raise NaoCompilavel(nome)
+        relacao = getattr(serializer, 'relacoes', {}).get(nome, campo.source)
+        try:
+            campo_modelo = model._meta.get_field(relacao)
+        except FieldDoesNotExist:
+            raise NaoCompilavel(nome)
+        if not campo_modelo.one_to_many:
+            raise NaoCompilavel(nome)
+
+        relacionado = campo_modelo.related_model
+        filho = PlanoLeitura(relacionado)
+        fk = filho.coluna(campo_modelo.field.attname)
+        filho.campos = filho.compilar(campo.child, relacionado)
+        chave = self.coluna(prefixo + model._meta.pk.name)
+        indice = len(self.listas)
+        self.listas.append((chave, fk, filho))
+
+        def lista(linha, grupos):
+            return grupos[indice].get(linha[chave], [])
+        return lista
+
+    def linhas(self, queryset, extras=()):
+        """``queryset`` como ``.values()`` com as colunas do plano"""
+        anotacoes = {
+            nome: funcao() for nome, funcao in self.anotacoes.items()
+            if nome not in queryset.query.annotations
+        }
+        if anotacoes:
+            queryset = queryset.annotate(**anotacoes)
+        colunas = list(self.colunas)
+        colunas += [extra for extra in extras if extra not in colunas]
+        return queryset.prefetch_related(None).values(*colunas)
+
+    def mapear(self, linhas):
+        """Representação das ``linhas`` (já lidas), como a do serializer"""
+        linhas = list(linhas)
+        grupos = [
+            filho.agrupar(fk, {linha[chave] for linha in linhas} - {None})
+            for chave, fk, filho in self.listas
+        ]
+        campos = self.campos
+        return [
+            {nome: extrator(linha, grupos) for nome, extrator in campos}
+            for linha in linhas
+        ]
+
+    def agrupar(self, fk, ids):
+        """Linhas filhas de ``ids`` mapeadas e agrupadas pela FK"""
+        grupos = {}
+        if not ids:
+            return grupos
+        queryset = self.model._default_manager.filter(**{f'{fk}__in': ids})
+        linhas = list(self.linhas(queryset))
+        for linha, dados in zip(linhas, self.mapear(linhas)):
+            grupos.setdefault(linha[fk], []).append(dados)
+        return grupos
+
+
+def compilar(serializer):
+    """``PlanoLeitura`` do serializer, ou None se algum campo não couber"""
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    model = serializer.Meta.model
+    plano = PlanoLeitura(model)
+    try:
+        plano.campos = plano.compilar(serializer, model)
+    except NaoCompilavel:
+        return None
+    return plano
+
+
+class LeituraRapidaMixin:
+    """``list`` pelo ``PlanoLeitura`` quando o serializer permite"""
+
+    def list(self, request, *args, **kwargs):
+        plano = None
+        if leitura_rapida_ativa():
+            plano = compilar(self.get_serializer())
+        if plano is None:
+            return super().list(request, *args, **kwargs)
+
+        # A paginação por cursor lê os campos da ordenação das linhas
+        extras = [
+            campo.lstrip('-') for campo in getattr(self, 'keyset_ordering', ())
+        ]
+        queryset = plano.linhas(
+            self.filter_queryset(self.get_queryset()), extras
+        )
+        page = self.paginate_queryset(queryset)
+        linhas = page if page is not None else queryset
+        with medir_serializacao():
+            dados = plano.mapear(linhas)
+        if page is not None:
+            return self.get_paginated_response(dados)
+        return Response(dados)
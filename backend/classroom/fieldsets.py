@@ -0,0 +1,312 @@
+"""
+Seleção de campos das respostas: ``?fields=``, ``?omit=`` e ``?expand=``.
+
+``fields=id,nome,recursos.nome_recurso`` mantém só os campos listados (com
+ponto, os de um serializer aninhado; um aninhado pedido sem subcampos vem
+inteiro), ``omit=descricao,recursos`` remove campos e ``expand=treinamento``
+troca o id de uma FK pelo objeto (ver ``expansoes`` de cada serializer;
+``expand=turma.treinamento`` expande dentro da expansão). Nomes
+desconhecidos são ignorados. A seleção vale só em GET/HEAD: nas escritas
+os campos são sempre os mesmos.
+
+``otimizar`` leva os campos do serializer (já com a seleção) para o SQL:
+``only()`` com as colunas usadas, ``select_related`` das FKs lidas,
+``Prefetch`` (também com ``only()``) só dos aninhados ``many`` pedidos e
+as ``anotacoes`` só dos campos pedidos. Campos que não vêm de uma coluna
+declaram as colunas de que dependem em ``dependencias``; se algum campo
+não puder ser mapeado, o queryset carrega todas as colunas.
+"""
+
+import sys
+from collections import namedtuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework import serializers
+
+
+METODOS_SELECAO = ('GET', 'HEAD')
+
+PARAMETROS = {'campos': 'fields', 'omitir': 'omit', 'expandir': 'expand'}
+
+
+def ler_caminhos(valor):
+    """``'id,recursos.nome'`` -> ``{('id',), ('recursos', 'nome')}``"""
+    return {
+        tuple(parte.strip() for parte in item.split('.'))
+        for item in valor.split(',') if item.strip()
+    }
+
+
+def filhos(caminhos, caminho):
+    """Nomes logo abaixo de ``caminho`` nos ``caminhos`` pedidos"""
+    nivel = len(caminho)
+    return {
+        pedido[nivel] for pedido in caminhos
+        if len(pedido) > nivel and pedido[:nivel] == caminho
+    }
+
+
+def caminho_do_serializer(serializer):
+    """Nomes dos campos da raiz até ``serializer`` (ex.: ``('recursos',)``)"""
+    partes = []
+    while serializer.parent is not None:
+        # O filho de um ListSerializer tem field_name vazio
+        if serializer.field_name:
+            partes.append(serializer.field_name)
+        serializer = serializer.parent
+    return tuple(reversed(partes))
+
+
+class Selecao:
+    """Caminhos pedidos em ``fields`` (None: todos), ``omit`` e ``expand``"""
+
+    def __init__(self, campos=None, omitir=(), expandir=()):
+        self.campos = campos
+        self.omitir = set(omitir)
+        self.expandir = set(expandir)
+
+    @classmethod
+    def da_requisicao(cls, request):
+        if getattr(request, 'method', None) not in METODOS_SELECAO:
+            return None
+        params = request.GET
+        if not any(nome in params for nome in PARAMETROS.values()):
+            return None
+        campos = params.get(PARAMETROS['campos'])
+        return cls(
+            ler_caminhos(campos) if campos is not None else None,
+            ler_caminhos(params.get(PARAMETROS['omitir'], '')),
+            ler_caminhos(params.get(PARAMETROS['expandir'], '')),
+        )
+
+    def aplicar(self, serializer, fields, caminho):
+        if self.campos is not None:
+            pedidos = filhos(self.campos, caminho)
+            if pedidos or not caminho:
+                fields = {
+                    nome: campo for nome, campo in fields.items()
+                    if nome in pedidos
+                }
+        for pedido in self.omitir:
+            if pedido[:-1] == caminho:
+                fields.pop(pedido[-1], None)
+        for nome in filhos(self.expandir, caminho):
+            if nome in fields and nome in serializer.expansoes:
+                fields[nome] = serializer.expandir(nome, fields[nome])
+        return fields
+
+
+class SelecaoCamposMixin:
+    """
+    Aplica a ``Selecao`` da requisição do contexto aos campos do
+    serializer (raiz ou aninhado).
+
+    - ``expansoes``: campo -> serializer que o substitui em ``?expand=``
+      (classe ou nome de uma classe do mesmo módulo);
+    - ``dependencias``: campo calculado -> lookups das colunas que ele lê;
+    - ``anotacoes``: campo -> função que retorna a expressão anotada;
+    - ``relacoes``: aninhado ``many`` -> relação do model, quando o
+      ``source`` não é a própria relação.
+    """
+    expansoes = {}
+    dependencias = {}
+    anotacoes = {}
+    relacoes = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selecao = Selecao.da_requisicao(self.context.get('request'))
+        if selecao is None:
+            return fields
+        return selecao.aplicar(self, fields, caminho_do_serializer(self))
+
+    def expandir(self, nome, campo):
+        classe = self.expansoes[nome]
+        if isinstance(classe, str):
+            classe = getattr(sys.modules[type(self).__module__], classe)
+        return classe(read_only=True, source=campo.source)
+
+    def prefetch(self, nome, lookup, queryset):
+        """Prefetch do aninhado ``many`` ``nome``; sobrescrever para filtrar"""
+        return Prefetch(lookup, queryset=queryset)
+
+
+# Objeto pai de um prefetch: FK do filho para ele, plano e caminho no plano
+Pai = namedtuple('Pai', ['fk', 'plano', 'model', 'prefixo'])
+
+
+class Plano:
+    """Colunas, relações e anotações de um queryset (ver ``otimizar``)"""
+
+    def __init__(self, model, pai=None):
+        self.model = model
+        self.pai = pai
+        self.colunas = {model._meta.pk.name}
+        self.todas_as_colunas = False
+        self.relacionados = set()
+        self.prefetches = []
+        self.anotacoes = {}
+        # FKs carregadas por prefetch (lookup -> plano do model da FK)
+        self.fks_em_prefetch = {}
+
+    def incluir(self, serializer, model, prefixo=''):
+        for nome, campo in serializer.fields.items():
+            if campo.write_only:
+                continue
+            if nome in getattr(serializer, 'anotacoes', {}):
+                self.anotacoes[nome] = serializer.anotacoes[nome]()
+                continue
+            if nome in getattr(serializer, 'dependencias', {}):
+                for lookup in serializer.dependencias[nome]:
+                    self.lookup(model, prefixo, lookup)
+                continue
+            if isinstance(campo, serializers.ListSerializer):
+                self.incluir_prefetch(serializer, nome, campo, model, prefixo)
+            elif isinstance(campo, serializers.BaseSerializer):
+                self.incluir_relacionado(campo, model, prefixo)
+            elif campo.source == '*':
+                self.todas_as_colunas = True
+            else:
+                self.lookup(model, prefixo, LOOKUP_SEP.join(campo.source_attrs))
+
+    def incluir_relacionado(self, campo, model, prefixo):
+        """Serializer aninhado de uma FK: ``select_related``"""
+        if not prefixo and self.pai and campo.source == self.pai.fk:
+            # FK para o pai do prefetch: o Django já a preenche com ele
+            self.colunas.add(campo.source)
+            self.pai.plano.incluir(campo, self.pai.model, self.pai.prefixo)
+            return
+        campo_modelo = self.lookup(model, prefixo, campo.source)
+        if campo_modelo is None or not campo_modelo.is_relation:
+            self.todas_as_colunas = True
+            return
+
+        relacionado = campo_modelo.related_model
+        anotacoes = getattr(campo, 'anotacoes', {})
+        if any(nome in anotacoes for nome in campo.fields):
+            # Anotações não cabem no JOIN: a FK vem em um prefetch
+            lookup = prefixo + campo.source
+            filho = self.fks_em_prefetch.get(lookup) or Plano(relacionado)
+            self.fks_em_prefetch[lookup] = filho
+            filho.incluir(campo, relacionado)
+            return
+        self.relacionados.add(prefixo + campo.source)
+        self.incluir(campo, relacionado, prefixo + campo.source + LOOKUP_SEP)
+
+    def incluir_prefetch(self, serializer, nome, campo, model, prefixo):
+        """Serializer aninhado ``many`` de uma relação reversa: ``Prefetch``"""
+        relacao = getattr(serializer, 'relacoes', {}).get(nome, campo.source)
+        try:
+            campo_modelo = model._meta.get_field(relacao)
+        except FieldDoesNotExist:
+            return
+        lookup = prefixo + relacao
+        if not campo_modelo.one_to_many:
+            self.prefetches.append(serializer.prefetch(nome, lookup, None))
+            return
+
+        relacionado = campo_modelo.related_model
+        fk = campo_modelo.field.name
+        filho = Plano(relacionado, Pai(fk, self, model, prefixo))
+        # O prefetch associa cada linha ao pai pela FK
+        filho.colunas.add(fk)
+        filho.incluir(campo.child, relacionado)
+        queryset = filho.aplicar(relacionado._default_manager.all())
+        self.prefetches.append(serializer.prefetch(nome, lookup, queryset))
+
+    def lookup(self, model, prefixo, lookup):
+        """
+        Inclui as colunas (e FKs no caminho) de ``lookup``; retorna o campo
+        final do model, ou None se o lookup não for de colunas.
+        """
+        partes = lookup.split(LOOKUP_SEP)
+        if (not prefixo and self.pai and partes[0] == self.pai.fk
+                and len(partes) > 1):
+            self.colunas.add(partes[0])
+            return self.pai.plano.lookup(
+                self.pai.model, self.pai.prefixo, LOOKUP_SEP.join(partes[1:])
+            )
+
+        campo = None
+        for indice, parte in enumerate(partes):
+            if parte == 'pk':
+                parte = model._meta.pk.name
+            try:
+                campo = model._meta.get_field(parte)
+            except FieldDoesNotExist:
+                campo = None
+            if campo is None or not campo.concrete or campo.many_to_many:
+                self.todas_as_colunas = True
+                return None
+            self.colunas.add(prefixo + parte)
+            if indice < len(partes) - 1:
+                if not campo.is_relation:
+                    self.todas_as_colunas = True
+                    return None
+                self.relacionados.add(prefixo + parte)
+                model = campo.related_model
+                prefixo += parte + LOOKUP_SEP
+        return campo
+
+    def aplicar(self, queryset):
+        prefetches = []
+        for lookup, filho in self.fks_em_prefetch.items():
+            # O que outros campos leem da FK também vem no prefetch
+            inicio = lookup + LOOKUP_SEP
+            for coluna in sorted(self.colunas):
+                if coluna.startswith(inicio):
+                    self.colunas.discard(coluna)
+                    filho.lookup(filho.model, '', coluna[len(inicio):])
+            self.relacionados = {
+                relacionado for relacionado in self.relacionados
+                if relacionado != lookup and not relacionado.startswith(inicio)
+            }
+            prefetches.append(Prefetch(
+                lookup, queryset=filho.aplicar(filho.model._default_manager.all())
+            ))
+        # Antes dos demais, que podem passar pela FK
+        prefetches += self.prefetches
+
+        if self.relacionados:
+            queryset = queryset.select_related(*sorted(self.relacionados))
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        if self.anotacoes:
+            queryset = queryset.annotate(**self.anotacoes)
+        if not self.todas_as_colunas:
+            queryset = queryset.only(*sorted(self.colunas))
+        return queryset
+
+
+def otimizar(queryset, serializer, extras=()):
+    """
+    ``queryset`` com as colunas, relações e anotações de que ``serializer``
+    (instância com o contexto da requisição) precisa. ``extras`` são
+    colunas lidas fora do serializer (ex.: os campos do cursor).
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    plano = Plano(queryset.model)
+    plano.incluir(serializer, queryset.model)
+    for lookup in extras:
+        plano.lookup(queryset.model, '', lookup)
+    return plano.aplicar(queryset)
+
+
+class SelecaoQuerysetMixin:
+    """ViewSets: ``otimizar`` o queryset com os campos desta requisição"""
+
+    def otimizar_queryset(self, queryset):
+        serializer = self.get_serializer_class()(
+            context={'request': self.request}
+        )
+        # A paginação por cursor lê os campos da ordenação das instâncias
+        extras = [
+            campo.lstrip('-') for campo in getattr(self, 'keyset_ordering', ())
+        ]
+        return otimizar(queryset, serializer, extras)
+
+    def get_queryset(self):
+        return self.otimizar_queryset(super().get_queryset())
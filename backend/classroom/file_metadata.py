@@ -0,0 +1,206 @@
+"""
+Metadados dos arquivos de recursos, extraídos só com a biblioteca padrão.
+
+``extrair(caminho)`` lê o arquivo uma vez (em blocos) para o tamanho e o
+SHA-256 e identifica o tipo real pelo conteúdo (assinatura no início do
+arquivo), não pela extensão. Conforme o tipo:
+
+- PDF: número de páginas (``/Count`` da raiz da árvore de páginas,
+  inclusive dentro de object streams comprimidos).
+- MP4/MOV: duração do ``mvhd`` (só os cabeçalhos dos boxes são lidos).
+- AVI: duração pelo cabeçalho ``avih`` (frames x microssegundos/frame).
+
+Arquivos malformados não são erro: o campo que não pôde ser lido fica
+``None``. Erros de leitura do arquivo (``OSError``) são propagados.
+"""
+
+import hashlib
+import re
+import struct
+import zlib
+
+
+CHUNK_SIZE = 1024 * 1024
+
+# PDFs maiores que isso ficam sem número de páginas (o parser lê tudo)
+PDF_MAX_BYTES = 64 * 1024 * 1024
+
+# Limite de bytes descomprimidos por object stream (contra zip bombs);
+# streams maiores são ignorados
+OBJSTM_MAX_BYTES = 8 * 1024 * 1024
+
+MIME_PADRAO = 'application/octet-stream'
+
+# Marcas (ftyp) do QuickTime; as demais são tratadas como MP4
+MARCAS_QUICKTIME = {b'qt  '}
+
+OBJETO_PDF = re.compile(rb'\d+\s+\d+\s+obj\b(.*?)\bendobj', re.S)
+STREAM_PDF = re.compile(rb'stream\r?\n(.*?)endstream', re.S)
+PAGINAS_PDF = re.compile(rb'/Type\s*/Pages\b')
+CONTAGEM_PDF = re.compile(rb'/Count\s+(\d+)')
+OBJSTM_PDF = re.compile(rb'/Type\s*/ObjStm\b')
+INTEIRO_PDF = {
+    nome: re.compile(rb'/' + nome + rb'\s+(\d+)') for nome in (b'N', b'First')
+}
+
+
+def extrair(caminho):
+    """Tamanho, SHA-256, MIME e páginas/duração do arquivo em ``caminho``"""
+    sha256 = hashlib.sha256()
+    tamanho = 0
+    inicio = b''
+    with open(caminho, 'rb') as arquivo:
+        while bloco := arquivo.read(CHUNK_SIZE):
+            if not tamanho:
+                inicio = bloco[:64]
+            sha256.update(bloco)
+            tamanho += len(bloco)
+
+        mime = tipo_do_conteudo(inicio)
+        paginas = duracao_ms = None
+        if mime == 'application/pdf' and tamanho <= PDF_MAX_BYTES:
+            arquivo.seek(0)
+            paginas = paginas_pdf(arquivo.read())
+        elif mime in ('video/mp4', 'video/quicktime'):
+            duracao_ms = duracao_mp4(arquivo, tamanho)
+        elif mime == 'video/x-msvideo':
+            arquivo.seek(0)
+            duracao_ms = duracao_avi(arquivo.read(4096))
+
+    return {
+        'tamanho': tamanho,
+        'sha256': sha256.hexdigest(),
+        'mime': mime,
+        'paginas': paginas,
+        'duracao_ms': duracao_ms,
+    }
+
+
+def tipo_do_conteudo(inicio):
+    """MIME pela assinatura dos primeiros bytes"""
+    if inicio.startswith(b'%PDF-'):
+        return 'application/pdf'
+    if inicio[:4] in (b'PK\x03\x04', b'PK\x05\x06'):
+        return 'application/zip'
+    if inicio[4:8] == b'ftyp':
+        if inicio[8:12] in MARCAS_QUICKTIME:
+            return 'video/quicktime'
+        return 'video/mp4'
+    if inicio[4:8] in (b'moov', b'mdat', b'wide', b'free'):
+        return 'video/quicktime'
+    if inicio[:4] == b'RIFF' and inicio[8:12] == b'AVI ':
+        return 'video/x-msvideo'
+    return MIME_PADRAO
+
+
+def paginas_pdf(dados):
+    """
+    ``/Count`` da raiz da árvore de páginas: o maior entre os objetos
+    ``/Type /Pages`` (cada nó conta as páginas abaixo dele).
+    """
+    contagens = [
+        int(contagem.group(1))
+        for corpo in objetos_pdf(dados)
+        if PAGINAS_PDF.search(corpo)
+        and (contagem := CONTAGEM_PDF.search(corpo))
+    ]
+    return max(contagens) if contagens else None
+
+
+def objetos_pdf(dados):
+    for objeto in OBJETO_PDF.finditer(dados):
+        corpo = objeto.group(1)
+        if OBJSTM_PDF.search(corpo):
+            yield from objetos_comprimidos(corpo)
+        else:
+            yield corpo
+
+
+def objetos_comprimidos(corpo):
+    """Objetos de um object stream (PDF 1.5+) com ``/FlateDecode``"""
+    stream = STREAM_PDF.search(corpo)
+    valores = {nome: regex.search(corpo) for nome, regex in INTEIRO_PDF.items()}
+    if stream is None or not all(valores.values()) \
+            or b'/FlateDecode' not in corpo[:stream.start()]:
+        return
+    descompressor = zlib.decompressobj()
+    try:
+        conteudo = descompressor.decompress(stream.group(1), OBJSTM_MAX_BYTES)
+    except zlib.error:
+        return
+    if descompressor.unconsumed_tail:
+        return
+    quantidade = int(valores[b'N'].group(1))
+    primeiro = int(valores[b'First'].group(1))
+    try:
+        cabecalho = [int(valor) for valor in conteudo[:primeiro].split()]
+    except ValueError:
+        return
+    offsets = cabecalho[1:2 * quantidade:2]
+    for inicio, fim in zip(offsets, offsets[1:] + [len(conteudo) - primeiro]):
+        yield conteudo[primeiro + inicio:primeiro + fim]
+
+
+def caixas(arquivo, inicio, fim):
+    """(tipo, início do conteúdo, fim) dos boxes MP4 entre ``inicio`` e ``fim``"""
+    posicao = inicio
+    while posicao + 8 <= fim:
+        arquivo.seek(posicao)
+        cabecalho = arquivo.read(16)
+        if len(cabecalho) < 8:
+            return
+        tamanho, tipo = struct.unpack('>I4s', cabecalho[:8])
+        conteudo = posicao + 8
+        if tamanho == 1:
+            if len(cabecalho) < 16:
+                return
+            tamanho = struct.unpack('>Q', cabecalho[8:16])[0]
+            conteudo = posicao + 16
+        elif tamanho == 0:
+            tamanho = fim - posicao
+        if tamanho < conteudo - posicao:
+            return
+        yield tipo, conteudo, min(posicao + tamanho, fim)
+        posicao += tamanho
+
+
+def duracao_mp4(arquivo, tamanho):
+    """Duração (ms) do ``moov/mvhd``, lendo só os cabeçalhos dos boxes"""
+    for tipo, inicio, fim in caixas(arquivo, 0, tamanho):
+        if tipo != b'moov':
+            continue
+        for subtipo, subinicio, subfim in caixas(arquivo, inicio, fim):
+            if subtipo != b'mvhd':
+                continue
+            arquivo.seek(subinicio)
+            mvhd = arquivo.read(min(subfim - subinicio, 32))
+            try:
+                if mvhd[0] == 1:
+                    escala, duracao = struct.unpack('>IQ', mvhd[20:32])
+                else:
+                    escala, duracao = struct.unpack('>II', mvhd[12:20])
+            except (IndexError, struct.error):
+                return None
+            if not escala or duracao in (0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+                return None
+            return duracao * 1000 // escala
+        return None
+    return None
+
+
+def duracao_avi(cabecalho):
+    """Duração (ms) pelo ``avih`` do início do arquivo AVI"""
+    # RIFF <tamanho> AVI  LIST <tamanho> hdrl avih <tamanho> <MainAVIHeader>
+    if cabecalho[12:16] != b'LIST' or cabecalho[20:24] != b'hdrl' \
+            or cabecalho[24:28] != b'avih':
+        return None
+    try:
+        microssegundos, _, _, _, frames = struct.unpack(
+            '<5I', cabecalho[32:52]
+        )
+    except struct.error:
+        return None
+    if not microssegundos or not frames:
+        return None
+    return microssegundos * frames // 1000
+
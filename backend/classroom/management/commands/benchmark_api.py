@@ -0,0 +1,133 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment
+)
+
+from classroom.benchmark import (
+    FOLGA_LATENCIA_MS, TOLERANCIA_LATENCIA, comparar, fator_maquina,
+    ler_baseline, medir_rotas, salvar_baseline
+)
+from classroom.dataset import gerar_dados, limpar_dados
+
+
+BASELINE_PADRAO = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede latência (p50/p95), queries e tamanho de resposta de cada '
+        'rota da API em dados gerados, comparando com um baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escalas', default='100,10000',
+            help='Quantidades de alunos, separadas por vírgula '
+                 '(padrão: 100,10000)'
+        )
+        parser.add_argument(
+            '-n', '--repeticoes', type=int, default=30,
+            help='Requisições medidas por rota (padrão: 30)'
+        )
+        parser.add_argument(
+            '--aquecimento', type=int, default=3,
+            help='Requisições descartadas antes de medir (padrão: 3)'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--baseline', default=BASELINE_PADRAO,
+            help='Arquivo JSON do baseline (padrão: benchmarks/baseline.json)'
+        )
+        parser.add_argument(
+            '--salvar-baseline', action='store_true',
+            help='Grava as medidas como novo baseline em vez de comparar'
+        )
+        parser.add_argument(
+            '--tolerancia', type=float, default=TOLERANCIA_LATENCIA,
+            help='Aumento relativo de latência tolerado '
+                 f'(padrão: {TOLERANCIA_LATENCIA})'
+        )
+        parser.add_argument(
+            '--folga-ms', type=float, default=FOLGA_LATENCIA_MS,
+            help='Aumento absoluto de latência sempre tolerado '
+                 f'(padrão: {FOLGA_LATENCIA_MS})'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            escalas = [int(e) for e in options['escalas'].split(',')]
+        except ValueError:
+            raise CommandError('--escalas deve ser uma lista de inteiros.')
+
+        baseline = {}
+        if os.path.exists(options['baseline']):
+            baseline = ler_baseline(options['baseline'])
+        elif not options['salvar_baseline']:
+            self.stdout.write(self.style.WARNING(
+                f"Sem baseline em {options['baseline']}; só medindo."
+            ))
+
+        # Banco de testes (nunca o de desenvolvimento) e MEDIA_ROOT temporário
+        setup_test_environment(debug=False)
+        bancos = setup_databases(verbosity=0, interactive=False)
+        try:
+            with tempfile.TemporaryDirectory() as media, \
+                    override_settings(MEDIA_ROOT=media):
+                resultados = {
+                    str(escala): self.medir_escala(escala, baseline, options)
+                    for escala in escalas
+                }
+        finally:
+            teardown_databases(bancos, verbosity=0)
+            teardown_test_environment()
+
+        if options['salvar_baseline']:
+            salvar_baseline(options['baseline'], resultados, baseline)
+            self.stdout.write(self.style.SUCCESS(
+                f"Baseline gravado em {options['baseline']}"
+            ))
+            return
+
+        regressoes = comparar(
+            resultados, baseline, options['tolerancia'], options['folga_ms']
+        )
+        if regressoes:
+            raise CommandError(
+                f'{len(regressoes)} regressões:\n  ' + '\n  '.join(regressoes)
+            )
+        self.stdout.write(self.style.SUCCESS('Nenhuma regressão.'))
+
+    def medir_escala(self, escala, baseline, options):
+        self.stdout.write(f'\nGerando {escala} alunos...')
+        limpar_dados()
+        gerar_dados(alunos=escala, seed=options['seed'])
+
+        base = baseline.get(str(escala), {})
+        self.stdout.write(
+            f"{'rota':<24}{'p50 ms':>9}{'p95 ms':>9}{'queries':>9}"
+            f"{'bytes':>10}  baseline p50/p95/queries"
+        )
+
+        def progresso(nome, medidas):
+            anterior = base.get(nome)
+            referencia = '-'
+            if anterior:
+                # Baseline ajustado pela velocidade da máquina agora
+                fator = fator_maquina(medidas, anterior)
+                referencia = (
+                    f"{anterior['p50_ms'] * fator:.1f}/"
+                    f"{anterior['p95_ms'] * fator:.1f}/{anterior['queries']}"
+                )
+            self.stdout.write(
+                f"{nome:<24}{medidas['p50_ms']:>9.1f}{medidas['p95_ms']:>9.1f}"
+                f"{medidas['queries']:>9}{medidas['bytes']:>10}  {referencia}"
+            )
+
+        return medir_rotas(
+            options['repeticoes'], options['aquecimento'], progresso=progresso
+        )
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases,
+    teardown_test_environment
+)
+
+from classroom.benchmark import TAMANHOS_PAGINA, medir_renderizacao
+from classroom.dataset import gerar_dados
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara tempo de renderização e tamanho das páginas de turmas e '
+        'matrículas entre o JSON do DRF, orjson e MessagePack'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanhos', default=','.join(str(t) for t in TAMANHOS_PAGINA),
+            help='Linhas por página, separadas por vírgula '
+                 '(padrão: 20,200,2000)'
+        )
+        parser.add_argument(
+            '-n', '--repeticoes', type=int, default=20,
+            help='Renderizações medidas por página (padrão: 20)'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            tamanhos = [int(t) for t in options['tamanhos'].split(',')]
+        except ValueError:
+            raise CommandError('--tamanhos deve ser uma lista de inteiros.')
+
+        # Banco de testes (nunca o de desenvolvimento)
+        setup_test_environment(debug=False)
+        bancos = setup_databases(verbosity=0, interactive=False)
+        try:
+            maior = max(tamanhos)
+            self.stdout.write(f'Gerando {maior} turmas e {maior} alunos...')
+            gerar_dados(alunos=maior, turmas=maior, seed=options['seed'])
+            self.stdout.write(
+                f"{'página':<18}{'linhas':>7}  {'renderer':<9}"
+                f"{'p50 ms':>9}{'bytes':>11}{'vs json':>9}"
+            )
+            medir_renderizacao(
+                tamanhos, options['repeticoes'], progresso=self.progresso
+            )
+        finally:
+            teardown_databases(bancos, verbosity=0)
+            teardown_test_environment()
+
+    def progresso(self, pagina, resultado):
+        base = resultado['renderers']['json']
+        for nome, medidas in resultado['renderers'].items():
+            relacao = medidas['p50_ms'] / base['p50_ms'] if base['p50_ms'] else 0
+            linha = (
+                f"{pagina:<18}{resultado['linhas']:>7}  {nome:<9}"
+                f"{medidas['p50_ms']:>9.2f}{medidas['bytes']:>11}"
+                f"{relacao:>8.2f}x"
+            )
+            if medidas.get('identico') is False:
+                linha += '  (saída diferente do JSON do DRF!)'
+            self.stdout.write(linha)
@@ -0,0 +1,109 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from classroom.dataset import (
+    ALUNOS_DEMO, BATCH_SIZE, SENHA_PADRAO, escala, gerar_dados, limpar_dados,
+    tem_dados
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera dados sintéticos determinísticos (treinamentos, turmas, '
+        'recursos, alunos e matrículas) em escala configurável'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--alunos', type=int, default=100,
+            help='Quantidade de alunos (padrão: 100)'
+        )
+        parser.add_argument(
+            '--turmas', type=int, default=None,
+            help='Quantidade de turmas (padrão: 1 a cada 100 alunos)'
+        )
+        parser.add_argument(
+            '--treinamentos', type=int, default=None,
+            help='Quantidade de treinamentos (padrão: 1 a cada 10 turmas)'
+        )
+        parser.add_argument(
+            '--recursos-por-turma', type=int, default=6,
+            help='Média de recursos por turma (padrão: 6)'
+        )
+        parser.add_argument(
+            '--matriculas-por-aluno', type=float, default=2.0,
+            help='Média de matrículas por aluno (padrão: 2)'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=42,
+            help='Semente do gerador (padrão: 42)'
+        )
+        parser.add_argument(
+            '--hoje', type=date.fromisoformat, default=None,
+            help='Data de referência AAAA-MM-DD (padrão: hoje)'
+        )
+        parser.add_argument(
+            '--senhas-distintas', action='store_true',
+            help='Um hash por aluno, em paralelo (padrão: hash único)'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Processos para o hash das senhas (padrão: nº de CPUs)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help=f'Linhas por lote de inserção (padrão: {BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--limpar', action='store_true',
+            help='Remove os dados existentes (exceto usuários staff) antes'
+        )
+
+    def handle(self, *args, **options):
+        if options['alunos'] < len(ALUNOS_DEMO):
+            raise CommandError(f'Informe ao menos {len(ALUNOS_DEMO)} alunos.')
+        if options['limpar']:
+            self.stdout.write('Removendo dados existentes...')
+            limpar_dados()
+        elif tem_dados():
+            raise CommandError(
+                'O banco já tem dados; use --limpar para substituí-los.'
+            )
+
+        turmas, treinamentos = escala(
+            options['alunos'], options['turmas'], options['treinamentos']
+        )
+        self.stdout.write(
+            f"Gerando {options['alunos']} alunos, {turmas} turmas e "
+            f"{treinamentos} treinamentos (seed {options['seed']})"
+        )
+
+        def progresso(etapa, feitas, total):
+            self.stdout.write(
+                f'  {feitas}/{total} {etapa}' if total else f'  {feitas} {etapa}'
+            )
+
+        inicio = time.perf_counter()
+        criados = gerar_dados(
+            alunos=options['alunos'],
+            turmas=turmas,
+            treinamentos=treinamentos,
+            recursos_por_turma=options['recursos_por_turma'],
+            matriculas_por_aluno=options['matriculas_por_aluno'],
+            seed=options['seed'],
+            hoje=options['hoje'],
+            senhas_distintas=options['senhas_distintas'],
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            progresso=progresso,
+        )
+
+        for nome, quantidade in criados.items():
+            self.stdout.write(f'  {nome}: {quantidade}')
+        demo = ', '.join(username for username, *_ in ALUNOS_DEMO)
+        self.stdout.write(self.style.SUCCESS(
+            f'Dados gerados em {time.perf_counter() - inicio:.1f}s. '
+            f'Alunos: {demo}, aluno0000004... / {SENHA_PADRAO}'
+        ))
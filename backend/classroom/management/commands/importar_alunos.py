@@ -0,0 +1,65 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from classroom.bulk import (
+    BATCH_SIZE, STATUS_CRIADO, CsvInvalido, importar_alunos, ler_csv
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa alunos em massa de um CSV '
+        '(username,password,nome,email[,telefone])'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo CSV')
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Processos para o hash das senhas (padrão: nº de CPUs)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help=f'Linhas por lote de inserção (padrão: {BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--erros', help='Grava os erros por linha neste arquivo JSON'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['arquivo'], 'rb') as arquivo:
+                linhas = ler_csv(arquivo.read())
+        except OSError as exc:
+            raise CommandError(f'Não foi possível ler o arquivo: {exc}')
+        except CsvInvalido as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(f'{len(linhas)} linhas lidas')
+
+        def progresso(processadas, total):
+            self.stdout.write(f'  {processadas}/{total} alunos criados')
+
+        resultados = importar_alunos(
+            linhas,
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            progresso=progresso
+        )
+
+        erros = [r for r in resultados if r['status'] != STATUS_CRIADO]
+        for erro in erros[:20]:
+            self.stdout.write(self.style.WARNING(
+                f"  linha {erro['linha']}: {erro['erro']}"
+            ))
+        if len(erros) > 20:
+            self.stdout.write(f'  ... e mais {len(erros) - 20} erros')
+        if options['erros']:
+            with open(options['erros'], 'w', encoding='utf-8') as arquivo:
+                json.dump(erros, arquivo, ensure_ascii=False, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(resultados) - len(erros)} alunos importados, '
+            f'{len(erros)} erros'
+        ))
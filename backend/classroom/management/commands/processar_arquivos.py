@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from classroom.processing import (
+    enfileirar_existentes, executar, get_workers, repetir_erros
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Executa a fila de pós-processamento dos arquivos de recursos '
+        '(tamanho, SHA-256, tipo, páginas/duração)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help=f'Threads do pool (padrão: {get_workers()})'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=5.0,
+            help='Segundos entre consultas com a fila vazia (padrão: 5)'
+        )
+        parser.add_argument(
+            '--uma-vez', action='store_true',
+            help='Processa os jobs pendentes e termina'
+        )
+        parser.add_argument(
+            '--enfileirar', action='store_true',
+            help='Cria jobs para os arquivos ainda sem metadados'
+        )
+        parser.add_argument(
+            '--repetir-erros', action='store_true',
+            help='Devolve para a fila os jobs com erro'
+        )
+
+    def handle(self, *args, **options):
+        if options['enfileirar']:
+            self.stdout.write(f'{enfileirar_existentes()} jobs criados')
+        if options['repetir_erros']:
+            self.stdout.write(f'{repetir_erros()} jobs devolvidos para a fila')
+
+        try:
+            totais = executar(
+                workers=options['workers'],
+                intervalo=options['intervalo'],
+                uma_vez=options['uma_vez']
+            )
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{totais['concluidos']} arquivos processados, "
+            f"{totais['falhas']} falhas"
+        ))
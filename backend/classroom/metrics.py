@@ -0,0 +1,327 @@
+"""
+Métricas de desempenho por requisição.
+
+``MetricasMiddleware`` mede, em cada requisição, o número e o tempo das
+queries, o tempo de serialização, o tempo da view, o tempo total e o
+tamanho da resposta. Os valores são somados por rota (nome da URL, ex.:
+``turma-list``) em histogramas e contadores em memória; nada é guardado
+por requisição. ``GET /api/_metrics`` (admin) expõe os agregados no
+formato texto do Prometheus. Com ``METRICAS_SERVER_TIMING = True`` (só em
+desenvolvimento) cada resposta também traz os valores no cabeçalho
+``Server-Timing``; vem desligado porque mostraria a qualquer cliente o que
+``/api/_metrics`` restringe aos admins.
+
+As queries são medidas por um ``execute_wrapper`` instalado em cada
+conexão (``connection_created``, ver ``signals.py``) e a serialização pelo
+``SerializacaoMedidaMixin`` dos serializers. Os dois só registram quando
+há uma medição ativa (``ContextVar``), então fora de requisições (comandos,
+testes) o custo é uma leitura de variável.
+
+Os agregados são por processo: com vários workers, cada scrape vê o
+processo que o atendeu. Respostas em streaming (downloads) são medidas
+até o início do envio do corpo.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+# Limites (em segundos) dos buckets do histograma de duração
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+ROTA_DESCONHECIDA = 'desconhecida'
+
+# Outros métodos (inventados pelo cliente) viram um rótulo só, para não
+# criar um agregado por valor enviado
+METODOS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+METODO_OUTRO = 'OTHER'
+
+_medicao = ContextVar('classroom_medicao', default=None)
+
+
+class Medicao:
+    """Valores de uma requisição em andamento"""
+    __slots__ = (
+        'inicio', 'inicio_view', 'consultas', 'tempo_db',
+        'tempo_serializacao', 'profundidade',
+    )
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.inicio_view = None
+        self.consultas = 0
+        self.tempo_db = 0.0
+        self.tempo_serializacao = 0.0
+        self.profundidade = 0
+
+
+class Agregado:
+    """Somas de uma rota/método desde o início do processo"""
+    __slots__ = (
+        'buckets', 'requisicoes', 'duracao', 'view', 'consultas',
+        'tempo_db', 'tempo_serializacao', 'bytes',
+    )
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.requisicoes = 0
+        self.duracao = 0.0
+        self.view = 0.0
+        self.consultas = 0
+        self.tempo_db = 0.0
+        self.tempo_serializacao = 0.0
+        self.bytes = 0
+
+
+_agregados = {}
+_lock = threading.Lock()
+
+
+def medir_consulta(execute, sql, params, many, context):
+    """``execute_wrapper`` que soma as queries na medição ativa"""
+    medicao = _medicao.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicao.consultas += 1
+        medicao.tempo_db += time.perf_counter() - inicio
+
+
+def instalar(connection):
+    if medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(medir_consulta)
+
+
+@contextmanager
+def medir_serializacao():
+    """
+    Soma o tempo do bloco como serialização na medição ativa; blocos
+    dentro de outro já medido não são contados de novo.
+    """
+    medicao = _medicao.get()
+    if medicao is None or medicao.profundidade:
+        yield
+        return
+    medicao.profundidade += 1
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicao.tempo_serializacao += time.perf_counter() - inicio
+        medicao.profundidade -= 1
+
+
+class SerializacaoMedidaMixin:
+    """
+    Soma o tempo de ``to_representation`` na medição ativa. Serializers
+    aninhados (e os itens de ``many=True``) dentro de outro já medido não
+    são contados de novo.
+    """
+
+    def to_representation(self, instance):
+        medicao = _medicao.get()
+        if medicao is None or medicao.profundidade:
+            # Caminho de cada linha de um many=True: sem context manager
+            return super().to_representation(instance)
+        with medir_serializacao():
+            return super().to_representation(instance)
+
+
+def nome_da_rota(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.view_name:
+        return ROTA_DESCONHECIDA
+    return match.view_name
+
+
+def nome_do_metodo(request):
+    return request.method if request.method in METODOS else METODO_OUTRO
+
+
+def tamanho_resposta(response):
+    if response.streaming:
+        tamanho = response.get('Content-Length')
+        return int(tamanho) if tamanho and tamanho.isdigit() else None
+    return len(response.content)
+
+
+def registrar(rota, metodo, medicao, duracao, view, tamanho):
+    with _lock:
+        agregado = _agregados.get((rota, metodo))
+        if agregado is None:
+            agregado = _agregados[(rota, metodo)] = Agregado()
+        indice = bisect.bisect_left(BUCKETS, duracao)
+        if indice < len(BUCKETS):
+            agregado.buckets[indice] += 1
+        agregado.requisicoes += 1
+        agregado.duracao += duracao
+        agregado.view += view
+        agregado.consultas += medicao.consultas
+        agregado.tempo_db += medicao.tempo_db
+        agregado.tempo_serializacao += medicao.tempo_serializacao
+        agregado.bytes += tamanho or 0
+
+
+def limpar():
+    with _lock:
+        _agregados.clear()
+
+
+def server_timing(medicao, duracao, view, tamanho):
+    partes = [
+        f'db;dur={medicao.tempo_db * 1000:.2f};'
+        f'desc="{medicao.consultas} queries"',
+        f'ser;dur={medicao.tempo_serializacao * 1000:.2f}',
+        f'view;dur={view * 1000:.2f}',
+        f'total;dur={duracao * 1000:.2f}',
+    ]
+    if tamanho is not None:
+        partes.append(f'size;desc="{tamanho} bytes"')
+    return ', '.join(partes)
+
+
+class MetricasMiddleware:
+    """Mede a requisição inteira; deve ser o primeiro do ``MIDDLEWARE``"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+            # Sob ASGI um process_view síncrono rodaria em outra thread
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        medicao = Medicao()
+        token = _medicao.set(medicao)
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicao.reset(token)
+        return self.finalizar(request, response, medicao)
+
+    async def __acall__(self, request):
+        medicao = Medicao()
+        token = _medicao.set(medicao)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicao.reset(token)
+        return self.finalizar(request, response, medicao)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        medicao = _medicao.get()
+        if medicao is not None:
+            medicao.inicio_view = time.perf_counter()
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.__class__.process_view(
+            self, request, view_func, view_args, view_kwargs
+        )
+
+    def finalizar(self, request, response, medicao):
+        fim = time.perf_counter()
+        duracao = fim - medicao.inicio
+        view = fim - medicao.inicio_view if medicao.inicio_view else 0.0
+        tamanho = tamanho_resposta(response)
+        registrar(
+            nome_da_rota(request), nome_do_metodo(request), medicao,
+            duracao, view, tamanho
+        )
+        if getattr(settings, 'METRICAS_SERVER_TIMING', False):
+            response['Server-Timing'] = server_timing(
+                medicao, duracao, view, tamanho
+            )
+        return response
+
+
+def escapar(valor):
+    return (
+        str(valor).replace('\\', r'\\').replace('"', r'\"')
+        .replace('\n', r'\n')
+    )
+
+
+def rotulos(**valores):
+    return ','.join(f'{nome}="{escapar(valor)}"' for nome, valor in valores.items())
+
+
+def formato_prometheus(caches=None):
+    """
+    Agregados no formato texto do Prometheus. ``caches`` é o resultado de
+    ``response_cache.estatisticas`` (hits/misses por cache).
+    """
+    with _lock:
+        itens = sorted(
+            (chave, (
+                list(a.buckets), a.requisicoes, a.duracao, a.view,
+                a.consultas, a.tempo_db, a.tempo_serializacao, a.bytes,
+            ))
+            for chave, a in _agregados.items()
+        )
+
+    linhas = [
+        '# HELP classroom_request_duration_seconds Duração total da requisição.',
+        '# TYPE classroom_request_duration_seconds histogram',
+    ]
+    for (rota, metodo), (buckets, requisicoes, duracao, *_) in itens:
+        acumulado = 0
+        for limite, quantidade in zip(BUCKETS, buckets):
+            acumulado += quantidade
+            linhas.append(
+                'classroom_request_duration_seconds_bucket'
+                f'{{{rotulos(rota=rota, metodo=metodo, le=limite)}}} {acumulado}'
+            )
+        base = rotulos(rota=rota, metodo=metodo)
+        linhas += [
+            'classroom_request_duration_seconds_bucket'
+            f'{{{base},le="+Inf"}} {requisicoes}',
+            f'classroom_request_duration_seconds_sum{{{base}}} {duracao!r}',
+            f'classroom_request_duration_seconds_count{{{base}}} {requisicoes}',
+        ]
+
+    # (nome, ajuda, posição nos valores de cada item)
+    contadores = (
+        ('view_seconds', 'Tempo na view (inclui renderização).', 3),
+        ('db_queries', 'Queries executadas.', 4),
+        ('db_seconds', 'Tempo nas queries.', 5),
+        ('serializer_seconds', 'Tempo nos serializers.', 6),
+        ('response_bytes', 'Bytes das respostas (quando conhecidos).', 7),
+    )
+    for nome, ajuda, posicao in contadores:
+        linhas += [
+            f'# HELP classroom_request_{nome}_total {ajuda}',
+            f'# TYPE classroom_request_{nome}_total counter',
+        ]
+        for (rota, metodo), valores in itens:
+            linhas.append(
+                f'classroom_request_{nome}_total'
+                f'{{{rotulos(rota=rota, metodo=metodo)}}} '
+                f'{valores[posicao]!r}'
+            )
+
+    if caches:
+        linhas += [
+            '# HELP classroom_response_cache_total Acessos ao cache de respostas.',
+            '# TYPE classroom_response_cache_total counter',
+        ]
+        for nome, contagem in sorted(caches.items()):
+            for resultado, valor in sorted(contagem.items()):
+                linhas.append(
+                    'classroom_response_cache_total'
+                    f'{{{rotulos(cache=nome, resultado=resultado)}}} {valor}'
+                )
+    return '\n'.join(linhas) + '\n'
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:08
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadRecurso',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nome_arquivo', models.CharField(max_length=255)),
+                ('tamanho', models.BigIntegerField(help_text='Tamanho total em bytes')),
+                ('offset', models.BigIntegerField(default=0, help_text='Bytes já recebidos')),
+                ('concluido', models.BooleanField(default=False)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('recurso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='classroom.recurso')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads_recurso', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Upload de Recurso',
+                'verbose_name_plural': 'Uploads de Recursos',
+                'ordering': ['-criado_em'],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0002_uploadrecurso'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aluno',
+            index=models.Index(fields=['nome', 'id'], name='aluno_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='matricula',
+            index=models.Index(fields=['aluno', 'ativo', 'turma'], name='matricula_aluno_ativo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='matricula',
+            index=models.Index(fields=['turma', 'ativo'], name='matricula_turma_ativo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='matricula',
+            index=models.Index(fields=['-data_matricula', '-id'], name='matricula_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recurso',
+            index=models.Index(condition=models.Q(('draft', False)), fields=['turma', 'ordem', '-criado_em'], name='recurso_visivel_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recurso',
+            index=models.Index(fields=['ordem', '-criado_em', 'id'], name='recurso_ordem_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='turma',
+            index=models.Index(fields=['-data_inicio'], name='turma_data_inicio_idx'),
+        ),
+    ]
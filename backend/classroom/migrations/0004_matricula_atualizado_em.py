@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0003_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matricula',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,83 @@
+"""
+Índice de busca textual (FTS5) de treinamentos, turmas e recursos.
+
+Tabela virtual ``classroom_busca`` mantida por triggers (valem também para
+``update()``, ``bulk_create`` e SQL direto). O rowid codifica o objeto:
+``id * 4 + tipo`` (1 = treinamento, 2 = turma, 3 = recurso); ``pai`` é o
+treinamento da turma ou a turma do recurso. ``remove_diacritics 2`` faz
+"programacao" encontrar "Programação". Só no SQLite.
+"""
+
+from django.db import migrations
+
+
+# (tipo, tabela, coluna do nome, coluna da descrição, coluna do pai)
+INDEXADOS = [
+    (1, 'classroom_treinamento', 'nome', 'descricao', None),
+    (2, 'classroom_turma', 'nome', None, 'treinamento_id'),
+    (3, 'classroom_recurso', 'nome_recurso', 'descricao_recurso', 'turma_id'),
+]
+
+
+def valores(linha, tipo, nome, descricao, pai):
+    return (
+        f'{linha}.id * 4 + {tipo}, {linha}.{nome}, '
+        f"{f'{linha}.{descricao}' if descricao else 'NULL'}, "
+        f"{f'{linha}.{pai}' if pai else 'NULL'}"
+    )
+
+
+def criar(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    execute = schema_editor.execute
+    execute(
+        "CREATE VIRTUAL TABLE classroom_busca USING fts5("
+        "nome, descricao, pai UNINDEXED, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    for tipo, tabela, nome, descricao, pai in INDEXADOS:
+        colunas = ', '.join(c for c in (nome, descricao, pai) if c)
+        inserir = (
+            'INSERT INTO classroom_busca(rowid, nome, descricao, pai) '
+            'VALUES ({});'
+        )
+        remover = f'DELETE FROM classroom_busca WHERE rowid = OLD.id * 4 + {tipo};'
+        execute(
+            f'CREATE TRIGGER {tabela}_busca_ai AFTER INSERT ON {tabela} '
+            f'BEGIN {inserir.format(valores("NEW", tipo, nome, descricao, pai))} END'
+        )
+        execute(
+            f'CREATE TRIGGER {tabela}_busca_au AFTER UPDATE OF {colunas} '
+            f'ON {tabela} BEGIN {remover} '
+            f'{inserir.format(valores("NEW", tipo, nome, descricao, pai))} END'
+        )
+        execute(
+            f'CREATE TRIGGER {tabela}_busca_ad AFTER DELETE ON {tabela} '
+            f'BEGIN {remover} END'
+        )
+        # Linhas já existentes
+        execute(
+            f'INSERT INTO classroom_busca(rowid, nome, descricao, pai) '
+            f'SELECT {valores(tabela, tipo, nome, descricao, pai)} FROM {tabela}'
+        )
+
+
+def remover(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for _, tabela, *_ in INDEXADOS:
+        for sufixo in ('ai', 'au', 'ad'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {tabela}_busca_{sufixo}')
+    schema_editor.execute('DROP TABLE IF EXISTS classroom_busca')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0004_matricula_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar, remover),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from classroom.migrations_util import recriar_triggers
+
+
+# As alterações em classroom_recurso recriam a tabela no SQLite
+recriar_triggers_recurso = recriar_triggers('classroom_recurso')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0005_busca_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, recriar_triggers_recurso),
+        migrations.AddField(
+            model_name='recurso',
+            name='arquivo_duracao_ms',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, help_text='Vídeo', null=True),
+        ),
+        migrations.AddField(
+            model_name='recurso',
+            name='arquivo_mime',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Tipo identificado pelo conteúdo', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='recurso',
+            name='arquivo_paginas',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='PDF', null=True),
+        ),
+        migrations.AddField(
+            model_name='recurso',
+            name='arquivo_processado',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Arquivo a que os metadados se referem', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='recurso',
+            name='arquivo_sha256',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='recurso',
+            name='arquivo_tamanho',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='Em bytes', null=True),
+        ),
+        migrations.CreateModel(
+            name='ProcessamentoArquivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('arquivo', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluido', 'Concluído'), ('erro', 'Erro')], default='pendente', max_length=12)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('recurso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='processamentos', to='classroom.recurso')),
+            ],
+            options={
+                'verbose_name': 'Processamento de Arquivo',
+                'verbose_name_plural': 'Processamentos de Arquivos',
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['status', 'id'], name='processamento_fila_idx')],
+            },
+        ),
+        migrations.RunPython(recriar_triggers_recurso, migrations.RunPython.noop),
+    ]
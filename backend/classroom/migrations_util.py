@@ -0,0 +1,117 @@
+"""
+Triggers do índice de busca (``classroom_busca``) para as migrações
+posteriores à 0005.
+
+A 0005 criou os triggers com o próprio SQL, congelado nela; este módulo
+é a única fonte do SQL para as demais. No SQLite várias alterações de
+tabela (``AddField``, ``AlterField``...) recriam a tabela e descartam os
+triggers: migrações que alterem uma tabela de ``INDEXADOS`` devem incluir
+``recriar_triggers`` (ver 0006). Se alguma esquecer, o ``post_migrate``
+(ver ``signals.py``) recria os triggers que faltarem e avisa no log.
+"""
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+TABELA = 'classroom_busca'
+
+
+# (tipo, tabela, coluna do nome, coluna da descrição, coluna do pai)
+INDEXADOS = [
+    (1, 'classroom_treinamento', 'nome', 'descricao', None),
+    (2, 'classroom_turma', 'nome', None, 'treinamento_id'),
+    (3, 'classroom_recurso', 'nome_recurso', 'descricao_recurso', 'turma_id'),
+]
+
+
+def valores(linha, tipo, nome, descricao, pai):
+    return (
+        f'{linha}.id * 4 + {tipo}, {linha}.{nome}, '
+        f"{f'{linha}.{descricao}' if descricao else 'NULL'}, "
+        f"{f'{linha}.{pai}' if pai else 'NULL'}"
+    )
+
+
+def nomes_triggers(tabela):
+    return [f'{tabela}_busca_{sufixo}' for sufixo in ('ai', 'au', 'ad')]
+
+
+def criar_triggers(schema_editor, tipo, tabela, nome, descricao, pai):
+    """``schema_editor`` pode ser também um cursor (só ``execute`` é usado)"""
+    execute = schema_editor.execute
+    colunas = ', '.join(c for c in (nome, descricao, pai) if c)
+    inserir = (
+        'INSERT INTO classroom_busca(rowid, nome, descricao, pai) '
+        f'VALUES ({valores("NEW", tipo, nome, descricao, pai)});'
+    )
+    remover = f'DELETE FROM classroom_busca WHERE rowid = OLD.id * 4 + {tipo};'
+    execute(
+        f'CREATE TRIGGER IF NOT EXISTS {tabela}_busca_ai AFTER INSERT '
+        f'ON {tabela} BEGIN {inserir} END'
+    )
+    execute(
+        f'CREATE TRIGGER IF NOT EXISTS {tabela}_busca_au AFTER UPDATE OF '
+        f'{colunas} ON {tabela} BEGIN {remover} {inserir} END'
+    )
+    execute(
+        f'CREATE TRIGGER IF NOT EXISTS {tabela}_busca_ad AFTER DELETE '
+        f'ON {tabela} BEGIN {remover} END'
+    )
+
+
+def remover_triggers(schema_editor, tabela):
+    for nome in nomes_triggers(tabela):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {nome}')
+
+
+def recriar_triggers(*tabelas):
+    """RunPython que recria os triggers das ``tabelas`` (só no SQLite)"""
+    def recriar(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for indexado in INDEXADOS:
+            if indexado[1] in tabelas:
+                criar_triggers(schema_editor, *indexado)
+    return recriar
+
+
+def triggers_ausentes(connection):
+    """Triggers do índice que não existem no banco (só SQLite, após a 0005)"""
+    if connection.vendor != 'sqlite' \
+            or TABELA not in connection.introspection.table_names():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existentes = {nome for nome, in cursor.fetchall()}
+    return [
+        nome for _, tabela, *_ in INDEXADOS
+        for nome in nomes_triggers(tabela) if nome not in existentes
+    ]
+
+
+def garantir_triggers(connection):
+    """
+    Recria os triggers ausentes e reindexa as tabelas deles (linhas
+    alteradas sem os triggers ficaram desatualizadas no índice). Retorna
+    os nomes dos triggers que faltavam.
+    """
+    ausentes = triggers_ausentes(connection)
+    if not ausentes:
+        return []
+    logger.warning(
+        'Triggers da busca ausentes, recriados: %s', ', '.join(ausentes)
+    )
+    with connection.cursor() as cursor:
+        for tipo, tabela, nome, descricao, pai in INDEXADOS:
+            if not set(nomes_triggers(tabela)) & set(ausentes):
+                continue
+            criar_triggers(cursor, tipo, tabela, nome, descricao, pai)
+            cursor.execute(f'DELETE FROM {TABELA} WHERE rowid % 4 = {tipo}')
+            cursor.execute(
+                f'INSERT INTO {TABELA}(rowid, nome, descricao, pai) '
+                f'SELECT {valores(tabela, tipo, nome, descricao, pai)} '
+                f'FROM {tabela}'
+            )
+    return ausentes
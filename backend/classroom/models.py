@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import FileExtensionValidator
@@ -35,6 +36,9 @@ class Turma(models.Model):
         verbose_name = 'Turma'
         verbose_name_plural = 'Turmas'
         ordering = ['-data_inicio']
+        indexes = [
+            models.Index(fields=['-data_inicio'], name='turma_data_inicio_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nome} - {self.treinamento.nome}"
@@ -75,6 +79,27 @@ class Recurso(models.Model):
     )
     url_recurso = models.URLField(max_length=500, blank=True, null=True)
     ordem = models.IntegerField(default=0)
+    # Metadados do arquivo, preenchidos em segundo plano (ver processing.py)
+    arquivo_processado = models.CharField(
+        max_length=100, blank=True, default='', editable=False,
+        help_text='Arquivo a que os metadados se referem'
+    )
+    arquivo_tamanho = models.BigIntegerField(
+        blank=True, null=True, editable=False, help_text='Em bytes'
+    )
+    arquivo_sha256 = models.CharField(
+        max_length=64, blank=True, default='', editable=False
+    )
+    arquivo_mime = models.CharField(
+        max_length=100, blank=True, default='', editable=False,
+        help_text='Tipo identificado pelo conteúdo'
+    )
+    arquivo_paginas = models.PositiveIntegerField(
+        blank=True, null=True, editable=False, help_text='PDF'
+    )
+    arquivo_duracao_ms = models.PositiveBigIntegerField(
+        blank=True, null=True, editable=False, help_text='Vídeo'
+    )
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
@@ -82,10 +107,31 @@ class Recurso(models.Model):
         verbose_name = 'Recurso'
         verbose_name_plural = 'Recursos'
         ordering = ['ordem', '-criado_em']
+        indexes = [
+            # Recursos visíveis (não draft) de uma turma, já na ordem de
+            # exibição. Índice parcial: o SQLite não usa índice para o
+            # predicado booleano "NOT draft", mas usa a condição do índice.
+            models.Index(
+                fields=['turma', 'ordem', '-criado_em'],
+                condition=models.Q(draft=False),
+                name='recurso_visivel_idx'
+            ),
+            # Listagem geral (inclusive paginação por cursor)
+            models.Index(
+                fields=['ordem', '-criado_em', 'id'],
+                name='recurso_ordem_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.nome_recurso} ({self.get_tipo_recurso_display()})"
 
+    @property
+    def metadados_atuais(self):
+        """Os metadados gravados são do arquivo atual"""
+        return bool(self.arquivo) \
+            and self.arquivo_processado == self.arquivo.name
+
 
 class Aluno(models.Model):
     user = models.OneToOneField(
@@ -103,6 +149,9 @@ class Aluno(models.Model):
         verbose_name = 'Aluno'
         verbose_name_plural = 'Alunos'
         ordering = ['nome']
+        indexes = [
+            models.Index(fields=['nome', 'id'], name='aluno_nome_idx'),
+        ]
 
     def __str__(self):
         return self.nome
@@ -121,12 +170,101 @@ class Matricula(models.Model):
     )
     data_matricula = models.DateTimeField(auto_now_add=True)
     ativo = models.BooleanField(default=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = 'Matrícula'
         verbose_name_plural = 'Matrículas'
         unique_together = ['turma', 'aluno']
         ordering = ['-data_matricula']
+        indexes = [
+            # Turmas ativas de um aluno (cobre o turma_id, sem ir à tabela)
+            models.Index(
+                fields=['aluno', 'ativo', 'turma'],
+                name='matricula_aluno_ativo_idx'
+            ),
+            # Total de alunos ativos por turma
+            models.Index(
+                fields=['turma', 'ativo'],
+                name='matricula_turma_ativo_idx'
+            ),
+            models.Index(
+                fields=['-data_matricula', '-id'],
+                name='matricula_data_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.aluno.nome} - {self.turma.nome}"
+
+class UploadRecurso(models.Model):
+    """Sessão de upload em partes (resumível) do arquivo de um recurso"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recurso = models.ForeignKey(
+        Recurso,
+        on_delete=models.CASCADE,
+        related_name='uploads'
+    )
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='uploads_recurso'
+    )
+    nome_arquivo = models.CharField(max_length=255)
+    tamanho = models.BigIntegerField(help_text='Tamanho total em bytes')
+    offset = models.BigIntegerField(
+        default=0,
+        help_text='Bytes já recebidos'
+    )
+    concluido = models.BooleanField(default=False)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Upload de Recurso'
+        verbose_name_plural = 'Uploads de Recursos'
+        ordering = ['-criado_em']
+
+    def __str__(self):
+        return f"{self.nome_arquivo} ({self.offset}/{self.tamanho})"
+
+
+class ProcessamentoArquivo(models.Model):
+    """Job de pós-processamento do arquivo de um recurso (ver processing.py)"""
+    PENDENTE = 'pendente'
+    PROCESSANDO = 'processando'
+    CONCLUIDO = 'concluido'
+    ERRO = 'erro'
+    STATUS_CHOICES = [
+        (PENDENTE, 'Pendente'),
+        (PROCESSANDO, 'Processando'),
+        (CONCLUIDO, 'Concluído'),
+        (ERRO, 'Erro'),
+    ]
+
+    recurso = models.ForeignKey(
+        Recurso,
+        on_delete=models.CASCADE,
+        related_name='processamentos'
+    )
+    arquivo = models.CharField(max_length=100)
+    status = models.CharField(
+        max_length=12, choices=STATUS_CHOICES, default=PENDENTE
+    )
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    erro = models.TextField(blank=True, default='')
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(blank=True, null=True)
+    concluido_em = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Processamento de Arquivo'
+        verbose_name_plural = 'Processamentos de Arquivos'
+        ordering = ['-criado_em']
+        indexes = [
+            # Próximos jobs da fila (e jobs presos em processamento)
+            models.Index(fields=['status', 'id'], name='processamento_fila_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.aluno.nome} - {self.turma.nome}"
\ No newline at end of file
+        return f"{self.arquivo} ({self.get_status_display()})"
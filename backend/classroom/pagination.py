@@ -0,0 +1,286 @@
+"""
+Paginação da API.
+
+``ClassroomPagination`` é a paginação padrão (por número de página) e
+aceita ``?count=false`` para pular o ``COUNT(*)``. Quando a view já sabe o
+total (ex.: pelo validador de ``conditional.py``), ela o informa em
+``total_conhecido`` e o ``COUNT(*)`` também não é feito.
+
+``KeysetPagination`` adiciona paginação por cursor (keyset), opcional por
+requisição: basta enviar ``?cursor=`` (vazio na primeira página) e seguir
+os links ``next``/``previous``. O cursor guarda os valores da ordenação da
+última linha, então a página N custa o mesmo que a primeira (sem OFFSET e
+sem COUNT). A view define a ordenação em ``keyset_ordering``, que deve
+terminar em um campo único para desempate.
+"""
+
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PaginadorComTotal(Paginator):
+    """Paginator do Django que aceita o total já calculado"""
+
+    def __init__(self, *args, total=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if total is not None:
+            self.__dict__['count'] = total
+
+
+class ClassroomPagination(PageNumberPagination):
+    """Paginação por número de página com COUNT opcional"""
+    count_query_param = 'count'
+    total_conhecido = None
+
+    def django_paginator_class(self, queryset, page_size):
+        return PaginadorComTotal(
+            queryset, page_size, total=self.total_conhecido
+        )
+
+    def dispensa_contagem(self, request):
+        """A requisição pediu uma página sem COUNT (nem varredura da tabela)"""
+        return (
+            request.query_params.get(self.count_query_param, '').lower()
+            in ('false', '0', 'no')
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.sem_contagem = self.dispensa_contagem(request)
+        if not self.sem_contagem:
+            return super().paginate_queryset(queryset, request, view)
+
+        # Sem COUNT: busca uma linha a mais para saber se há próxima página
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        try:
+            self.numero_pagina = int(
+                request.query_params.get(self.page_query_param, 1)
+            )
+        except ValueError:
+            self.numero_pagina = 0
+        if self.numero_pagina < 1:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=request.query_params.get(self.page_query_param),
+                message='Número de página inválido.'
+            ))
+
+        inicio = (self.numero_pagina - 1) * page_size
+        linhas = list(queryset[inicio:inicio + page_size + 1])
+        self.tem_proxima = len(linhas) > page_size
+        return linhas[:page_size]
+
+    def get_paginated_response(self, data):
+        if not self.sem_contagem:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', None),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.sem_contagem:
+            return super().get_next_link()
+        if not self.tem_proxima:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.page_query_param, self.numero_pagina + 1
+        )
+
+    def get_previous_link(self):
+        if not self.sem_contagem:
+            return super().get_previous_link()
+        if self.numero_pagina <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.numero_pagina == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(
+            url, self.page_query_param, self.numero_pagina - 1
+        )
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['count']['nullable'] = True
+        return schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.count_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Use "false" para não calcular o total.',
+            'schema': {'type': 'boolean'},
+        })
+        return parameters
+
+
+class KeysetPagination(ClassroomPagination):
+    """Paginação por cursor (keyset), ativada com ``?cursor=``"""
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def get_ordering(self, view):
+        ordering = getattr(view, 'keyset_ordering', None)
+        if not ordering:
+            raise ImproperlyConfigured(
+                f'{view.__class__.__name__} deve definir keyset_ordering '
+                'para usar KeysetPagination.'
+            )
+        return ordering
+
+    def dispensa_contagem(self, request):
+        return (
+            self.cursor_query_param in request.query_params
+            or super().dispensa_contagem(request)
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            self.modo_cursor = False
+            return super().paginate_queryset(queryset, request, view)
+
+        self.modo_cursor = True
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+        valores, reverso = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverso:
+            ordering = [inverter(campo) for campo in ordering]
+        queryset = queryset.order_by(*ordering)
+        if valores is not None:
+            try:
+                queryset = queryset.filter(filtro_keyset(ordering, valores))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        linhas = list(queryset[:self.page_size + 1])
+        tem_mais = len(linhas) > self.page_size
+        linhas = linhas[:self.page_size]
+        if reverso:
+            linhas.reverse()
+            self.tem_proxima = valores is not None
+            self.tem_anterior = tem_mais
+        else:
+            self.tem_proxima = tem_mais
+            self.tem_anterior = valores is not None
+        self.page = linhas
+        return linhas
+
+    def get_paginated_response(self, data):
+        if not self.modo_cursor:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.modo_cursor:
+            return super().get_next_link()
+        if not self.tem_proxima or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverso=False)
+
+    def get_previous_link(self):
+        if not self.modo_cursor:
+            return super().get_previous_link()
+        if not self.tem_anterior or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverso=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            valores, reverso = cursor['v'], bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(valores, list) or len(valores) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return valores, reverso
+
+    def encode_cursor(self, instance, reverso):
+        valores = [
+            valor_cursor(instance, campo.lstrip('-'))
+            for campo in self.ordering
+        ]
+        cursor = {'v': valores}
+        if reverso:
+            cursor['r'] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(cursor, separators=(',', ':')).encode()
+        ).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.cursor_query_param,
+            'required': False,
+            'in': 'query',
+            'description': (
+                'Paginação por cursor: envie vazio para a primeira página '
+                'e siga os links next/previous.'
+            ),
+            'schema': {'type': 'string'},
+        })
+        return parameters
+
+
+def inverter(campo):
+    return campo[1:] if campo.startswith('-') else f'-{campo}'
+
+
+def valor_cursor(instance, campo):
+    # Linhas de ``.values()`` (caminho rápido, ver fastpath.py) são dicts
+    if isinstance(instance, dict):
+        valor = instance[campo]
+    else:
+        valor = getattr(instance, campo)
+    return valor.isoformat() if hasattr(valor, 'isoformat') else valor
+
+
+def filtro_keyset(ordering, valores):
+    """
+    Linhas estritamente após ``valores`` na ordenação dada, como uma
+    comparação de tuplas com direções mistas:
+
+        c1 >= v1 AND (c1 > v1 OR (c1 = v1 AND c2 > v2) OR ...)
+
+    O predicado de intervalo no primeiro campo permite ao banco usar o
+    índice para iniciar a varredura no ponto certo.
+    """
+    campos = [campo.lstrip('-') for campo in ordering]
+    operadores = ['lt' if campo.startswith('-') else 'gt' for campo in ordering]
+
+    condicao = Q()
+    for i, (campo, operador) in enumerate(zip(campos, operadores)):
+        termo = Q(**{f'{campo}__{operador}': valores[i]})
+        for anterior, valor in zip(campos[:i], valores[:i]):
+            termo &= Q(**{anterior: valor})
+        condicao |= termo
+
+    intervalo = Q(**{f'{campos[0]}__{operadores[0]}e': valores[0]})
+    return intervalo & condicao
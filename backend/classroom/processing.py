@@ -0,0 +1,211 @@
+"""
+Pós-processamento dos arquivos de recursos em segundo plano.
+
+Quando o arquivo de um recurso muda (upload em partes, API ou admin), o
+``post_save`` (ver ``signals.py``) apaga os metadados antigos e cria um
+job ``ProcessamentoArquivo``; a requisição não lê o arquivo. O comando
+``processar_arquivos`` executa a fila com um pool local de threads: cada
+job extrai tamanho, SHA-256, MIME e páginas/duração (``file_metadata.py``)
+e grava os metadados no recurso. Downloads e listagens usam esses valores
+em vez de consultar o sistema de arquivos.
+
+A fila é a própria tabela: um worker só fica com o job se o UPDATE
+condicional ``pendente -> processando`` alterar a linha, então vários
+processos podem consumir a mesma fila. Jobs presos em ``processando``
+(worker interrompido) voltam para a fila após ``PROCESSAMENTO_TIMEOUT``
+segundos; após ``PROCESSAMENTO_MAX_TENTATIVAS`` ficam com status
+``erro``. Threads bastam: o SHA-256 libera o GIL e o resto é I/O.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from . import access_cache, response_cache
+from .file_metadata import extrair
+from .models import ProcessamentoArquivo, Recurso
+
+
+logger = logging.getLogger(__name__)
+
+
+# Campos de Recurso preenchidos a partir de ``extrair``
+CAMPOS = {
+    'arquivo_tamanho': 'tamanho',
+    'arquivo_sha256': 'sha256',
+    'arquivo_mime': 'mime',
+    'arquivo_paginas': 'paginas',
+    'arquivo_duracao_ms': 'duracao_ms',
+}
+VAZIOS = {
+    'arquivo_processado': '',
+    'arquivo_tamanho': None,
+    'arquivo_sha256': '',
+    'arquivo_mime': '',
+    'arquivo_paginas': None,
+    'arquivo_duracao_ms': None,
+}
+
+
+def get_workers():
+    return getattr(settings, 'PROCESSAMENTO_WORKERS', 2)
+
+
+def get_timeout():
+    return getattr(settings, 'PROCESSAMENTO_TIMEOUT', 600)
+
+
+def get_max_tentativas():
+    return getattr(settings, 'PROCESSAMENTO_MAX_TENTATIVAS', 3)
+
+
+def enfileirar(recurso):
+    """
+    Cria o job do arquivo atual do recurso, se ainda não houver um, e
+    apaga os metadados de um arquivo anterior. Retorna o job criado.
+    """
+    nome = recurso.arquivo.name if recurso.arquivo else ''
+    if nome == recurso.arquivo_processado:
+        return None
+    if recurso.arquivo_processado or recurso.arquivo_tamanho is not None:
+        Recurso.objects.filter(pk=recurso.pk).update(**VAZIOS)
+        for campo, valor in VAZIOS.items():
+            setattr(recurso, campo, valor)
+    if not nome or ProcessamentoArquivo.objects.filter(
+        recurso=recurso, arquivo=nome
+    ).exists():
+        return None
+    return ProcessamentoArquivo.objects.create(recurso=recurso, arquivo=nome)
+
+
+def enfileirar_existentes():
+    """Jobs para os arquivos ainda sem metadados (ex.: após a migração)"""
+    recursos = Recurso.objects.exclude(arquivo='').exclude(
+        arquivo__isnull=True
+    ).exclude(arquivo_processado=F('arquivo')).only(
+        'id', 'arquivo', *VAZIOS
+    )
+    return sum(
+        enfileirar(recurso) is not None for recurso in recursos.iterator()
+    )
+
+
+def repetir_erros():
+    return ProcessamentoArquivo.objects.filter(
+        status=ProcessamentoArquivo.ERRO
+    ).update(status=ProcessamentoArquivo.PENDENTE, tentativas=0)
+
+
+def recuperar_presos():
+    """Jobs em processamento há mais que o timeout voltam para a fila"""
+    limite = timezone.now() - timedelta(seconds=get_timeout())
+    presos = ProcessamentoArquivo.objects.filter(
+        status=ProcessamentoArquivo.PROCESSANDO, iniciado_em__lt=limite
+    )
+    presos.filter(tentativas__gte=get_max_tentativas()).update(
+        status=ProcessamentoArquivo.ERRO,
+        erro='Tempo limite de processamento excedido'
+    )
+    presos.update(status=ProcessamentoArquivo.PENDENTE)
+
+
+def reservar(limite):
+    """Até ``limite`` jobs pendentes, já marcados como em processamento"""
+    recuperar_presos()
+    ids = ProcessamentoArquivo.objects.filter(
+        status=ProcessamentoArquivo.PENDENTE
+    ).order_by('id').values_list('id', flat=True)[:limite]
+    reservados = []
+    for job_id in ids:
+        # Outro worker pode ter reservado o job entre a consulta e o update
+        if ProcessamentoArquivo.objects.filter(
+            pk=job_id, status=ProcessamentoArquivo.PENDENTE
+        ).update(
+            status=ProcessamentoArquivo.PROCESSANDO,
+            iniciado_em=timezone.now(),
+            tentativas=F('tentativas') + 1
+        ):
+            reservados.append(job_id)
+    return list(ProcessamentoArquivo.objects.filter(id__in=reservados))
+
+
+def processar(job):
+    """Extrai e grava os metadados do job; False se falhou"""
+    storage = Recurso._meta.get_field('arquivo').storage
+    try:
+        metadados = extrair(storage.path(job.arquivo))
+    except Exception as exc:
+        # Qualquer erro (não só de leitura) é falha do job: propagado, ele
+        # interromperia o worker e o job ficaria preso em processamento
+        logger.exception(
+            'Falha ao processar o arquivo %s (job %s)', job.arquivo, job.pk
+        )
+        falhar(job, exc)
+        return False
+
+    agora = timezone.now()
+    # Só se o arquivo do recurso ainda for o mesmo (update não dispara signals)
+    if Recurso.objects.filter(pk=job.recurso_id, arquivo=job.arquivo).update(
+        arquivo_processado=job.arquivo, atualizado_em=agora,
+        **{campo: metadados[chave] for campo, chave in CAMPOS.items()}
+    ):
+        access_cache.invalidar_recurso(job.recurso_id)
+        response_cache.invalidar(Recurso)
+    ProcessamentoArquivo.objects.filter(pk=job.pk).update(
+        status=ProcessamentoArquivo.CONCLUIDO, concluido_em=agora, erro=''
+    )
+    return True
+
+
+def falhar(job, exc):
+    status = (
+        ProcessamentoArquivo.ERRO if job.tentativas >= get_max_tentativas()
+        else ProcessamentoArquivo.PENDENTE
+    )
+    ProcessamentoArquivo.objects.filter(pk=job.pk).update(
+        status=status, erro=str(exc)
+    )
+
+
+def processar_na_thread(job):
+    try:
+        return processar(job)
+    finally:
+        close_old_connections()
+
+
+def executar(workers=None, intervalo=5.0, uma_vez=False, parar=None):
+    """
+    Processa a fila até ``parar()`` ser verdadeiro (ou até esvaziar, com
+    ``uma_vez``). Retorna os totais de jobs concluídos e com falha.
+    """
+    workers = workers or get_workers()
+    totais = {'concluidos': 0, 'falhas': 0}
+
+    def registrar(resultados):
+        for ok in resultados:
+            totais['concluidos' if ok else 'falhas'] += 1
+
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while not (parar and parar()):
+            jobs = reservar(workers * 2)
+            if jobs:
+                registrar(
+                    pool.map(processar_na_thread, jobs) if pool
+                    else map(processar, jobs)
+                )
+                continue
+            if uma_vez:
+                break
+            time.sleep(intervalo)
+    finally:
+        if pool:
+            pool.shutdown()
+    return totais
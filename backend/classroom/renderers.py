@@ -0,0 +1,118 @@
+"""
+Renderers e parsers da API.
+
+``OrjsonRenderer``/``OrjsonParser`` substituem o ``JSONRenderer`` e o
+``JSONParser`` do DRF (``json`` da biblioteca padrão) pelo ``orjson``, com
+a mesma saída: JSON compacto em UTF-8, ``\\u2028``/``\\u2029`` escapados e
+datas, ``Decimal``, UUIDs e textos lazy convertidos pelo mesmo
+``default`` do encoder do DRF (datas passam por ele, não pelo formato
+próprio do ``orjson``). O que o ``orjson`` não representa igual (inteiros
+acima de 64 bits, chaves não-texto, ``?indent=``/API navegável, corpo em
+outro charset) cai no renderer/parser do DRF. A única diferença é a
+grafia de floats com expoente (``1e16`` em vez de ``1e+16``), mesmo valor;
+os models não têm campos float.
+
+``MessagePackRenderer``/``MessagePackParser`` (``application/msgpack``)
+usam o pacote ``msgpack`` (em requirements.txt); em uma instalação sem
+ele ficam fora da negociação. Só são usados com
+``Accept: application/msgpack`` (ou ``?format=msgpack``).
+"""
+
+import io
+import re
+
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+OPCOES_ORJSON = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+)
+
+# Inteiros que podem passar de 64 bits: o orjson os leria como float
+INTEIRO_LONGO = re.compile(rb'\d{19}')
+
+SEPARADORES_DE_LINHA = (
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+)
+
+# Tipos fora do JSON, convertidos como no ``JSONEncoder`` do DRF
+converter = JSONEncoder().default
+
+
+def msgpack_disponivel():
+    return msgpack is not None
+
+
+class OrjsonRenderer(JSONRenderer):
+    """``JSONRenderer`` com ``orjson``; mesmos bytes do renderer do DRF"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=converter, option=OPCOES_ORJSON)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        for separador, escapado in SEPARADORES_DE_LINHA:
+            if separador in ret:
+                ret = ret.replace(separador, escapado)
+        return ret
+
+
+class OrjsonParser(JSONParser):
+    """``JSONParser`` com ``orjson``; mesmos valores e erros do DRF"""
+    renderer_class = OrjsonRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        corpo = stream.read() if stream is not None else b''
+        if not INTEIRO_LONGO.search(corpo):
+            try:
+                return orjson.loads(corpo)
+            except orjson.JSONDecodeError:
+                pass
+        # Mensagem de erro (e casos de borda) do parser do DRF
+        return super().parse(io.BytesIO(corpo), media_type, parser_context)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """MessagePack com os mesmos valores do JSON (datas como texto)"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=converter, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
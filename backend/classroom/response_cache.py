@@ -0,0 +1,141 @@
+"""
+Cache de respostas do catálogo (treinamentos e turmas para admins).
+
+A chave de cada resposta inclui a versão atual de cada model de que ela
+depende. Os signals em ``signals.py`` incrementam a versão do model a cada
+save/delete, então a invalidação é imediata e não precisa varrer chaves:
+as entradas antigas simplesmente deixam de ser lidas e expiram sozinhas.
+
+O cache guarda ``response.data`` (já serializado), então o mesmo valor
+serve para qualquer renderer negociado. Com ``CondicionalMixin`` o
+validador também é guardado, e requisições condicionais respondidas do
+cache continuam sem query nenhuma.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .conditional import aplicar_cabecalhos, resposta_condicional
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPOSTA_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'RESPOSTA_CACHE_TIMEOUT', 3600)
+
+
+def chave_versao(model):
+    return f'resposta:versao:{model._meta.label_lower}'
+
+
+def versoes(models):
+    """Versões atuais dos models (contadores ausentes recebem valor novo)"""
+    cache = get_cache()
+    chaves = [chave_versao(model) for model in models]
+    valores = cache.get_many(chaves)
+    for chave in chaves:
+        if chave not in valores:
+            cache.add(chave, time.time_ns(), timeout=None)
+            valores[chave] = cache.get(chave)
+    return [valores[chave] for chave in chaves]
+
+
+def invalidar(model):
+    cache = get_cache()
+    chave = chave_versao(model)
+    try:
+        cache.incr(chave)
+    except ValueError:
+        cache.set(chave, time.time_ns(), timeout=None)
+
+
+def registrar_acesso(nome, resultado):
+    """Incrementa o contador de ``hits``/``misses`` do cache ``nome``"""
+    cache = get_cache()
+    chave = f'resposta:stats:{nome}:{resultado}'
+    if not cache.add(chave, 1, timeout=None):
+        try:
+            cache.incr(chave)
+        except ValueError:
+            cache.set(chave, 1, timeout=None)
+
+
+def estatisticas(nomes):
+    cache = get_cache()
+    chaves = {
+        (nome, resultado): f'resposta:stats:{nome}:{resultado}'
+        for nome in nomes for resultado in ('hits', 'misses')
+    }
+    valores = cache.get_many(chaves.values())
+    return {
+        nome: {
+            resultado: valores.get(chaves[(nome, resultado)], 0)
+            for resultado in ('hits', 'misses')
+        }
+        for nome in nomes
+    }
+
+
+class RespostaCacheMixin:
+    """
+    Cache de ``list``/``retrieve`` para ViewSets. ``cache_modelos`` lista
+    todos os models cujos dados aparecem na resposta; ``cache_nome``
+    identifica o cache nas chaves e nas estatísticas.
+    """
+    cache_nome = None
+    cache_modelos = ()
+    cache_acoes = ('list', 'retrieve')
+
+    def usar_cache(self, request):
+        return self.action in self.cache_acoes
+
+    def chave_resposta(self, request):
+        uri = request.build_absolute_uri()
+        versao = '.'.join(str(v) for v in versoes(self.cache_modelos))
+        digest = hashlib.md5(uri.encode(), usedforsecurity=False).hexdigest()
+        return f'resposta:{self.cache_nome}:{self.action}:{versao}:{digest}'
+
+    def resposta_em_cache(self, request, gerar, *args, **kwargs):
+        if not self.usar_cache(request):
+            return gerar(request, *args, **kwargs)
+
+        cache = get_cache()
+        chave = self.chave_resposta(request)
+        entrada = cache.get(chave)
+        if entrada is not None:
+            registrar_acesso(self.cache_nome, 'hits')
+            validador = entrada['validador']
+            response = None
+            if validador is not None:
+                response = resposta_condicional(request, validador)
+            if response is None:
+                response = Response(entrada['data'])
+                if validador is not None:
+                    aplicar_cabecalhos(request, response, validador)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        registrar_acesso(self.cache_nome, 'misses')
+        response = gerar(request, *args, **kwargs)
+        if response.status_code == 200:
+            entrada = {
+                'data': response.data,
+                'validador': getattr(self, 'validador', None),
+            }
+            cache.set(chave, entrada, timeout=get_timeout())
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.resposta_em_cache(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.resposta_em_cache(
+            request, super().retrieve, *args, **kwargs
+        )
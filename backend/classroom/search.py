@@ -0,0 +1,124 @@
+"""
+Busca textual no catálogo (``GET /api/busca/?q=...``).
+
+Usa a tabela FTS5 ``classroom_busca`` (migração 0005), mantida por
+triggers a cada insert/update/delete de treinamentos, turmas e recursos.
+Cada palavra do texto vira um prefixo (``"progr"*``), todas obrigatórias;
+acentos e maiúsculas são ignorados. Os resultados vêm ordenados por bm25,
+com o nome pesando mais que a descrição, em uma única query.
+
+Alunos veem todos os treinamentos, só as turmas em que têm matrícula ativa
+e só os recursos visíveis dessas turmas (mesmas regras de
+``visibility.py``: sem rascunhos, acesso prévio antes do início). As
+restrições entram como subqueries na própria consulta FTS.
+"""
+
+import re
+from datetime import date
+
+from django.db import connections, router
+
+from .models import Aluno, Treinamento
+from .visibility import recursos_visiveis, turmas_matriculadas
+
+
+TABELA = 'classroom_busca'
+
+# Código do tipo no rowid (id * 4 + código), ver a migração 0005
+TIPOS = {'treinamento': 1, 'turma': 2, 'recurso': 3}
+NOMES_TIPOS = {codigo: nome for nome, codigo in TIPOS.items()}
+
+# Coluna do pai na resposta, por tipo
+PAIS = {'turma': 'treinamento', 'recurso': 'turma'}
+
+# Pesos do bm25 (nome, descrição)
+PESOS = (10.0, 1.0)
+
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 100
+MAXIMO_TERMOS = 10
+
+TERMO = re.compile(r'\w+')
+
+
+def busca_disponivel(alias):
+    return connections[alias].vendor == 'sqlite'
+
+
+def expressao(texto):
+    """Expressão FTS5 do texto digitado, ou None se não houver palavras"""
+    termos = TERMO.findall(texto or '')[:MAXIMO_TERMOS]
+    if not termos:
+        return None
+    return ' '.join(f'"{termo}"*' for termo in termos)
+
+
+def subquery(queryset, alias):
+    sql, params = queryset.values('id').query.get_compiler(
+        using=alias
+    ).as_sql()
+    return sql, list(params)
+
+
+def restricoes(user, alias, hoje):
+    """Condição SQL (e parâmetros) do que ``user`` pode ver, ou None"""
+    if user.is_staff:
+        return None
+    condicoes = [f'rowid %% 4 = {TIPOS["treinamento"]}']
+    params = []
+    try:
+        aluno = user.aluno
+    except Aluno.DoesNotExist:
+        aluno = None
+    if aluno is not None:
+        for tipo, queryset in (
+            ('turma', turmas_matriculadas(aluno)),
+            ('recurso', recursos_visiveis(aluno, hoje)),
+        ):
+            sql, sql_params = subquery(queryset, alias)
+            condicoes.append(
+                f'(rowid %% 4 = {TIPOS[tipo]} AND rowid / 4 IN ({sql}))'
+            )
+            params.extend(sql_params)
+    return '(' + ' OR '.join(condicoes) + ')', params
+
+
+def buscar(texto, user, tipo=None, limite=LIMITE_PADRAO, hoje=None):
+    """
+    Resultados de ``texto`` visíveis para ``user``, do mais relevante ao
+    menos relevante. ``tipo`` restringe a treinamentos, turmas ou recursos.
+    """
+    consulta = expressao(texto)
+    if consulta is None:
+        return []
+    alias = router.db_for_read(Treinamento)
+    hoje = hoje or date.today()
+
+    where = [f'{TABELA} MATCH %s']
+    params = [consulta]
+    if tipo is not None:
+        where.append(f'rowid %% 4 = {TIPOS[tipo]}')
+    restricao = restricoes(user, alias, hoje)
+    if restricao is not None:
+        where.append(restricao[0])
+        params.extend(restricao[1])
+    params.append(limite)
+
+    sql = (
+        f'SELECT rowid, nome, descricao, pai FROM {TABELA} '
+        f'WHERE {" AND ".join(where)} '
+        f'ORDER BY bm25({TABELA}, {PESOS[0]}, {PESOS[1]}) LIMIT %s'
+    )
+    with connections[alias].cursor() as cursor:
+        cursor.execute(sql, params)
+        linhas = cursor.fetchall()
+    return [resultado(*linha) for linha in linhas]
+
+
+def resultado(rowid, nome, descricao, pai):
+    tipo = NOMES_TIPOS[rowid % 4]
+    item = {'tipo': tipo, 'id': rowid // 4, 'nome': nome,
+            'descricao': descricao}
+    if tipo in PAIS:
+        item[PAIS[tipo]] = pai
+    return item
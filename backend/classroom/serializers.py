@@ -1,17 +1,27 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Treinamento, Turma, Recurso, Aluno, Matricula
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.base import File
+from .fieldsets import SelecaoCamposMixin
+from .metrics import SerializacaoMedidaMixin
+from .models import Treinamento, Turma, Recurso, Aluno, Matricula, UploadRecurso
+from .visibility import (
+    filtro_recursos_visiveis, prefetch_recursos_visiveis, total_alunos_ativos
+)
 from datetime import date
 
 
-class TreinamentoSerializer(serializers.ModelSerializer):
+class TreinamentoSerializer(SelecaoCamposMixin, SerializacaoMedidaMixin,
+                            serializers.ModelSerializer):
     class Meta:
         model = Treinamento
         fields = ['id', 'nome', 'descricao', 'criado_em', 'atualizado_em']
         read_only_fields = ['criado_em', 'atualizado_em']
 
 
-class RecursoSerializer(serializers.ModelSerializer):
+class RecursoSerializer(SelecaoCamposMixin, SerializacaoMedidaMixin,
+                        serializers.ModelSerializer):
     tipo_recurso_display = serializers.CharField(
         source='get_tipo_recurso_display',
         read_only=True
@@ -20,6 +30,8 @@ class RecursoSerializer(serializers.ModelSerializer):
         source='turma.nome',
         read_only=True
     )
+    expansoes = {'turma': 'TurmaSerializer'}
+    dependencias = {'tipo_recurso_display': ('tipo_recurso',)}
 
     class Meta:
         model = Recurso
@@ -27,35 +39,44 @@ class RecursoSerializer(serializers.ModelSerializer):
             'id', 'turma', 'turma_nome', 'tipo_recurso',
             'tipo_recurso_display', 'acesso_previo', 'draft',
             'nome_recurso', 'descricao_recurso', 'arquivo',
+            'arquivo_tamanho', 'arquivo_sha256', 'arquivo_mime',
+            'arquivo_paginas', 'arquivo_duracao_ms',
             'url_recurso', 'ordem', 'criado_em', 'atualizado_em'
         ]
         read_only_fields = ['criado_em', 'atualizado_em']
 
 
-class RecursoAlunoSerializer(serializers.ModelSerializer):
+class RecursoAlunoSerializer(SelecaoCamposMixin, SerializacaoMedidaMixin,
+                             serializers.ModelSerializer):
     """Serializer para visualização do aluno (sem campos sensíveis)"""
     tipo_recurso_display = serializers.CharField(
         source='get_tipo_recurso_display',
         read_only=True
     )
+    dependencias = {'tipo_recurso_display': ('tipo_recurso',)}
 
     class Meta:
         model = Recurso
         fields = [
             'id', 'tipo_recurso', 'tipo_recurso_display',
             'nome_recurso', 'descricao_recurso', 'arquivo',
-            'url_recurso', 'ordem'
+            'arquivo_tamanho', 'arquivo_mime', 'arquivo_paginas',
+            'arquivo_duracao_ms', 'url_recurso', 'ordem'
         ]
 
 
-class TurmaSerializer(serializers.ModelSerializer):
+class TurmaSerializer(SelecaoCamposMixin, SerializacaoMedidaMixin,
+                      serializers.ModelSerializer):
     treinamento_nome = serializers.CharField(
         source='treinamento.nome',
         read_only=True
     )
     recursos = RecursoSerializer(many=True, read_only=True)
     total_alunos = serializers.SerializerMethodField()
-    
+    expansoes = {'treinamento': TreinamentoSerializer}
+    # Total anotado por subquery (índice (turma, ativo)), sem GROUP BY
+    anotacoes = {'total_alunos': total_alunos_ativos}
+
     class Meta:
         model = Turma
         fields = [
@@ -66,14 +87,23 @@ class TurmaSerializer(serializers.ModelSerializer):
         read_only_fields = ['criado_em', 'atualizado_em']
 
     def get_total_alunos(self, obj):
+        # Usa a anotação do queryset quando disponível (evita N+1)
+        total = getattr(obj, 'total_alunos', None)
+        if total is not None:
+            return total
         return obj.matriculas.filter(ativo=True).count()
 
 
-class TurmaAlunoSerializer(serializers.ModelSerializer):
+class TurmaAlunoSerializer(SelecaoCamposMixin, SerializacaoMedidaMixin,
+                           serializers.ModelSerializer):
     """Serializer para visualização do aluno com regras de negócio"""
     treinamento = TreinamentoSerializer(read_only=True)
-    recursos = serializers.SerializerMethodField()
+    recursos = RecursoAlunoSerializer(
+        source='recursos_visiveis', many=True, read_only=True
+    )
     pode_acessar = serializers.SerializerMethodField()
+    relacoes = {'recursos': 'recursos'}
+    dependencias = {'pode_acessar': ('data_inicio',)}
 
     class Meta:
         model = Turma
@@ -83,26 +113,66 @@ class TurmaAlunoSerializer(serializers.ModelSerializer):
             'pode_acessar'
         ]
 
+    def get_hoje(self):
+        # A data de referência vem do contexto para ser a mesma em todas as linhas
+        return self.context.get('hoje') or date.today()
+
     def get_pode_acessar(self, obj):
         """Verifica se a turma já iniciou"""
-        return date.today() >= obj.data_inicio
+        return self.get_hoje() >= obj.data_inicio
 
-    def get_recursos(self, obj):
-        """Aplica regras de negócio para recursos"""
-        hoje = date.today()
-        turma_iniciou = hoje >= obj.data_inicio
+    def prefetch(self, nome, lookup, queryset):
+        """Aplica regras de negócio para recursos (ver visibility.py)"""
+        if nome == 'recursos':
+            return prefetch_recursos_visiveis(self.get_hoje(), queryset)
+        return super().prefetch(nome, lookup, queryset)
 
-        # Regra 2: Antes do início, só recursos com acesso prévio
-        if not turma_iniciou:
-            recursos = obj.recursos.filter(acesso_previo=True, draft=False)
-        # Regra 3: Após início, recursos não draft
-        else:
-            recursos = obj.recursos.filter(draft=False)
+    def to_representation(self, instance):
+        if ('recursos' in self.fields
+                and not hasattr(instance, 'recursos_visiveis')):
+            # Turma carregada sem o prefetch dos recursos visíveis
+            instance.recursos_visiveis = list(instance.recursos.filter(
+                filtro_recursos_visiveis(self.get_hoje())
+            ))
+        return super().to_representation(instance)
 
-        return RecursoAlunoSerializer(recursos, many=True).data
+
+class UploadRecursoSerializer(SelecaoCamposMixin, SerializacaoMedidaMixin,
+                              serializers.ModelSerializer):
+    expansoes = {'recurso': RecursoSerializer}
+
+    class Meta:
+        model = UploadRecurso
+        fields = [
+            'id', 'recurso', 'nome_arquivo', 'tamanho', 'offset',
+            'concluido', 'criado_em', 'atualizado_em'
+        ]
+        read_only_fields = ['offset', 'concluido', 'criado_em', 'atualizado_em']
+
+    def validate_nome_arquivo(self, value):
+        """Valida a extensão antes de receber qualquer byte"""
+        for validator in Recurso._meta.get_field('arquivo').validators:
+            try:
+                validator(File(None, name=value))
+            except DjangoValidationError as exc:
+                raise serializers.ValidationError(exc.messages)
+        return value
+
+    def validate_tamanho(self, value):
+        limite = getattr(settings, 'RECURSO_UPLOAD_MAX_SIZE', None)
+        if value <= 0:
+            raise serializers.ValidationError(
+                "O tamanho deve ser maior que zero."
+            )
+        if limite and value > limite:
+            raise serializers.ValidationError(
+                f"Arquivo excede o limite de {limite} bytes."
+            )
+        return value
 
 
-class AlunoSerializer(serializers.ModelSerializer):
+class AlunoSerializer(SelecaoCamposMixin, SerializacaoMedidaMixin,
+                      serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     
     class Meta:
@@ -114,21 +184,23 @@ class AlunoSerializer(serializers.ModelSerializer):
         read_only_fields = ['criado_em', 'atualizado_em']
 
 
-class MatriculaSerializer(serializers.ModelSerializer):
+class MatriculaSerializer(SelecaoCamposMixin, SerializacaoMedidaMixin,
+                          serializers.ModelSerializer):
     aluno_nome = serializers.CharField(source='aluno.nome', read_only=True)
     turma_nome = serializers.CharField(source='turma.nome', read_only=True)
     treinamento_nome = serializers.CharField(
         source='turma.treinamento.nome',
         read_only=True
     )
+    expansoes = {'turma': TurmaSerializer, 'aluno': AlunoSerializer}
 
     class Meta:
         model = Matricula
         fields = [
             'id', 'turma', 'turma_nome', 'treinamento_nome',
-            'aluno', 'aluno_nome', 'data_matricula', 'ativo'
+            'aluno', 'aluno_nome', 'data_matricula', 'ativo', 'atualizado_em'
         ]
-        read_only_fields = ['data_matricula']
+        read_only_fields = ['data_matricula', 'atualizado_em']
 
     def validate(self, data):
         """Valida se o aluno já está matriculado na turma"""
@@ -143,7 +215,8 @@ class MatriculaSerializer(serializers.ModelSerializer):
         return data
 
 
-class UserRegistrationSerializer(serializers.ModelSerializer):
+class UserRegistrationSerializer(SelecaoCamposMixin, SerializacaoMedidaMixin,
+                                 serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
     nome = serializers.CharField(max_length=200)
     email = serializers.EmailField()
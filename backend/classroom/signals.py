@@ -0,0 +1,60 @@
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate, post_save, post_delete
+from django.dispatch import receiver
+
+from . import (
+    access_cache, metrics, migrations_util, processing, response_cache
+)
+from .models import Treinamento, Turma, Recurso, Matricula
+
+
+@receiver([post_save, post_delete], sender=Matricula)
+def invalidar_acesso_matricula(sender, instance, **kwargs):
+    """Matrícula criada, ativada/desativada ou removida"""
+    access_cache.invalidar_turma(instance.turma_id)
+
+
+@receiver([post_save, post_delete], sender=Turma)
+def invalidar_acesso_turma(sender, instance, **kwargs):
+    """Mudança de data_inicio altera as regras de acesso"""
+    access_cache.invalidar_turma(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Recurso)
+def invalidar_acesso_recurso(sender, instance, **kwargs):
+    """Mudança de draft, acesso_previo, turma ou arquivo"""
+    access_cache.invalidar_recurso(instance.pk)
+
+
+@receiver(post_save, sender=Recurso)
+def enfileirar_processamento(sender, instance, raw=False, update_fields=None,
+                             **kwargs):
+    """Arquivo novo ou trocado: metadados extraídos em segundo plano"""
+    if raw or (update_fields is not None and 'arquivo' not in update_fields):
+        return
+    # Instância com o arquivo adiado (ex.: inline do admin): não foi alterado
+    if 'arquivo' not in instance.get_deferred_fields():
+        processing.enfileirar(instance)
+
+
+@receiver([post_save, post_delete], sender=Treinamento)
+@receiver([post_save, post_delete], sender=Turma)
+@receiver([post_save, post_delete], sender=Recurso)
+@receiver([post_save, post_delete], sender=Matricula)
+def invalidar_respostas(sender, **kwargs):
+    """Nova versão do model: respostas em cache que dependem dele expiram"""
+    response_cache.invalidar(sender)
+
+
+@receiver(connection_created)
+def medir_consultas(sender, connection, **kwargs):
+    """Queries de toda conexão nova entram nas métricas da requisição"""
+    metrics.instalar(connection)
+
+
+@receiver(post_migrate)
+def garantir_triggers_da_busca(sender, app_config, using, **kwargs):
+    """Migração que recriou uma tabela indexada sem ``recriar_triggers``"""
+    if app_config.label == 'classroom':
+        migrations_util.garantir_triggers(connections[using])
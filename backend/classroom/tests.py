@@ -1,3 +1,2959 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+import zipfile
+import zlib
+from datetime import date, datetime, time as time_, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import quote
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection
+from django.db.models import Count, QuerySet
+from django.db.utils import ConnectionHandler
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from classroom_project.database import sqlite_producao
+from classroom_project.routers import LeituraEscritaRouter
+
+from . import (
+    access_cache, benchmark, bulk, conditional, file_metadata, metrics,
+    processing, renderers, uploads
+)
+from . import urls as classroom_urls
+from .authentication import ClassroomTokenObtainPairSerializer
+from .views import (
+    TreinamentoViewSet, TurmaViewSet, RecursoViewSet, AlunoViewSet,
+    MatriculaViewSet
+)
+from .visibility import (
+    matriculas_ativas, turmas_matriculadas, recursos_visiveis,
+    recurso_com_acesso, prefetch_recursos_visiveis
+)
+from .models import (
+    Treinamento, Turma, Recurso, Aluno, Matricula, UploadRecurso,
+    ProcessamentoArquivo
+)
+
+
+class ClassroomTestCase(TestCase):
+    """Base com dados comuns aos testes da API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        hoje = date.today()
+        cls.admin = User.objects.create_user(
+            username='admin', password='admin123', is_staff=True
+        )
+        cls.user = User.objects.create_user(
+            username='joao', password='senha123'
+        )
+        cls.aluno = Aluno.objects.create(
+            user=cls.user, nome='João', email='joao@example.com'
+        )
+        cls.treinamento = Treinamento.objects.create(
+            nome='Python', descricao='Python do zero'
+        )
+        cls.turma_ativa = Turma.objects.create(
+            treinamento=cls.treinamento, nome='Turma Ativa',
+            data_inicio=hoje - timedelta(days=10),
+            data_conclusao=hoje + timedelta(days=30)
+        )
+        cls.turma_futura = Turma.objects.create(
+            treinamento=cls.treinamento, nome='Turma Futura',
+            data_inicio=hoje + timedelta(days=30),
+            data_conclusao=hoje + timedelta(days=60)
+        )
+        for turma in (cls.turma_ativa, cls.turma_futura):
+            Matricula.objects.create(turma=turma, aluno=cls.aluno)
+            for ordem, (acesso_previo, draft) in enumerate(
+                [(True, False), (False, False), (False, True)]
+            ):
+                Recurso.objects.create(
+                    turma=turma, tipo_recurso='pdf',
+                    acesso_previo=acesso_previo, draft=draft,
+                    nome_recurso=f'Recurso {ordem}',
+                    descricao_recurso='Descrição', ordem=ordem
+                )
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    @classmethod
+    def criar_turmas(cls, quantidade, alunos=2, recursos=2):
+        """Cria turmas extras com matrículas e recursos"""
+        hoje = date.today()
+        turmas = []
+        for i in range(quantidade):
+            turma = Turma.objects.create(
+                treinamento=cls.treinamento, nome=f'Turma {i}',
+                data_inicio=hoje - timedelta(days=i),
+                data_conclusao=hoje + timedelta(days=30)
+            )
+            for j in range(alunos):
+                user = User.objects.create_user(username=f'aluno_{i}_{j}')
+                aluno = Aluno.objects.create(
+                    user=user, nome=f'Aluno {i} {j}',
+                    email=f'aluno_{i}_{j}@example.com'
+                )
+                Matricula.objects.create(turma=turma, aluno=aluno)
+            for j in range(recursos):
+                Recurso.objects.create(
+                    turma=turma, tipo_recurso='video',
+                    nome_recurso=f'Recurso {j}',
+                    descricao_recurso='Descrição', ordem=j
+                )
+            turmas.append(turma)
+        return turmas
+
+
+class TurmaQueryCountTests(ClassroomTestCase):
+    """Garante que list/retrieve de turmas não voltem a ter N+1"""
+
+    def test_lista_admin_numero_fixo_de_queries(self):
+        self.client.force_authenticate(self.admin)
+        # Validador (faz o papel do COUNT) + turmas + prefetch de recursos
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('turma-list'))
+        self.assertEqual(response.status_code, 200)
+
+        self.criar_turmas(15)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('turma-list'))
+        self.assertEqual(response.data['count'], 17)
+        self.assertEqual(len(response.data['results']), 17)
+
+    def test_lista_aluno_numero_fixo_de_queries(self):
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        self.criar_turmas(5)
+        # aluno + validador (COUNT) + turmas + prefetch de recursos
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('turma-list'))
+        self.assertEqual(response.data['count'], 2)
+
+    def test_detalhe_numero_fixo_de_queries(self):
+        self.client.force_authenticate(self.admin)
+        url = reverse('turma-detail', args=[self.turma_ativa.id])
+        # Validador (ETag) + turma + prefetch de recursos
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.data['treinamento_nome'], 'Python')
+        self.assertEqual(len(response.data['recursos']), 3)
+        self.assertEqual(
+            response.data['recursos'][0]['turma_nome'], 'Turma Ativa'
+        )
+
+    def test_total_alunos_conta_apenas_matriculas_ativas(self):
+        outro = User.objects.create_user(username='maria')
+        aluno = Aluno.objects.create(
+            user=outro, nome='Maria', email='maria@example.com'
+        )
+        Matricula.objects.create(
+            turma=self.turma_ativa, aluno=aluno, ativo=False
+        )
+        self.client.force_authenticate(self.user)
+        response = self.client.get(
+            reverse('turma-detail', args=[self.turma_ativa.id])
+        )
+        self.assertEqual(response.data['total_alunos'], 1)
+
+
+class VisibilidadeRecursosTests(ClassroomTestCase):
+    """Regras de visibilidade compartilhadas por minhas-turmas e download"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+
+    def test_minhas_turmas_aplica_regras(self):
+        response = self.client.get(reverse('minhas-turmas'))
+        self.assertEqual(response.status_code, 200)
+        turmas = {turma['id']: turma for turma in response.data}
+        ativa = turmas[self.turma_ativa.id]
+        futura = turmas[self.turma_futura.id]
+        self.assertTrue(ativa['pode_acessar'])
+        self.assertFalse(futura['pode_acessar'])
+        # Turma iniciada: tudo menos draft; futura: apenas acesso prévio
+        self.assertEqual(
+            [r['nome_recurso'] for r in ativa['recursos']],
+            ['Recurso 0', 'Recurso 1']
+        )
+        self.assertEqual(
+            [r['nome_recurso'] for r in futura['recursos']],
+            ['Recurso 0']
+        )
+
+    def test_minhas_turmas_numero_fixo_de_queries(self):
+        # validador (ETag) + aluno + turmas + recursos visíveis
+        with self.assertNumQueries(4):
+            self.client.get(reverse('minhas-turmas'))
+
+        for turma in self.criar_turmas(10, alunos=0):
+            Matricula.objects.create(turma=turma, aluno=self.aluno)
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('minhas-turmas'))
+        self.assertEqual(len(response.data), 12)
+
+    def test_download_respeita_regras(self):
+        recursos = Recurso.objects.filter(turma=self.turma_futura)
+        draft = recursos.get(draft=True)
+        sem_acesso_previo = recursos.get(draft=False, acesso_previo=False)
+        for recurso, mensagem in (
+            (draft, 'Recurso não disponível'),
+            (sem_acesso_previo,
+             'Recurso disponível apenas após início da turma'),
+        ):
+            response = self.client.get(
+                reverse('download-recurso', args=[recurso.id])
+            )
+            self.assertEqual(response.status_code, 403)
+            self.assertEqual(response.data['error'], mensagem)
+
+    def test_download_exige_matricula_ativa(self):
+        recurso = Recurso.objects.filter(
+            turma=self.turma_ativa, draft=False
+        ).first()
+        Matricula.objects.filter(turma=self.turma_ativa).update(ativo=False)
+        response = self.client.get(
+            reverse('download-recurso', args=[recurso.id])
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(
+            response.data['error'], 'Você não está matriculado nesta turma'
+        )
+
+    def test_download_recurso_visivel_sem_arquivo(self):
+        recurso = Recurso.objects.filter(
+            turma=self.turma_ativa, draft=False
+        ).first()
+        # aluno + recurso com turma e matrícula
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse('download-recurso', args=[recurso.id])
+            )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['error'], 'Recurso não possui arquivo')
+
+
+class ArquivoTestMixin:
+    """Usa um MEDIA_ROOT temporário para os arquivos dos recursos"""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            RECURSO_UPLOAD_TEMP_DIR=f'{self.media_root}/uploads_tmp'
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def anexar_arquivo(self, recurso, conteudo, nome='aula.mp4'):
+        recurso.arquivo = SimpleUploadedFile(nome, conteudo)
+        recurso.save()
+        return recurso
+
+
+class DownloadRangeTests(ArquivoTestMixin, ClassroomTestCase):
+    """Range, 206/416 e requisições condicionais no download"""
+
+    conteudo = bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        recurso = Recurso.objects.filter(
+            turma=self.turma_ativa, draft=False
+        ).first()
+        self.recurso = self.anexar_arquivo(recurso, self.conteudo)
+        self.url = reverse('download-recurso', args=[self.recurso.id])
+
+    def test_download_completo_anuncia_ranges_e_validadores(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.conteudo)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('attachment', response['Content-Disposition'])
+
+    def test_range_unico(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(
+            b''.join(response.streaming_content), self.conteudo[10:20]
+        )
+
+    def test_range_sufixo_e_aberto(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(
+            b''.join(response.streaming_content), self.conteudo[-4:]
+        )
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1020-')
+        self.assertEqual(response['Content-Range'], 'bytes 1020-1023/1024')
+        self.assertEqual(
+            b''.join(response.streaming_content), self.conteudo[1020:]
+        )
+
+    def test_multiplos_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1,100-102')
+        self.assertEqual(response.status_code, 206)
+        content_type = response['Content-Type']
+        self.assertTrue(content_type.startswith('multipart/byteranges'))
+        boundary = content_type.split('boundary=')[1]
+        corpo = b''.join(response.streaming_content)
+        self.assertEqual(len(corpo), int(response['Content-Length']))
+        self.assertIn(b'Content-Range: bytes 0-1/1024', corpo)
+        self.assertIn(b'Content-Range: bytes 100-102/1024', corpo)
+        self.assertIn(b'\r\n\r\n' + self.conteudo[100:103], corpo)
+        self.assertTrue(corpo.endswith(f'--{boundary}--\r\n'.encode()))
+
+    def test_range_nao_satisfativel(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-6000')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_if_none_match_retorna_304(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since_retorna_304(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_muda_quando_recurso_e_editado(self):
+        etag = self.client.get(self.url)['ETag']
+        self.recurso.nome_recurso = 'Renomeado'
+        self.recurso.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_range_desatualizado_envia_arquivo_completo(self):
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"outro"'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_condicional_nao_ignora_autorizacao(self):
+        etag = self.client.get(self.url)['ETag']
+        matricula = Matricula.objects.get(
+            turma=self.turma_ativa, aluno=self.aluno
+        )
+        matricula.ativo = False
+        matricula.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 403)
+
+
+class DownloadOffloadTests(ArquivoTestMixin, ClassroomTestCase):
+    """Cabeçalhos emitidos por cada modo de entrega de arquivos"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        recurso = Recurso.objects.filter(
+            turma=self.turma_ativa, draft=False
+        ).first()
+        self.recurso = self.anexar_arquivo(recurso, b'conteudo', 'aula.pdf')
+        self.url = reverse('download-recurso', args=[self.recurso.id])
+
+    @override_settings(
+        RECURSO_DOWNLOAD_MODE='x-accel',
+        RECURSO_DOWNLOAD_INTERNAL_URL='/protected/'
+    )
+    def test_modo_x_accel(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/protected/' + self.recurso.arquivo.name
+        )
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertEqual(response.content, b'')
+        self.assertNotIn('X-Sendfile', response)
+
+    @override_settings(RECURSO_DOWNLOAD_MODE='x-sendfile')
+    def test_modo_x_sendfile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Sendfile'], self.recurso.arquivo.path)
+        self.assertEqual(response.content, b'')
+        self.assertNotIn('X-Accel-Redirect', response)
+
+    def test_nome_com_acento(self):
+        self.anexar_arquivo(self.recurso, b'conteudo', 'introdução.pdf')
+        self.assertIn('ç', self.recurso.arquivo.name)
+        for modo, cabecalho, esperado in (
+            ('x-accel', 'X-Accel-Redirect',
+             '/protected/' + quote(self.recurso.arquivo.name)),
+            ('x-sendfile', 'X-Sendfile', quote(self.recurso.arquivo.path)),
+        ):
+            with self.subTest(modo), override_settings(
+                RECURSO_DOWNLOAD_MODE=modo,
+                RECURSO_DOWNLOAD_INTERNAL_URL='/protected/'
+            ):
+                response = self.client.get(self.url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response[cabecalho], esperado)
+                self.assertIn('introdu%C3%A7%C3%A3o', response[cabecalho])
+                self.assertTrue(response[cabecalho].isascii())
+
+    @override_settings(RECURSO_DOWNLOAD_MODE='django')
+    def test_modo_django_faz_streaming(self):
+        response = self.client.get(self.url)
+        self.assertEqual(b''.join(response.streaming_content), b'conteudo')
+        self.assertNotIn('X-Accel-Redirect', response)
+        self.assertNotIn('X-Sendfile', response)
+
+    @override_settings(RECURSO_DOWNLOAD_MODE='x-accel')
+    def test_offload_mantem_autorizacao(self):
+        Matricula.objects.filter(turma=self.turma_ativa).update(ativo=False)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('X-Accel-Redirect', response)
+
+
+class UploadRecursoTests(ArquivoTestMixin, ClassroomTestCase):
+    """Upload em partes, resumível, para Recurso.arquivo"""
+
+    conteudo = b'0123456789' * 100
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+        self.recurso = Recurso.objects.filter(turma=self.turma_ativa).first()
+
+    def criar_sessao(self, nome='aula.mp4', tamanho=None):
+        return self.client.post(reverse('upload-list'), {
+            'recurso': self.recurso.id,
+            'nome_arquivo': nome,
+            'tamanho': len(self.conteudo) if tamanho is None else tamanho,
+        }, format='json')
+
+    def enviar_parte(self, upload_id, offset, dados):
+        return self.client.patch(
+            reverse('upload-detail', args=[upload_id]),
+            data=dados,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_fluxo_completo(self):
+        response = self.criar_sessao()
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.data['id']
+        self.assertEqual(response.data['offset'], 0)
+
+        for offset in range(0, len(self.conteudo), 300):
+            response = self.enviar_parte(
+                upload_id, offset, self.conteudo[offset:offset + 300]
+            )
+            self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Upload-Offset'], '1000')
+
+        response = self.client.post(
+            reverse('upload-finalizar', args=[upload_id])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.recurso.refresh_from_db()
+        with self.recurso.arquivo.open('rb') as arquivo:
+            self.assertEqual(arquivo.read(), self.conteudo)
+        self.assertTrue(UploadRecurso.objects.get(pk=upload_id).concluido)
+        # Metadados só depois do pós-processamento (ver processing.py)
+        self.assertIsNone(response.data['arquivo_tamanho'])
+        self.assertEqual(
+            ProcessamentoArquivo.objects.get(recurso=self.recurso).status,
+            ProcessamentoArquivo.PENDENTE
+        )
+
+    def test_retomar_apos_parte_interrompida(self):
+        upload_id = self.criar_sessao().data['id']
+        self.enviar_parte(upload_id, 0, self.conteudo[:400])
+
+        response = self.client.get(reverse('upload-detail', args=[upload_id]))
+        self.assertEqual(response['Upload-Offset'], '400')
+        self.assertEqual(response.data['offset'], 400)
+
+        # Offset errado é recusado e o servidor informa o correto
+        response = self.enviar_parte(upload_id, 100, self.conteudo[100:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '400')
+
+        self.enviar_parte(upload_id, 400, self.conteudo[400:])
+        response = self.client.post(
+            reverse('upload-finalizar', args=[upload_id])
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_finalizar_upload_incompleto(self):
+        upload_id = self.criar_sessao().data['id']
+        self.enviar_parte(upload_id, 0, self.conteudo[:10])
+        response = self.client.post(
+            reverse('upload-finalizar', args=[upload_id])
+        )
+        self.assertEqual(response.status_code, 409)
+
+    @unittest.skipIf(uploads.fcntl is None, 'flock indisponível')
+    def test_parte_repetida_durante_gravacao(self):
+        upload_id = self.criar_sessao().data['id']
+        self.enviar_parte(upload_id, 0, self.conteudo[:400])
+        upload = UploadRecurso.objects.get(pk=upload_id)
+        # Outra requisição com a parte 400: segura a trava do arquivo
+        with open(uploads.caminho_parcial(upload), 'r+b') as arquivo:
+            uploads.fcntl.flock(arquivo, uploads.fcntl.LOCK_EX)
+            response = self.enviar_parte(upload_id, 400, b'x' * 600)
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response['Upload-Offset'], '400')
+            response = self.client.post(
+                reverse('upload-finalizar', args=[upload_id])
+            )
+            self.assertEqual(response.status_code, 409)
+        self.assertEqual(os.path.getsize(uploads.caminho_parcial(upload)), 400)
+
+        response = self.enviar_parte(upload_id, 400, self.conteudo[400:])
+        self.assertEqual(response.status_code, 204)
+
+    def test_finalizar_confere_tamanho_do_arquivo(self):
+        upload_id = self.criar_sessao().data['id']
+        self.enviar_parte(upload_id, 0, self.conteudo)
+        upload = UploadRecurso.objects.get(pk=upload_id)
+        os.truncate(uploads.caminho_parcial(upload), 500)
+        response = self.client.post(
+            reverse('upload-finalizar', args=[upload_id])
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(UploadRecurso.objects.get(pk=upload_id).concluido)
+
+    def test_finalizar_duas_vezes(self):
+        upload_id = self.criar_sessao().data['id']
+        self.enviar_parte(upload_id, 0, self.conteudo)
+        # Instância lida antes da outra requisição finalizar
+        upload = UploadRecurso.objects.get(pk=upload_id)
+        url = reverse('upload-finalizar', args=[upload_id])
+        self.assertEqual(self.client.post(url).status_code, 200)
+        with self.assertRaises(uploads.UploadConcluido):
+            uploads.finalizar(upload)
+        with self.assertRaises(uploads.UploadConcluido):
+            uploads.gravar_parte(upload, None, upload.offset, 0)
+        self.assertFalse(os.path.exists(uploads.caminho_parcial(upload)))
+        self.assertEqual(self.client.post(url).status_code, 409)
+
+    def test_extensao_validada_na_criacao(self):
+        response = self.criar_sessao(nome='script.exe')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('nome_arquivo', response.data)
+
+    @override_settings(RECURSO_UPLOAD_CHUNK_MAX_SIZE=100)
+    def test_parte_acima_do_limite(self):
+        upload_id = self.criar_sessao().data['id']
+        response = self.enviar_parte(upload_id, 0, self.conteudo[:200])
+        self.assertEqual(response.status_code, 413)
+
+    def test_apenas_admin(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.criar_sessao().status_code, 403)
+
+
+def caixa_mp4(tipo, conteudo):
+    return struct.pack('>I', 8 + len(conteudo)) + tipo + conteudo
+
+
+def arquivo_mp4(marca=b'isom', versao=0, escala=1000, duracao=12345):
+    if versao == 1:
+        mvhd = b'\x01\0\0\0' + struct.pack('>QQIQ', 0, 0, escala, duracao)
+    else:
+        mvhd = b'\0\0\0\0' + struct.pack('>IIII', 0, 0, escala, duracao)
+    # moov depois do mdat, como na maioria dos arquivos gravados
+    return (
+        caixa_mp4(b'ftyp', marca + b'\0\0\0\0' + marca)
+        + caixa_mp4(b'mdat', b'\0' * 1000)
+        + caixa_mp4(b'moov', caixa_mp4(b'mvhd', mvhd + b'\0' * 80))
+    )
+
+
+def arquivo_avi(microssegundos=40000, frames=250):
+    avih = struct.pack('<5I', microssegundos, 0, 0, 0, frames) + b'\0' * 36
+    hdrl = b'hdrl' + b'avih' + struct.pack('<I', len(avih)) + avih
+    return (
+        b'RIFF' + struct.pack('<I', 12 + len(hdrl)) + b'AVI '
+        + b'LIST' + struct.pack('<I', len(hdrl)) + hdrl
+    )
+
+
+def arquivo_pdf():
+    """3 páginas em uma árvore de dois níveis (e um /Count de outline)"""
+    objetos = [
+        b'<< /Type /Catalog /Pages 2 0 R /Outlines 7 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R 6 0 R] /Count 3 >>',
+        b'<< /Type /Pages /Parent 2 0 R /Kids [4 0 R 5 0 R] /Count 2 >>',
+        b'<< /Type /Page /Parent 3 0 R >>',
+        b'<< /Type /Page /Parent 3 0 R >>',
+        b'<< /Type /Page /Parent 2 0 R >>',
+        b'<< /Type /Outlines /Count 7 >>',
+    ]
+    corpo = b''.join(
+        b'%d 0 obj\n%s\nendobj\n' % (numero, objeto)
+        for numero, objeto in enumerate(objetos, start=1)
+    )
+    return b'%PDF-1.4\n' + corpo + b'trailer\n<< /Root 1 0 R >>\n%%EOF\n'
+
+
+def arquivo_pdf_comprimido(paginas=5):
+    """Árvore de páginas dentro de um object stream (PDF 1.5+)"""
+    objetos = [
+        (2, b'<< /Type /Pages /Kids [4 0 R] /Count %d >>' % paginas),
+        (3, b'<< /Type /Outlines /Count 9 >>'),
+    ]
+    cabecalho = conteudo = b''
+    for numero, objeto in objetos:
+        cabecalho += b'%d %d ' % (numero, len(conteudo))
+        conteudo += objeto + b'\n'
+    dados = zlib.compress(cabecalho + conteudo)
+    return (
+        b'%%PDF-1.5\n1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n'
+        b'5 0 obj\n<< /Type /ObjStm /N 2 /First %d /Filter /FlateDecode '
+        b'/Length %d >>\nstream\n' % (len(cabecalho), len(dados))
+        + dados + b'\nendstream\nendobj\n%%EOF\n'
+    )
+
+
+def arquivo_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as arquivo:
+        arquivo.writestr('slides.txt', 'conteúdo')
+    return buffer.getvalue()
+
+
+class MetadadosArquivoTests(ArquivoTestMixin, TestCase):
+    """Extração de tamanho, SHA-256, tipo e páginas/duração (file_metadata.py)"""
+
+    def extrair(self, conteudo):
+        caminho = f'{self.media_root}/arquivo'
+        with open(caminho, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        return file_metadata.extrair(caminho)
+
+    def test_tamanho_e_sha256(self):
+        conteudo = b'x' * (file_metadata.CHUNK_SIZE + 10)
+        metadados = self.extrair(conteudo)
+        self.assertEqual(metadados['tamanho'], len(conteudo))
+        self.assertEqual(metadados['sha256'],
+                         hashlib.sha256(conteudo).hexdigest())
+        self.assertEqual(metadados['mime'], 'application/octet-stream')
+
+    def test_tipos_e_duracao_ou_paginas(self):
+        for conteudo, mime, paginas, duracao_ms in (
+            (arquivo_pdf(), 'application/pdf', 3, None),
+            (arquivo_pdf_comprimido(), 'application/pdf', 5, None),
+            (arquivo_mp4(), 'video/mp4', None, 12345),
+            (arquivo_mp4(b'qt  ', versao=1, escala=600, duracao=600 * 90),
+             'video/quicktime', None, 90000),
+            (arquivo_avi(), 'video/x-msvideo', None, 10000),
+            (arquivo_zip(), 'application/zip', None, None),
+        ):
+            with self.subTest(mime=mime, paginas=paginas, duracao=duracao_ms):
+                metadados = self.extrair(conteudo)
+                self.assertEqual(
+                    (metadados['mime'], metadados['paginas'],
+                     metadados['duracao_ms']),
+                    (mime, paginas, duracao_ms)
+                )
+
+    def test_arquivos_malformados_sem_erro(self):
+        for conteudo, mime in (
+            (arquivo_mp4()[:1030], 'video/mp4'),
+            (b'%PDF-1.4\n1 0 obj\n<< /Type /Pages /Count', 'application/pdf'),
+            (arquivo_pdf_comprimido().replace(b'/FlateDecode', b'/LZWDecode'),
+             'application/pdf'),
+            (arquivo_avi()[:40], 'video/x-msvideo'),
+        ):
+            with self.subTest(mime=mime):
+                metadados = self.extrair(conteudo)
+                self.assertEqual(metadados['mime'], mime)
+                self.assertIsNone(metadados['paginas'])
+                self.assertIsNone(metadados['duracao_ms'])
+
+    def test_object_stream_acima_do_limite_ignorado(self):
+        conteudo = arquivo_pdf_comprimido()
+        self.assertEqual(self.extrair(conteudo)['paginas'], 5)
+        with mock.patch('classroom.file_metadata.OBJSTM_MAX_BYTES', 16):
+            self.assertIsNone(self.extrair(conteudo)['paginas'])
+
+
+class ProcessamentoArquivosTests(ArquivoTestMixin, ClassroomTestCase):
+    """Fila de pós-processamento dos arquivos (processing.py)"""
+
+    def setUp(self):
+        super().setUp()
+        self.recurso = Recurso.objects.filter(
+            turma=self.turma_ativa, draft=False
+        ).first()
+
+    def processar(self):
+        return processing.executar(workers=1, uma_vez=True)
+
+    def test_arquivo_novo_cria_job_sem_processar(self):
+        self.anexar_arquivo(self.recurso, arquivo_pdf(), 'apostila.pdf')
+        job = ProcessamentoArquivo.objects.get(recurso=self.recurso)
+        self.assertEqual(job.status, ProcessamentoArquivo.PENDENTE)
+        self.assertEqual(job.arquivo, self.recurso.arquivo.name)
+        self.assertIsNone(self.recurso.arquivo_tamanho)
+        # Salvar de novo (sem trocar o arquivo) não duplica o job
+        self.recurso.nome_recurso = 'Apostila'
+        self.recurso.save()
+        self.assertEqual(ProcessamentoArquivo.objects.count(), 1)
+
+    def test_processa_e_grava_metadados(self):
+        conteudo = arquivo_pdf()
+        self.anexar_arquivo(self.recurso, conteudo, 'apostila.pdf')
+        self.assertEqual(self.processar(), {'concluidos': 1, 'falhas': 0})
+
+        self.recurso.refresh_from_db()
+        self.assertTrue(self.recurso.metadados_atuais)
+        self.assertEqual(self.recurso.arquivo_tamanho, len(conteudo))
+        self.assertEqual(self.recurso.arquivo_sha256,
+                         hashlib.sha256(conteudo).hexdigest())
+        self.assertEqual(self.recurso.arquivo_paginas, 3)
+        job = ProcessamentoArquivo.objects.get()
+        self.assertEqual(job.status, ProcessamentoArquivo.CONCLUIDO)
+        self.assertEqual(job.tentativas, 1)
+
+        self.client.force_authenticate(self.admin)
+        item = self.client.get(
+            reverse('recurso-detail', args=[self.recurso.id])
+        ).data
+        self.assertEqual(
+            (item['arquivo_tamanho'], item['arquivo_mime'],
+             item['arquivo_paginas']),
+            (len(conteudo), 'application/pdf', 3)
+        )
+
+    def test_troca_de_arquivo_limpa_metadados(self):
+        self.anexar_arquivo(self.recurso, arquivo_pdf(), 'apostila.pdf')
+        self.processar()
+        self.recurso.refresh_from_db()
+        self.anexar_arquivo(self.recurso, arquivo_mp4(), 'aula.mp4')
+        self.assertIsNone(self.recurso.arquivo_tamanho)
+        self.recurso.refresh_from_db()
+        self.assertEqual(
+            (self.recurso.arquivo_processado, self.recurso.arquivo_paginas),
+            ('', None)
+        )
+
+        self.processar()
+        self.recurso.refresh_from_db()
+        self.assertEqual(self.recurso.arquivo_mime, 'video/mp4')
+        self.assertEqual(self.recurso.arquivo_duracao_ms, 12345)
+        self.assertIsNone(self.recurso.arquivo_paginas)
+
+    def test_job_de_arquivo_substituido_nao_grava(self):
+        self.anexar_arquivo(self.recurso, arquivo_pdf(), 'apostila.pdf')
+        antigo = ProcessamentoArquivo.objects.get()
+        self.anexar_arquivo(self.recurso, arquivo_zip(), 'material.zip')
+        # Só o job antigo é executado: o recurso já tem outro arquivo
+        ProcessamentoArquivo.objects.exclude(pk=antigo.pk).update(
+            status=ProcessamentoArquivo.CONCLUIDO
+        )
+        self.processar()
+        self.recurso.refresh_from_db()
+        self.assertFalse(self.recurso.metadados_atuais)
+        self.assertIsNone(self.recurso.arquivo_tamanho)
+
+    @override_settings(PROCESSAMENTO_MAX_TENTATIVAS=2)
+    def test_falhas_sao_repetidas_ate_o_limite(self):
+        self.anexar_arquivo(self.recurso, arquivo_pdf(), 'apostila.pdf')
+        self.recurso.arquivo.storage.delete(self.recurso.arquivo.name)
+        with self.assertLogs('classroom.processing', 'ERROR'):
+            self.assertEqual(self.processar(), {'concluidos': 0, 'falhas': 2})
+        job = ProcessamentoArquivo.objects.get()
+        self.assertEqual(
+            (job.status, job.tentativas),
+            (ProcessamentoArquivo.ERRO, 2)
+        )
+        self.assertIn('No such file', job.erro)
+
+        self.assertEqual(processing.repetir_erros(), 1)
+        self.assertEqual(ProcessamentoArquivo.objects.get().status,
+                         ProcessamentoArquivo.PENDENTE)
+
+    def test_erro_inesperado_e_falha_do_job(self):
+        self.anexar_arquivo(self.recurso, arquivo_pdf(), 'apostila.pdf')
+        with mock.patch('classroom.processing.extrair',
+                        side_effect=RuntimeError('parser quebrou')), \
+                self.assertLogs('classroom.processing', 'ERROR') as logs:
+            self.assertEqual(self.processar(), {'concluidos': 0, 'falhas': 3})
+        self.assertIn('RuntimeError: parser quebrou', logs.output[0])
+        job = ProcessamentoArquivo.objects.get()
+        self.assertEqual(
+            (job.status, job.erro), (ProcessamentoArquivo.ERRO, 'parser quebrou')
+        )
+
+    def test_job_preso_volta_para_a_fila(self):
+        self.anexar_arquivo(self.recurso, arquivo_pdf(), 'apostila.pdf')
+        ProcessamentoArquivo.objects.update(
+            status=ProcessamentoArquivo.PROCESSANDO, tentativas=1,
+            iniciado_em=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(self.processar(), {'concluidos': 1, 'falhas': 0})
+        self.assertEqual(ProcessamentoArquivo.objects.get().tentativas, 2)
+
+    def test_reserva_nao_pega_job_de_outro_worker(self):
+        self.anexar_arquivo(self.recurso, arquivo_pdf(), 'apostila.pdf')
+        self.assertEqual(len(processing.reservar(10)), 1)
+        self.assertEqual(processing.reservar(10), [])
+
+    def test_enfileirar_existentes(self):
+        self.anexar_arquivo(self.recurso, arquivo_pdf(), 'apostila.pdf')
+        ProcessamentoArquivo.objects.all().delete()
+        self.assertEqual(processing.enfileirar_existentes(), 1)
+        self.assertEqual(processing.enfileirar_existentes(), 0)
+
+    def test_comando(self):
+        self.anexar_arquivo(self.recurso, arquivo_avi(), 'aula.avi')
+        saida = io.StringIO()
+        # Uma thread: o banco de testes em memória não é compartilhado
+        call_command(
+            'processar_arquivos', '--uma-vez', '--workers', '1', stdout=saida
+        )
+        self.assertIn('1 arquivos processados, 0 falhas', saida.getvalue())
+        self.recurso.refresh_from_db()
+        self.assertEqual(self.recurso.arquivo_duracao_ms, 10000)
+
+    def test_download_usa_metadados_sem_stat(self):
+        conteudo = arquivo_pdf()
+        # Extensão errada: o tipo vem do conteúdo
+        self.anexar_arquivo(self.recurso, conteudo, 'apostila.mp4')
+        self.processar()
+        self.client.force_authenticate(self.user)
+        url = reverse('download-recurso', args=[self.recurso.id])
+        caminho = Recurso.objects.get(pk=self.recurso.pk).arquivo.path
+
+        with mock.patch('classroom.downloads.os.stat', wraps=os.stat) as stat:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), conteudo)
+            self.assertEqual(response['Content-Length'], str(len(conteudo)))
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+            sha256 = hashlib.sha256(conteudo).hexdigest()
+            self.assertIn(sha256[:16], response['ETag'])
+
+            # Decisão em cache: os metadados vêm junto
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+            self.assertEqual(response.status_code, 304)
+            response = self.client.get(url, HTTP_RANGE='bytes=0-9')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b''.join(response.streaming_content),
+                             conteudo[:10])
+        self.assertNotIn(caminho, [c.args[0] for c in stat.call_args_list])
+
+    def test_arquivo_ausente_com_metadados(self):
+        self.anexar_arquivo(self.recurso, arquivo_pdf(), 'apostila.pdf')
+        self.processar()
+        self.client.force_authenticate(self.user)
+        url = reverse('download-recurso', args=[self.recurso.id])
+        recurso = Recurso.objects.get(pk=self.recurso.pk)
+        recurso.arquivo.storage.delete(recurso.arquivo.name)
+        # 404 antes de enviar status e cabeçalhos, inclusive com Range
+        for intervalo in (None, 'bytes=0-9', 'bytes=0-1,4-5'):
+            with self.subTest(intervalo=intervalo):
+                response = self.client.get(url, HTTP_RANGE=intervalo or '')
+                self.assertEqual(response.status_code, 404)
+
+
+class CacheAcessoDownloadTests(ArquivoTestMixin, ClassroomTestCase):
+    """Decisões de acesso em cache e sua invalidação por signals"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        recurso = Recurso.objects.filter(
+            turma=self.turma_ativa, draft=False, acesso_previo=False
+        ).first()
+        self.recurso = self.anexar_arquivo(recurso, b'conteudo')
+        self.url = reverse('download-recurso', args=[self.recurso.id])
+
+    def test_requisicoes_repetidas_nao_consultam_banco(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_RANGE='bytes=0-3')
+        self.assertEqual(b''.join(response.streaming_content), b'cont')
+
+    def test_invalida_ao_desativar_matricula(self):
+        self.client.get(self.url)
+        matricula = Matricula.objects.get(
+            turma=self.turma_ativa, aluno=self.aluno
+        )
+        matricula.ativo = False
+        matricula.save()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        matricula.ativo = True
+        matricula.save()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_invalida_ao_marcar_draft(self):
+        self.client.get(self.url)
+        self.recurso.draft = True
+        self.recurso.save()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_invalida_ao_adiar_inicio_da_turma(self):
+        self.client.get(self.url)
+        self.turma_ativa.data_inicio = date.today() + timedelta(days=5)
+        self.turma_ativa.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(
+            response.data['error'],
+            'Recurso disponível apenas após início da turma'
+        )
+
+    def test_bloqueio_por_data_expira_no_inicio_da_turma(self):
+        recurso = Recurso.objects.filter(
+            turma=self.turma_futura, draft=False, acesso_previo=False
+        ).first()
+        url = reverse('download-recurso', args=[recurso.id])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertIsNotNone(access_cache.obter(self.user.id, recurso.id))
+
+        inicio = self.turma_futura.data_inicio
+
+        class Amanha(date):
+            @classmethod
+            def today(cls):
+                return inicio
+
+        with mock.patch('classroom.access_cache.date', Amanha):
+            self.assertIsNone(access_cache.obter(self.user.id, recurso.id))
+
+    def test_decisao_expira_em_poucos_segundos(self):
+        # Alteração sem invalidação, como a de outro worker com LocMemCache
+        self.client.get(self.url)
+        Matricula.objects.filter(
+            turma=self.turma_ativa, aluno=self.aluno
+        ).update(ativo=False)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        depois = time.time() + access_cache.get_timeout() + 1
+        with mock.patch('time.time', return_value=depois):
+            self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertLessEqual(access_cache.get_timeout(), 5)
+
+    def test_cache_por_usuario(self):
+        self.client.get(self.url)
+        outro = User.objects.create_user(username='maria')
+        Aluno.objects.create(user=outro, nome='Maria', email='m@example.com')
+        self.client.force_authenticate(outro)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class CacheRespostasTests(ClassroomTestCase):
+    """Cache versionado das respostas de treinamentos e turmas"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def test_repeticao_servida_do_cache(self):
+        url = reverse('turma-list')
+        primeira = self.client.get(url)
+        self.assertEqual(primeira['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            segunda = self.client.get(url)
+        self.assertEqual(segunda['X-Cache'], 'HIT')
+        self.assertEqual(segunda.data, primeira.data)
+
+    def test_query_string_faz_parte_da_chave(self):
+        url = reverse('treinamento-list')
+        self.client.get(url)
+        response = self.client.get(url, {'page': 1})
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_save_invalida_respostas_dependentes(self):
+        url = reverse('turma-detail', args=[self.turma_ativa.id])
+        self.client.get(url)
+        self.treinamento.nome = 'Novo nome'
+        self.treinamento.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+        self.client.get(url)
+        Matricula.objects.filter(turma=self.turma_ativa).delete()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['total_alunos'], 0)
+
+    def test_matricula_em_lote_invalida(self):
+        outro = User.objects.create_user(username='maria')
+        aluno = Aluno.objects.create(
+            user=outro, nome='Maria', email='m@example.com'
+        )
+        url = reverse('turma-detail', args=[self.turma_ativa.id])
+        total = self.client.get(url).data['total_alunos']
+        bulk.matricular_em_lote(
+            [{'turma': self.turma_ativa.id, 'aluno': aluno.id}]
+        )
+        self.assertEqual(self.client.get(url).data['total_alunos'], total + 1)
+
+    def test_turmas_de_aluno_nao_usam_cache(self):
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        url = reverse('turma-list')
+        self.client.get(url)
+        self.assertNotIn('X-Cache', self.client.get(url))
+
+    def test_estatisticas(self):
+        url = reverse('treinamento-list')
+        self.client.get(url)
+        self.client.get(url)
+        self.client.get(url)
+        response = self.client.get(reverse('cache-estatisticas'))
+        self.assertEqual(
+            response.data['treinamentos'], {'hits': 2, 'misses': 1}
+        )
+        self.assertEqual(response.data['turmas'], {'hits': 0, 'misses': 0})
+
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        response = self.client.get(reverse('cache-estatisticas'))
+        self.assertEqual(response.status_code, 403)
+
+
+class RequisicoesCondicionaisTests(ClassroomTestCase):
+    """ETag/Last-Modified, 304 e If-Match (ver conditional.py)"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def revalidar(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_304_sem_buscar_os_dados(self):
+        url = reverse('recurso-list')
+        response = self.client.get(url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        # Apenas o validador
+        with self.assertNumQueries(1):
+            response = self.revalidar(url, response)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        url = reverse('aluno-detail', args=[self.aluno.id])
+        response = self.client.get(url)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_alteracoes_em_relacoes_mudam_o_etag(self):
+        url = reverse('turma-detail', args=[self.turma_ativa.id])
+        recurso = self.turma_ativa.recursos.first()
+        matricula = Matricula.objects.get(
+            turma=self.turma_ativa, aluno=self.aluno
+        )
+
+        def desativar_matricula():
+            matricula.ativo = False
+            matricula.save()
+
+        for alteracao in (
+            desativar_matricula,
+            recurso.delete,
+            lambda: Treinamento.objects.filter(pk=self.treinamento.pk)
+            .get().save(),
+        ):
+            response = self.client.get(url)
+            alteracao()
+            self.assertEqual(self.revalidar(url, response).status_code, 200)
+
+    def test_etag_depende_da_query_string(self):
+        response = self.client.get(reverse('matricula-list'))
+        response = self.client.get(
+            reverse('matricula-list'), {'turma': self.turma_ativa.id},
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_listagem_por_cursor_nao_usa_validador(self):
+        response = self.client.get(reverse('matricula-list'), {'cursor': ''})
+        self.assertNotIn('ETag', response)
+
+    def test_if_match_evita_sobrescrever(self):
+        url = reverse('treinamento-detail', args=[self.treinamento.id])
+        etag = self.client.get(url)['ETag']
+
+        self.treinamento.descricao = 'Alterado por outro cliente'
+        self.treinamento.save()
+        response = self.client.patch(
+            url, {'nome': 'Novo'}, format='json', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 412)
+
+        etag = self.client.get(url)['ETag']
+        response = self.client.patch(
+            url, {'nome': 'Novo'}, format='json', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(url)['ETag'], response['ETag'])
+
+    def test_if_match_verifica_e_grava_na_mesma_transacao(self):
+        url = reverse('treinamento-detail', args=[self.treinamento.id])
+        etag = self.client.get(url)['ETag']
+        base = len(connection.atomic_blocks)
+        niveis = []
+        validador_real = conditional.calcular_validador
+
+        def calcular_validador(*args):
+            niveis.append(len(connection.atomic_blocks))
+            return validador_real(*args)
+
+        def perform_update(view, serializer):
+            niveis.append(len(connection.atomic_blocks))
+            serializer.save()
+
+        with mock.patch.object(
+            QuerySet, 'select_for_update', autospec=True,
+            side_effect=QuerySet.select_for_update
+        ) as select_for_update, mock.patch.object(
+            conditional, 'calcular_validador', calcular_validador
+        ), mock.patch.object(
+            TreinamentoViewSet, 'perform_update', perform_update,
+            create=True
+        ):
+            response = self.client.patch(
+                url, {'nome': 'Novo'}, format='json', HTTP_IF_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(select_for_update.call_count, 1)
+        # Verificação e escrita na transação aberta para a requisição
+        self.assertEqual(niveis[:2], [base + 1, base + 1])
+
+    def test_if_match_no_delete(self):
+        url = reverse('treinamento-detail', args=[self.treinamento.id])
+        etag = self.client.get(url)['ETag']
+        self.treinamento.descricao = 'Alterado por outro cliente'
+        self.treinamento.save()
+        response = self.client.delete(url, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertTrue(
+            Treinamento.objects.filter(pk=self.treinamento.pk).exists()
+        )
+
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.delete(url, HTTP_IF_MATCH=etag).status_code, 204
+        )
+
+    def test_304_do_cache_de_respostas_sem_query(self):
+        url = reverse('treinamento-list')
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.revalidar(url, response)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_views_do_aluno(self):
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        for nome in ('meus-dados', 'minhas-turmas'):
+            with self.subTest(nome):
+                url = reverse(nome)
+                response = self.client.get(url)
+                self.assertEqual(self.revalidar(url, response).status_code, 304)
+
+        url = reverse('minhas-turmas')
+        response = self.client.get(url)
+        Matricula.objects.get(
+            turma=self.turma_ativa, aluno=self.aluno
+        ).delete()
+        self.assertEqual(self.revalidar(url, response).status_code, 200)
+
+
+class KeysetPaginationTests(ClassroomTestCase):
+    """Paginação por cursor opcional em matrículas, alunos e recursos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.criar_turmas(12, alunos=2, recursos=3)
+        # Nomes repetidos exigem o desempate pelo id
+        Aluno.objects.filter(nome__startswith='Aluno 1').update(nome='Repetido')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def percorrer(self, url, **params):
+        ids, paginas = [], 0
+        response = self.client.get(url, {'cursor': '', **params})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            paginas += 1
+            if not response.data['next']:
+                return ids, paginas, response
+            response = self.client.get(response.data['next'])
+
+    def test_percorre_todas_as_paginas_na_ordem(self):
+        casos = [
+            ('matricula-list', Matricula, ['-data_matricula', '-id']),
+            ('aluno-list', Aluno, ['nome', 'id']),
+            ('recurso-list', Recurso, ['ordem', '-criado_em', 'id']),
+        ]
+        for nome_url, model, ordering in casos:
+            with self.subTest(nome_url):
+                esperado = list(
+                    model.objects.order_by(*ordering)
+                    .values_list('id', flat=True)
+                )
+                self.assertGreater(len(esperado), 20)
+                ids, paginas, _ = self.percorrer(reverse(nome_url))
+                self.assertEqual(ids, esperado)
+                self.assertEqual(paginas, -(-len(esperado) // 20))
+
+    def test_link_previous(self):
+        ids, _, ultima = self.percorrer(reverse('recurso-list'))
+        response = self.client.get(ultima.data['previous'])
+        anteriores = [item['id'] for item in response.data['results']]
+        self.assertEqual(anteriores, ids[-len(ultima.data['results']) - 20:
+                                         -len(ultima.data['results'])])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_cursor_respeita_filtros(self):
+        turma = Turma.objects.get(nome='Turma 3')
+        ids, _, _ = self.percorrer(
+            reverse('recurso-list'), turma=turma.id
+        )
+        self.assertEqual(
+            sorted(ids),
+            sorted(turma.recursos.values_list('id', flat=True))
+        )
+
+    def test_cursor_sem_count_nem_offset(self):
+        primeira = self.client.get(reverse('matricula-list'), {'cursor': ''})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(primeira.data['next'])
+        sql = ' '.join(q['sql'] for q in queries.captured_queries).upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_cursor_invalido(self):
+        response = self.client.get(reverse('aluno-list'), {'cursor': 'xyz'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_paginacao_por_numero_continua_padrao(self):
+        response = self.client.get(reverse('matricula-list'))
+        self.assertEqual(response.data['count'], Matricula.objects.count())
+
+    def test_count_false_pula_contagem(self):
+        url = reverse('matricula-list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'count': 'false'})
+        self.assertIsNone(response.data['count'])
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertIsNotNone(response.data['next'])
+        self.assertNotIn(
+            'COUNT(', ' '.join(q['sql'] for q in queries.captured_queries)
+        )
+
+        response = self.client.get(url, {'count': 'false', 'page': 2})
+        self.assertEqual(
+            len(response.data['results']), Matricula.objects.count() - 20
+        )
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+
+
+class SelecaoCamposTests(ClassroomTestCase):
+    """?fields=/?omit=/?expand= na resposta e no SQL"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def consultas(self, url, params=None, metodo='get'):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, metodo)(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    def test_fields_poda_colunas_e_prefetch(self):
+        response, sqls = self.consultas(
+            reverse('turma-list'), {'fields': 'id,nome'}
+        )
+        for turma in response.data['results']:
+            self.assertEqual(set(turma), {'id', 'nome'})
+        # Validador + turmas: sem recursos, treinamento nem total de alunos
+        self.assertEqual(len(sqls), 2)
+        self.assertNotIn('link_acesso', sqls[1])
+        self.assertNotIn('classroom_treinamento', sqls[1])
+        self.assertNotIn('classroom_matricula', sqls[1])
+
+    def test_omit(self):
+        response, sqls = self.consultas(
+            reverse('turma-detail', args=[self.turma_ativa.id]),
+            {'omit': 'recursos,total_alunos'}
+        )
+        self.assertNotIn('recursos', response.data)
+        self.assertNotIn('total_alunos', response.data)
+        self.assertEqual(response.data['treinamento_nome'], 'Python')
+        self.assertFalse(any('classroom_recurso' in sql for sql in sqls[1:]))
+
+    def test_fields_aninhados(self):
+        response, sqls = self.consultas(
+            reverse('turma-detail', args=[self.turma_ativa.id]),
+            {'fields': 'id,recursos.nome_recurso,recursos.turma_nome'}
+        )
+        self.assertEqual(set(response.data), {'id', 'recursos'})
+        self.assertEqual(response.data['recursos'][0], {
+            'nome_recurso': 'Recurso 0', 'turma_nome': 'Turma Ativa'
+        })
+        # turma_nome vem da turma já carregada, sem JOIN no prefetch
+        self.assertEqual(len(sqls), 3)
+        self.assertNotIn('descricao_recurso', sqls[2])
+        self.assertNotIn('classroom_turma"."', sqls[2].split('WHERE')[0])
+
+    def test_expand(self):
+        url = reverse('turma-detail', args=[self.turma_ativa.id])
+        response = self.client.get(url, {
+            'expand': 'treinamento', 'fields': 'id,treinamento.nome'
+        })
+        self.assertEqual(response.data, {
+            'id': self.turma_ativa.id, 'treinamento': {'nome': 'Python'}
+        })
+
+        self.criar_turmas(5)
+        response, sqls = self.consultas(reverse('matricula-list'), {
+            'expand': 'aluno,turma.treinamento',
+            'omit': 'turma.recursos,turma.total_alunos',
+        })
+        matricula = response.data['results'][0]
+        self.assertEqual(
+            matricula['turma']['treinamento']['nome'], 'Python'
+        )
+        self.assertIn('email', matricula['aluno'])
+        # Validador + matrículas com aluno, turma e treinamento via JOIN
+        self.assertEqual(len(sqls), 2)
+
+        # Turma com total anotado: prefetch (com os recursos dela)
+        response, sqls = self.consultas(
+            reverse('recurso-list'), {'expand': 'turma'}
+        )
+        recurso = response.data['results'][0]
+        self.assertEqual(
+            recurso['turma']['total_alunos'],
+            Matricula.objects.filter(turma=recurso['turma']['id']).count()
+        )
+        self.assertEqual(recurso['turma_nome'], recurso['turma']['nome'])
+        self.assertEqual(len(sqls), 4)
+
+    def test_listas_sem_n_mais_1(self):
+        self.criar_turmas(5)
+        for nome_url in ('aluno-list', 'matricula-list', 'recurso-list'):
+            with self.subTest(nome_url):
+                response, sqls = self.consultas(reverse(nome_url))
+                self.assertGreater(len(response.data['results']), 10)
+                self.assertEqual(len(sqls), 2)
+
+    def test_treinamentos_para_dropdown(self):
+        response, sqls = self.consultas(
+            reverse('treinamento-list'), {'fields': 'id,nome'}
+        )
+        self.assertEqual(
+            response.data['results'],
+            [{'id': self.treinamento.id, 'nome': 'Python'}]
+        )
+        self.assertNotIn('descricao', sqls[-1])
+
+    def test_minhas_turmas(self):
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        response, sqls = self.consultas(
+            reverse('minhas-turmas'), {'omit': 'recursos,treinamento'}
+        )
+        self.assertEqual(
+            set(response.data[0]),
+            {'id', 'nome', 'data_inicio', 'data_conclusao', 'link_acesso',
+             'pode_acessar'}
+        )
+        # validador + aluno + turmas
+        self.assertEqual(len(sqls), 3)
+
+        response = self.client.get(
+            reverse('minhas-turmas'), {'fields': 'id,recursos.nome_recurso'}
+        )
+        turmas = {turma['id']: turma for turma in response.data}
+        self.assertEqual(
+            turmas[self.turma_ativa.id]['recursos'],
+            [{'nome_recurso': 'Recurso 0'}, {'nome_recurso': 'Recurso 1'}]
+        )
+
+    def test_cursor_com_fields(self):
+        self.criar_turmas(12)
+        url = reverse('aluno-list')
+        response = self.client.get(url, {'cursor': '', 'fields': 'id'})
+        self.assertEqual(set(response.data['results'][0]), {'id'})
+        # O cursor usa nome e id, carregados mesmo fora de fields
+        with self.assertNumQueries(1):
+            response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_escrita_ignora_selecao(self):
+        url = reverse('turma-detail', args=[self.turma_ativa.id])
+        response = self.client.patch(
+            f'{url}?fields=id&expand=treinamento', {'nome': 'Renomeada'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['nome'], 'Renomeada')
+        self.assertEqual(response.data['treinamento'], self.treinamento.id)
+
+    def test_etag_por_selecao(self):
+        url = reverse('turma-detail', args=[self.turma_ativa.id])
+        completa = self.client.get(url)
+        parcial = self.client.get(url, {'fields': 'id'})
+        self.assertNotEqual(completa['ETag'], parcial['ETag'])
+
+
+class LeituraRapidaTests(ArquivoTestMixin, ClassroomTestCase):
+    """O caminho rápido (fastpath.py) responde igual aos serializers"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+        self.criar_turmas(20, alunos=1)
+        self.anexar_arquivo(Recurso.objects.first(), b'conteudo')
+        Turma.objects.filter(pk=self.turma_ativa.pk).update(
+            link_acesso='https://example.com/aula'
+        )
+
+    def comparar(self, url, params=None):
+        cache.clear()
+        rapida = self.client.get(url, params)
+        with override_settings(LEITURA_RAPIDA=False):
+            cache.clear()
+            serializer = self.client.get(url, params)
+        self.assertEqual(rapida.status_code, 200)
+        self.assertEqual(rapida.content, serializer.content)
+        return rapida
+
+    def test_paridade_das_listas(self):
+        casos = [
+            ('treinamento-list', {}),
+            ('treinamento-list', {'fields': 'id,nome'}),
+            ('turma-list', {}),
+            ('turma-list', {'page': 2}),
+            ('turma-list', {'omit': 'recursos', 'expand': 'treinamento'}),
+            ('turma-list', {'fields': 'id,recursos.nome_recurso,recursos.arquivo'}),
+            ('turma-list', {'fields': 'id,recursos.turma_nome'}),
+            ('recurso-list', {}),
+            ('recurso-list', {'cursor': '', 'fields': 'id,arquivo'}),
+            ('recurso-list', {'turma': self.turma_ativa.id}),
+            ('aluno-list', {}),
+            ('aluno-list', {'cursor': ''}),
+            ('matricula-list', {}),
+            ('matricula-list', {'expand': 'aluno,turma.treinamento',
+                                'omit': 'turma.recursos,turma.total_alunos'}),
+        ]
+        for nome_url, params in casos:
+            with self.subTest(nome_url, **params):
+                self.comparar(reverse(nome_url), params)
+
+    def test_paridade_do_cursor(self):
+        url = reverse('matricula-list')
+        response = self.comparar(url, {'cursor': ''})
+        while response.data['next']:
+            response = self.comparar(response.data['next'])
+
+    def test_aluno_usa_o_caminho_rapido(self):
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        self.comparar(reverse('turma-list'))
+
+    def test_sem_instanciar_models(self):
+        with mock.patch.object(
+                Turma, 'from_db', side_effect=AssertionError) as from_db:
+            response = self.client.get(reverse('turma-list'))
+        self.assertEqual(response.status_code, 200)
+        from_db.assert_not_called()
+
+    def test_campo_nao_compilavel_usa_serializer(self):
+        # total_alunos dentro da expansão não é anotado na lista de recursos
+        response = self.comparar(reverse('recurso-list'), {'expand': 'turma'})
+        self.assertIn('total_alunos', response.data['results'][0]['turma'])
+
+
+class AdminConsultasTests(ClassroomTestCase):
+    """Changelists e formulários do admin sem consultas por linha"""
+
+    def setUp(self):
+        super().setUp()
+        superuser = User.objects.create_superuser(
+            username='super', password='super123'
+        )
+        self.client.force_login(superuser)
+
+    def consultas(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists(self):
+        urls = {
+            modelo: reverse(f'admin:classroom_{modelo}_changelist')
+            for modelo in ('turma', 'matricula', 'aluno', 'recurso')
+        }
+        antes = {modelo: self.consultas(url) for modelo, url in urls.items()}
+        self.criar_turmas(5, alunos=3, recursos=3)
+        for modelo, url in urls.items():
+            with self.subTest(modelo):
+                # Mesmo número de consultas com mais linhas na página
+                self.assertEqual(self.consultas(url), antes[modelo])
+                self.assertLessEqual(antes[modelo], 12)
+
+    def test_ordenacao_pelas_colunas_calculadas(self):
+        self.criar_turmas(2, alunos=3)
+        # total_matriculas (4ª coluna) e treinamento (3ª)
+        url = reverse('admin:classroom_turma_changelist')
+        response = self.client.get(url, {'o': '-5'})
+        turmas = list(response.context['cl'].result_list)
+        self.assertEqual(turmas[0].total_matriculas_ativas, 3)
+        self.assertEqual(
+            [turma.total_matriculas_ativas for turma in turmas],
+            [turma.matriculas.filter(ativo=True).count() for turma in turmas]
+        )
+        url = reverse('admin:classroom_matricula_changelist')
+        self.assertEqual(self.client.get(url, {'o': '3'}).status_code, 200)
+
+    def test_formulario_de_turma_com_recursos(self):
+        url = reverse('admin:classroom_turma_change', args=[self.turma_ativa.pk])
+        # A primeira requisição também carrega os content types (cache)
+        self.client.get(url)
+        total = self.consultas(url)
+        Recurso.objects.bulk_create(
+            Recurso(turma=self.turma_ativa, tipo_recurso='pdf',
+                    nome_recurso=f'Extra {i}', ordem=10 + i)
+            for i in range(20)
+        )
+        self.assertEqual(self.consultas(url), total)
+
+    def test_inline_salva_sem_perder_colunas(self):
+        turma = self.turma_ativa
+        recursos = list(turma.recursos.order_by('ordem'))
+        dados = {
+            'treinamento': turma.treinamento_id, 'nome': turma.nome,
+            'data_inicio': turma.data_inicio,
+            'data_conclusao': turma.data_conclusao, 'link_acesso': '',
+            'recursos-TOTAL_FORMS': len(recursos),
+            'recursos-INITIAL_FORMS': len(recursos),
+            'recursos-MIN_NUM_FORMS': 0, 'recursos-MAX_NUM_FORMS': 1000,
+        }
+        for i, recurso in enumerate(recursos):
+            dados.update({
+                f'recursos-{i}-id': recurso.pk,
+                f'recursos-{i}-turma': turma.pk,
+                f'recursos-{i}-nome_recurso': recurso.nome_recurso,
+                f'recursos-{i}-tipo_recurso': recurso.tipo_recurso,
+                f'recursos-{i}-ordem': recurso.ordem + 10,
+            })
+            if recurso.acesso_previo:
+                dados[f'recursos-{i}-acesso_previo'] = 'on'
+            if recurso.draft:
+                dados[f'recursos-{i}-draft'] = 'on'
+        response = self.client.post(
+            reverse('admin:classroom_turma_change', args=[turma.pk]), dados
+        )
+        self.assertEqual(response.status_code, 302)
+        for recurso in recursos:
+            atualizado = Recurso.objects.get(pk=recurso.pk)
+            self.assertEqual(atualizado.ordem, recurso.ordem + 10)
+            self.assertEqual(atualizado.descricao_recurso, 'Descrição')
+            # auto_now também vale com o queryset parcial (ETag/validadores)
+            self.assertGreater(atualizado.atualizado_em, recurso.atualizado_em)
+
+    def test_formularios_com_autocomplete(self):
+        self.criar_turmas(5, alunos=3)
+        for modelo in ('matricula', 'recurso', 'aluno'):
+            with self.subTest(modelo):
+                response = self.client.get(
+                    reverse(f'admin:classroom_{modelo}_add')
+                )
+                self.assertContains(response, 'admin-autocomplete')
+                # Nenhuma <option> com alunos/turmas no HTML
+                self.assertNotContains(response, 'Turma 4')
+                self.assertNotContains(response, 'Aluno 4 2')
+
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'classroom', 'model_name': 'matricula',
+            'field_name': 'turma', 'term': 'Turma 4',
+        })
+        self.assertEqual(
+            [item['text'] for item in response.json()['results']],
+            ['Turma 4 - Python']
+        )
+
+
+class ExportacaoTests(ClassroomTestCase):
+    """Exportação CSV/NDJSON em streaming com os filtros das listagens"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def exportar(self, nome_url, params=None):
+        response = self.client.get(reverse(nome_url), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode(), response
+
+    def ndjson(self, nome_url, params=None):
+        conteudo, _ = self.exportar(
+            nome_url, {'formato': 'ndjson', **(params or {})}
+        )
+        return [json.loads(linha) for linha in conteudo.splitlines()]
+
+    def test_ndjson_igual_a_listagem(self):
+        self.criar_turmas(3)
+        for nome in ('matricula', 'aluno', 'recurso'):
+            with self.subTest(nome):
+                # Tudo cabe na primeira página
+                listagem = self.client.get(reverse(f'{nome}-list')).json()
+                linhas = self.ndjson(f'{nome}-exportar')
+                self.assertEqual(linhas[:len(listagem['results'])],
+                                 listagem['results'])
+                self.assertEqual(len(linhas), listagem['count'])
+
+    def test_csv(self):
+        conteudo, response = self.exportar(
+            'matricula-exportar', {'expand': 'turma', 'omit': 'turma.recursos'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('matriculas.csv', response['Content-Disposition'])
+        linhas = list(csv.DictReader(io.StringIO(conteudo)))
+        self.assertEqual(len(linhas), Matricula.objects.count())
+        self.assertIn('turma.treinamento_nome', linhas[0])
+        self.assertEqual(linhas[0]['ativo'], 'true')
+        self.assertEqual(
+            {linha['turma.nome'] for linha in linhas},
+            {'Turma Ativa', 'Turma Futura'}
+        )
+
+    def test_csv_neutraliza_formulas(self):
+        nomes = ['=HYPERLINK("http://x")', '+1', '-1', '@SUM(A1)', '\tX', 'Ana']
+        for i, nome in enumerate(nomes):
+            Aluno.objects.create(
+                user=User.objects.create_user(username=f'formula{i}'),
+                nome=nome, email=f'formula{i}@example.com'
+            )
+        conteudo, _ = self.exportar('aluno-exportar', {'fields': 'nome'})
+        exportados = {
+            linha['nome'] for linha in csv.DictReader(io.StringIO(conteudo))
+        }
+        self.assertLessEqual(
+            {"'" + nome for nome in nomes[:-1]} | {'Ana'}, exportados
+        )
+        self.assertFalse(exportados & set(nomes[:-1]))
+        # NDJSON mantém os valores
+        exportados = {
+            linha['nome'] for linha in
+            self.ndjson('aluno-exportar', {'fields': 'nome'})
+        }
+        self.assertLessEqual(set(nomes), exportados)
+
+    def test_filtros_da_listagem(self):
+        linhas = self.ndjson('matricula-exportar', {'turma': self.turma_ativa.id})
+        self.assertEqual([linha['turma'] for linha in linhas], [self.turma_ativa.id])
+        linhas = self.ndjson('recurso-exportar', {
+            'turma': self.turma_futura.id, 'draft': 'false',
+            'fields': 'id,nome_recurso',
+        })
+        self.assertEqual(
+            [linha['nome_recurso'] for linha in linhas],
+            ['Recurso 0', 'Recurso 1']
+        )
+        self.assertEqual(set(linhas[0]), {'id', 'nome_recurso'})
+
+    @override_settings(EXPORTACAO_LOTE=3)
+    def test_lotes(self):
+        self.criar_turmas(4, alunos=2)
+        conteudo, response = self.exportar('aluno-exportar', {'formato': 'ndjson'})
+        self.assertEqual(len(conteudo.splitlines()), Aluno.objects.count())
+
+        # Cabeçalho antes da consulta; depois uma parte por lote
+        response = self.client.get(reverse('aluno-exportar'))
+        with CaptureQueriesContext(connection) as queries:
+            partes = iter(response.streaming_content)
+            self.assertTrue(next(partes).startswith(b'id,'))
+            self.assertEqual(len(queries), 0)
+            restantes = list(partes)
+        self.assertEqual(len(restantes), math.ceil(Aluno.objects.count() / 3))
+
+    def test_sem_leitura_rapida(self):
+        with override_settings(LEITURA_RAPIDA=False):
+            sem = self.ndjson('matricula-exportar')
+        self.assertEqual(sem, self.ndjson('matricula-exportar'))
+
+    def test_formato_invalido_e_permissoes(self):
+        response = self.client.get(
+            reverse('aluno-exportar'), {'formato': 'xml'},
+            HTTP_ACCEPT='text/csv'
+        )
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        for nome in ('matricula', 'aluno', 'recurso'):
+            with self.subTest(nome):
+                response = self.client.get(reverse(f'{nome}-exportar'))
+                self.assertEqual(response.status_code, 403)
+
+
+class BuscaTests(ClassroomTestCase):
+    """Busca textual (FTS5) com as regras de visibilidade dos alunos"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def buscar(self, q, **params):
+        response = self.client.get(reverse('busca'), {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['resultados']
+
+    def encontrados(self, q, **params):
+        return {(item['tipo'], item['id']) for item in self.buscar(q, **params)}
+
+    def triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                "AND name LIKE '%\\_busca\\_%' ESCAPE '\\'"
+            )
+            return {nome for nome, in cursor.fetchall()}
+
+    def test_triggers_existem_apos_as_migracoes(self):
+        # Migrações que recriam a tabela no SQLite descartam os triggers
+        self.assertEqual(self.triggers(), {
+            f'classroom_{tabela}_busca_{sufixo}'
+            for tabela in ('treinamento', 'turma', 'recurso')
+            for sufixo in ('ai', 'au', 'ad')
+        })
+
+    def test_post_migrate_recria_triggers_ausentes(self):
+        todos = self.triggers()
+        recurso = self.turma_ativa.recursos.first()
+        with connection.cursor() as cursor:
+            for nome in todos:
+                if nome.startswith('classroom_recurso_'):
+                    cursor.execute(f'DROP TRIGGER {nome}')
+        Recurso.objects.filter(pk=recurso.pk).update(nome_recurso='Xilogravura')
+        self.assertEqual(self.encontrados('xilogravura'), set())
+
+        with self.assertLogs('classroom.migrations_util', 'WARNING'):
+            call_command('migrate', verbosity=0)
+        self.assertEqual(self.triggers(), todos)
+        self.assertEqual(
+            self.encontrados('xilogravura'), {('recurso', recurso.id)}
+        )
+        # Com todos os triggers presentes não há o que recriar
+        with self.assertNoLogs('classroom.migrations_util'):
+            call_command('migrate', verbosity=0)
+
+    def test_ignora_acentos_e_maiusculas(self):
+        treinamento = Treinamento.objects.create(
+            nome='Programação Orientada a Objetos', descricao='Conceitos'
+        )
+        for q in ('programacao', 'PROGRAMAÇÃO', 'progr orient', 'objeto'):
+            with self.subTest(q):
+                self.assertIn(('treinamento', treinamento.id),
+                              self.encontrados(q))
+        self.assertEqual(self.encontrados('programacao funcional'), set())
+
+    def test_nome_pesa_mais_que_descricao(self):
+        so_descricao = Treinamento.objects.create(
+            nome='Web', descricao='Aplicações com Flask e Flask-Login'
+        )
+        no_nome = Treinamento.objects.create(
+            nome='Flask', descricao='Microframework'
+        )
+        resultados = self.buscar('flask')
+        self.assertEqual(
+            [item['id'] for item in resultados], [no_nome.id, so_descricao.id]
+        )
+        self.assertEqual(resultados[0], {
+            'tipo': 'treinamento', 'id': no_nome.id, 'nome': 'Flask',
+            'descricao': 'Microframework'
+        })
+
+    def test_indice_acompanha_alteracoes(self):
+        turma = Turma.objects.create(
+            treinamento=self.treinamento, nome='Turma Noturna',
+            data_inicio=date.today(), data_conclusao=date.today()
+        )
+        self.assertEqual(self.buscar('noturna'), [{
+            'tipo': 'turma', 'id': turma.id, 'nome': 'Turma Noturna',
+            'descricao': None, 'treinamento': self.treinamento.id
+        }])
+
+        turma.nome = 'Turma Matutina'
+        turma.save()
+        self.assertEqual(self.encontrados('noturna'), set())
+        self.assertEqual(self.encontrados('matutina'), {('turma', turma.id)})
+
+        # update() e bulk_create não disparam signals; os triggers sim
+        Recurso.objects.filter(turma=self.turma_ativa, ordem=0).update(
+            descricao_recurso='Slides de revisão'
+        )
+        recurso = Recurso.objects.get(turma=self.turma_ativa, ordem=0)
+        self.assertEqual(self.encontrados('revisao'), {('recurso', recurso.id)})
+        novos = Recurso.objects.bulk_create([Recurso(
+            turma=turma, tipo_recurso='pdf', nome_recurso='Gabarito'
+        )])
+        self.assertEqual(self.encontrados('gabarito'),
+                         {('recurso', novos[0].id)})
+
+        turma.delete()
+        self.assertEqual(self.encontrados('matutina gabarito'), set())
+        self.assertEqual(self.encontrados('matutina'), set())
+
+    def test_aluno_respeita_matriculas_e_visibilidade(self):
+        outra = self.criar_turmas(1, alunos=0, recursos=1)[0]
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+
+        self.assertEqual(
+            {id_ for tipo, id_ in self.encontrados('recurso', tipo='recurso')},
+            set(recursos_visiveis(self.aluno).values_list('id', flat=True))
+        )
+        self.assertEqual(self.encontrados('turma'), {
+            ('turma', self.turma_ativa.id), ('turma', self.turma_futura.id)
+        })
+        self.assertEqual(self.encontrados('python'),
+                         {('treinamento', self.treinamento.id)})
+
+        # Admin vê rascunhos e turmas sem matrícula
+        self.client.force_authenticate(self.admin)
+        self.assertIn(('turma', outra.id), self.encontrados('turma'))
+        self.assertEqual(len(self.encontrados('recurso', tipo='recurso')),
+                         Recurso.objects.count())
+
+    def test_usuario_sem_aluno_ve_so_treinamentos(self):
+        user = User.objects.create_user(username='sem_perfil')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.encontrados('python turma recurso'), set())
+        self.assertEqual(self.encontrados('python'),
+                         {('treinamento', self.treinamento.id)})
+
+    def test_uma_query(self):
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        # aluno do usuário + busca com as restrições em subqueries
+        with self.assertNumQueries(2):
+            self.buscar('recurso')
+
+    def test_parametros(self):
+        self.assertEqual(self.encontrados('turma', tipo='treinamento'), set())
+        self.assertEqual(len(self.buscar('recurso', limite=2)), 2)
+        for params in ({'q': ''}, {'q': '%*'}, {'q': 'x', 'tipo': 'aluno'},
+                       {'q': 'x', 'limite': '0'}, {'q': 'x', 'limite': 'a'}):
+            with self.subTest(params):
+                response = self.client.get(reverse('busca'), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.data)
+        # Aspas e operadores do FTS5 são tratados como texto
+        self.assertEqual(
+            self.encontrados('"turma": (ativa*'),
+            {('turma', self.turma_ativa.id)}
+        )
+
+
+class RenderersTests(ClassroomTestCase):
+    """orjson com a mesma saída do JSON do DRF; MessagePack opcional"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def assertMesmoJson(self, data, media_type='application/json'):
+        self.assertEqual(
+            renderers.OrjsonRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type)
+        )
+
+    def test_mesmos_bytes_do_json_do_drf(self):
+        self.assertMesmoJson({
+            'data': date(2025, 1, 31),
+            'utc': datetime(2025, 1, 31, 12, 30, tzinfo=dt_timezone.utc),
+            'micro': datetime(2025, 1, 31, 12, 30, 0, 123456),
+            'fuso': datetime(
+                2025, 1, 31, 12, 30, tzinfo=dt_timezone(timedelta(hours=-3))
+            ),
+            'hora': time_(8, 15),
+            'duracao': timedelta(minutes=90),
+            'decimal': Decimal('10.50'),
+            'uuid': uuid.UUID(int=1),
+            'lazy': gettext_lazy('Nome'),
+            'texto': 'ação \u2028 \u2029 "aspas" \\ \x00 \U0001F600',
+            'lista': (1, 2.5, True, None, [], {}),
+            'grande': 2 ** 70,
+            'chaves': {1: 'um', 2: 'dois'},
+        })
+        self.assertMesmoJson([1, 2], 'application/json; indent=4')
+        self.assertEqual(renderers.OrjsonRenderer().render(None), b'')
+
+    def test_respostas_da_api(self):
+        for url in (reverse('turma-list'), reverse('matricula-list'),
+                    reverse('turma-detail', args=[self.turma_ativa.id])):
+            with self.subTest(url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    response.content, JSONRenderer().render(response.data)
+                )
+
+    def test_parser(self):
+        corpos = [
+            b'{"nome": "Turma", "ids": [1, 2.5, -3e2], "ok": true}',
+            '{"texto": "ação \\u00e7"}'.encode(),
+            b'{"grande": 123456789012345678901234567890}',
+            b'[1e400]',
+        ]
+        for corpo in corpos:
+            with self.subTest(corpo):
+                self.assertEqual(
+                    renderers.OrjsonParser().parse(io.BytesIO(corpo)),
+                    JSONParser().parse(io.BytesIO(corpo))
+                )
+        for corpo in (b'{"a": ', b'', b'[NaN]'):
+            with self.subTest(corpo):
+                with self.assertRaises(ParseError) as esperado:
+                    JSONParser().parse(io.BytesIO(corpo))
+                with self.assertRaisesMessage(
+                        ParseError, str(esperado.exception)):
+                    renderers.OrjsonParser().parse(io.BytesIO(corpo))
+
+    def test_escrita_json(self):
+        response = self.client.patch(
+            reverse('turma-detail', args=[self.turma_ativa.id]),
+            {'nome': 'Renomeada'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['nome'], 'Renomeada')
+        response = self.client.post(
+            reverse('treinamento-list'), b'{"nome": ', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @unittest.skipUnless(renderers.msgpack_disponivel(), 'msgpack não instalado')
+    def test_msgpack(self):
+        import msgpack
+        url = reverse('turma-detail', args=[self.turma_ativa.id])
+        em_json = self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), em_json.json())
+        self.assertNotEqual(response['ETag'], em_json['ETag'])
+
+        response = self.client.patch(
+            url, msgpack.packb({'nome': 'Renomeada'}),
+            content_type='application/msgpack'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['nome'], 'Renomeada')
+
+    @unittest.skipIf(renderers.msgpack_disponivel(), 'msgpack instalado')
+    def test_sem_msgpack(self):
+        response = self.client.get(
+            reverse('turma-list'), HTTP_ACCEPT='application/msgpack'
+        )
+        self.assertEqual(response.status_code, 406)
+        # JSON continua o padrão
+        response = self.client.get(reverse('turma-list'), HTTP_ACCEPT='*/*')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+
+class AsyncViewsTests(ClassroomTestCase):
+    """As views assíncronas respondem igual às síncronas equivalentes"""
+
+    def autenticar(self, user):
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def assertMesmaResposta(self, sync_url, async_url, **params):
+        esperado = self.client.get(sync_url, params)
+        response = self.client.get(async_url, params)
+        self.assertEqual(response.status_code, esperado.status_code)
+        # Links de paginação apontam para a própria view
+        self.assertEqual(
+            response.content.decode().replace('/api/async/', '/api/'),
+            esperado.content.decode()
+        )
+        return response
+
+    def test_endpoints_do_aluno(self):
+        self.autenticar(self.user)
+        outra = self.criar_turmas(1)[0]
+        casos = [
+            ('meus-dados', [], {}),
+            ('meus-dados', [], {'fields': 'nome,username'}),
+            ('minhas-turmas', [], {}),
+            ('minhas-turmas', [], {'fields': 'id,recursos.nome_recurso'}),
+            ('turma-list', [], {}),
+            ('turma-detail', [self.turma_ativa.id], {}),
+            # Turma sem matrícula: 404 nas duas
+            ('turma-detail', [outra.id], {}),
+            # Recursos são só para admin: 403 nas duas
+            ('recurso-list', [], {}),
+        ]
+        for nome, args, params in casos:
+            with self.subTest(nome, args=args):
+                self.assertMesmaResposta(
+                    reverse(nome, args=args),
+                    reverse(f'async-{nome}', args=args), **params
+                )
+
+    def test_endpoints_do_admin(self):
+        self.autenticar(self.admin)
+        self.criar_turmas(25, alunos=1, recursos=1)
+        recurso = Recurso.objects.first()
+        casos = [
+            ('turma-list', [], {'page': 2}),
+            ('turma-list', [], {'treinamento_nome': 'pyt'}),
+            ('turma-list', [], {'data_inicio_after': 'invalida'}),
+            ('turma-list', [], {'page': 99}),
+            ('recurso-list', [], {'turma': self.turma_ativa.id}),
+            ('recurso-list', [], {'page': 2}),
+            ('recurso-detail', [recurso.id], {}),
+            ('recurso-detail', [0], {}),
+            ('turma-list', [], {'fields': 'id,treinamento_nome'}),
+            ('turma-detail', [self.turma_ativa.id],
+             {'expand': 'treinamento', 'omit': 'recursos'}),
+            ('recurso-list', [], {'expand': 'turma', 'omit': 'turma.recursos'}),
+        ]
+        for nome, args, params in casos:
+            with self.subTest(nome, params=params):
+                self.assertMesmaResposta(
+                    reverse(nome, args=args),
+                    reverse(f'async-{nome}', args=args), **params
+                )
+
+    def test_sem_perfil_de_aluno(self):
+        self.autenticar(self.admin)
+        for nome in ('meus-dados', 'minhas-turmas'):
+            with self.subTest(nome):
+                self.assertMesmaResposta(
+                    reverse(nome), reverse(f'async-{nome}')
+                )
+
+    def test_autenticacao(self):
+        url = reverse('async-minhas-turmas')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer invalido')
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        self.autenticar(self.user)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+class AutenticacaoClaimsTests(ClassroomTestCase):
+    """Tokens com is_staff/aluno_id e autenticação sem consultas"""
+
+    def obter_tokens(self, username, password):
+        response = self.client.post(reverse('token_obtain_pair'), {
+            'username': username, 'password': password
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def autenticar(self, user):
+        token = ClassroomTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_claims_do_token(self):
+        tokens = self.obter_tokens('joao', 'senha123')
+        access = AccessToken(tokens['access'])
+        self.assertIs(access['is_staff'], False)
+        self.assertEqual(access['aluno_id'], self.aluno.id)
+
+        # O access gerado pelo refresh herda as claims
+        response = self.client.post(
+            reverse('token_refresh'), {'refresh': tokens['refresh']},
+            format='json'
+        )
+        access = AccessToken(response.data['access'])
+        self.assertEqual(access['aluno_id'], self.aluno.id)
+
+        access = AccessToken(self.obter_tokens('admin', 'admin123')['access'])
+        self.assertIs(access['is_staff'], True)
+        self.assertIsNone(access['aluno_id'])
+
+    def test_refresh_rele_usuario(self):
+        tokens = self.obter_tokens('admin', 'admin123')
+        self.admin.is_staff = False
+        self.admin.save()
+
+        response = self.client.post(
+            reverse('token_refresh'), {'refresh': tokens['refresh']},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIs(AccessToken(response.data['access'])['is_staff'], False)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access']}"
+        )
+        self.assertEqual(
+            self.client.get(reverse('recurso-list')).status_code, 403
+        )
+
+        self.admin.is_active = False
+        self.admin.save()
+        response = self.client.post(
+            reverse('token_refresh'), {'refresh': tokens['refresh']},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_sem_consulta_de_usuario_nem_aluno(self):
+        self.autenticar(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('minhas-turmas'))
+        self.assertEqual(response.status_code, 200)
+        # validador + turmas + recursos visíveis
+        self.assertEqual(len(queries), 3)
+        for query in queries:
+            self.assertNotIn('FROM "auth_user"', query['sql'])
+
+    def test_views_funcionam_com_usuario_das_claims(self):
+        self.autenticar(self.user)
+        response = self.client.get(reverse('meus-dados'))
+        self.assertEqual(response.data['username'], 'joao')
+        self.assertEqual(response.data['nome'], 'João')
+        self.assertEqual(
+            self.client.get(reverse('async-meus-dados')).json(),
+            response.json()
+        )
+        self.assertEqual(
+            self.client.get(reverse('recurso-list')).status_code, 403
+        )
+
+        self.autenticar(self.admin)
+        response = self.client.get(reverse('meus-dados'))
+        self.assertEqual(response.status_code, 404)
+        # Usuário das claims atribuído a uma FK
+        response = self.client.post(reverse('upload-list'), {
+            'recurso': self.turma_ativa.recursos.first().id,
+            'nome_arquivo': 'aula.mp4', 'tamanho': 10,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(
+            UploadRecurso.objects.filter(usuario=self.admin).exists()
+        )
+
+    def test_token_sem_claims_valida_no_banco(self):
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(self.client.get(reverse('meus-dados')).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('meus-dados')).status_code, 401)
+
+    def test_modo_estrito_revalida_no_banco(self):
+        self.autenticar(self.admin)
+        self.admin.is_staff = False
+        self.admin.save()
+        url = reverse('recurso-list')
+        # Claims valem até o token expirar
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        with override_settings(JWT_VALIDACAO_ESTRITA=True):
+            self.assertEqual(self.client.get(url).status_code, 403)
+            self.admin.is_active = False
+            self.admin.save()
+            self.assertEqual(self.client.get(url).status_code, 401)
+            response = self.client.get(reverse('async-turma-list'))
+            self.assertEqual(response.status_code, 401)
+
+
+class MetricasTests(ClassroomTestCase):
+    """Server-Timing por requisição e agregados em /api/_metrics"""
+
+    def setUp(self):
+        super().setUp()
+        metrics.limpar()
+
+    def server_timing(self, response):
+        return dict(
+            re.match(r'(\w+);(.*)', parte.strip()).groups()
+            for parte in response['Server-Timing'].split(',')
+        )
+
+    def test_server_timing_desativado_por_padrao(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('minhas-turmas'))
+        self.assertNotIn('Server-Timing', response)
+        # As métricas são coletadas mesmo assim
+        self.assertIn('rota="minhas-turmas"', metrics.formato_prometheus())
+
+    @override_settings(METRICAS_SERVER_TIMING=True)
+    def test_server_timing(self):
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('minhas-turmas'))
+        timing = self.server_timing(response)
+        self.assertIn(f'desc="{len(queries)} queries"', timing['db'])
+        self.assertEqual(
+            timing['size'], f'desc="{len(response.content)} bytes"'
+        )
+        for nome in ('ser', 'view', 'total'):
+            self.assertRegex(timing[nome], r'^dur=\d+\.\d{2}$')
+        self.assertGreater(float(timing['ser'][4:]), 0)
+
+        with override_settings(METRICAS_SERVER_TIMING=False):
+            response = self.client.get(reverse('minhas-turmas'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_agregados_por_rota(self):
+        self.client.force_authenticate(user=self.user)
+        for _ in range(3):
+            self.client.get(reverse('minhas-turmas'))
+        self.client.get(reverse('turma-detail', args=[self.turma_ativa.id]))
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('metricas'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        texto = response.content.decode()
+        self.assertIn(
+            'classroom_request_duration_seconds_count'
+            '{rota="minhas-turmas",metodo="GET"} 3', texto
+        )
+        self.assertIn(
+            'classroom_request_duration_seconds_bucket'
+            '{rota="turma-detail",metodo="GET",le="+Inf"} 1', texto
+        )
+        consultas = re.search(
+            r'classroom_request_db_queries_total'
+            r'\{rota="minhas-turmas",metodo="GET"\} (\d+)', texto
+        )
+        self.assertEqual(int(consultas.group(1)) % 3, 0)
+        self.assertIn('# TYPE classroom_response_cache_total counter', texto)
+
+    def test_metodo_desconhecido_agrupado(self):
+        self.client.force_authenticate(user=self.user)
+        for metodo in ('FOO', 'BAR'):
+            self.client.generic(metodo, reverse('minhas-turmas'))
+
+        self.client.force_authenticate(user=self.admin)
+        texto = self.client.get(reverse('metricas')).content.decode()
+        self.assertIn(
+            'classroom_request_duration_seconds_count'
+            '{rota="minhas-turmas",metodo="OTHER"} 2', texto
+        )
+        self.assertNotIn('metodo="FOO"', texto)
+
+    def test_somente_admin(self):
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(reverse('metricas')).status_code, 403)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(reverse('metricas')).status_code, 401)
+
+    @override_settings(METRICAS_SERVER_TIMING=True)
+    async def test_middleware_assincrono(self):
+        token = ClassroomTokenObtainPairSerializer.get_token(
+            self.user
+        ).access_token
+        response = await AsyncClient().get(
+            reverse('async-minhas-turmas'),
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        timing = self.server_timing(response)
+        self.assertNotEqual(timing['view'], 'dur=0.00')
+        self.assertNotIn('desc="0 queries"', timing['db'])
+        self.assertIn(
+            'rota="async-minhas-turmas"', metrics.formato_prometheus()
+        )
+
+
+class MatriculaEmLoteTests(ClassroomTestCase):
+    """Matrícula em lote com validação por conjunto"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.alunos = [
+            Aluno.objects.create(
+                user=User.objects.create_user(username=f'lote{i}'),
+                nome=f'Lote {i}', email=f'lote{i}@example.com'
+            )
+            for i in range(30)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('matricula-em-lote')
+
+    def test_lote_json_com_duplicadas_e_erros(self):
+        linhas = [
+            {'turma': self.turma_ativa.id, 'aluno': aluno.id}
+            for aluno in self.alunos
+        ]
+        linhas += [
+            # Já matriculado
+            {'turma': self.turma_ativa.id, 'aluno': self.aluno.id},
+            # Repetida no próprio lote
+            {'turma': self.turma_ativa.id, 'aluno': self.alunos[0].id},
+            {'turma': 999999, 'aluno': self.alunos[0].id},
+            {'turma': self.turma_ativa.id, 'aluno': 'abc'},
+        ]
+        response = self.client.post(self.url, linhas, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['criadas'], 30)
+        self.assertEqual(response.data['duplicadas'], 2)
+        self.assertEqual(response.data['erros'], 2)
+        resultados = response.data['resultados']
+        self.assertEqual(resultados[0]['status'], 'criada')
+        self.assertTrue(
+            Matricula.objects.filter(pk=resultados[0]['id']).exists()
+        )
+        self.assertEqual(resultados[32]['erro'], 'Turma não encontrada.')
+        self.assertEqual(
+            Matricula.objects.filter(turma=self.turma_ativa).count(), 31
+        )
+
+    def test_lote_numero_fixo_de_queries(self):
+        linhas = [
+            {'turma': turma.id, 'aluno': aluno.id}
+            for turma in (self.turma_ativa, self.turma_futura)
+            for aluno in self.alunos
+        ]
+        # turmas + alunos + matrículas existentes + savepoint/INSERT/release
+        with self.assertNumQueries(6):
+            response = self.client.post(self.url, linhas, format='json')
+        self.assertEqual(response.data['criadas'], 60)
+
+    def test_lote_csv(self):
+        conteudo = 'turma,aluno,ativo\n' + '\n'.join(
+            f'{self.turma_futura.id},{aluno.id},sim' for aluno in self.alunos[:5]
+        ) + f'\n{self.turma_futura.id},{self.alunos[5].id},não\n'
+        response = self.client.generic(
+            'POST', self.url, conteudo.encode(), content_type='text/csv'
+        )
+        self.assertEqual(response.data['criadas'], 6)
+        self.assertFalse(
+            Matricula.objects.get(
+                turma=self.turma_futura, aluno=self.alunos[5]
+            ).ativo
+        )
+
+    def test_lote_csv_multipart(self):
+        arquivo = SimpleUploadedFile(
+            'matriculas.csv',
+            f'turma,aluno\n{self.turma_futura.id},{self.alunos[0].id}\n'.encode()
+        )
+        response = self.client.post(
+            self.url, {'arquivo': arquivo}, format='multipart'
+        )
+        self.assertEqual(response.data['criadas'], 1)
+
+    def test_lote_apenas_admin(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(self.url, [], format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_csv_fora_de_utf8(self):
+        response = self.client.post(
+            self.url, 'turma,aluno\n1,Jo\xe3o\n'.encode('latin-1'),
+            content_type='text/csv'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'O CSV deve estar em UTF-8.')
+
+    def test_matricula_criada_por_outra_requisicao(self):
+        linhas = [
+            {'turma': self.turma_ativa.id, 'aluno': aluno.id}
+            for aluno in self.alunos[:3]
+        ]
+        pares_matriculados = bulk.pares_matriculados
+
+        def concorrente(pares):
+            # Outra requisição matricula o primeiro aluno após a validação
+            if not Matricula.objects.filter(aluno=self.alunos[0]).exists():
+                Matricula.objects.create(
+                    turma=self.turma_ativa, aluno=self.alunos[0]
+                )
+                return set()
+            return pares_matriculados(pares)
+
+        with mock.patch('classroom.bulk.pares_matriculados', concorrente):
+            response = self.client.post(self.url, linhas, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [r['status'] for r in response.data['resultados']],
+            ['duplicada', 'criada', 'criada']
+        )
+        self.assertEqual(
+            Matricula.objects.filter(aluno__in=self.alunos[:3]).count(), 3
+        )
+
+
+class ImportacaoAlunosTests(ClassroomTestCase):
+    """Importação em massa de alunos (API e comando)"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('aluno-importar')
+
+    def linhas(self, quantidade, prefixo='novo'):
+        return [
+            {
+                'username': f'{prefixo}{i}', 'password': 'senha12345',
+                'nome': f'Aluno {prefixo} {i}',
+                'email': f'{prefixo}{i}@example.com', 'telefone': '1199999',
+            }
+            for i in range(quantidade)
+        ]
+
+    def test_importa_e_reporta_erros_por_linha(self):
+        linhas = self.linhas(3) + [
+            {**self.linhas(1, 'x')[0], 'username': 'joao'},
+            {**self.linhas(1, 'y')[0], 'email': 'joao@example.com'},
+            self.linhas(1)[0],
+            {**self.linhas(1, 'z')[0], 'password': 'curta'},
+            {**self.linhas(1, 'w')[0], 'email': 'invalido'},
+        ]
+        response = self.client.post(self.url, linhas, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['criados'], 3)
+        self.assertEqual(response.data['erros'], 5)
+        erros = [r['erro'] for r in response.data['resultados'][3:]]
+        self.assertEqual(erros, [
+            'Username já existe.', 'Email já cadastrado.',
+            'Username já existe.',
+            'A senha deve ter pelo menos 8 caracteres.', 'Email inválido.',
+        ])
+
+        aluno = Aluno.objects.select_related('user').get(
+            pk=response.data['resultados'][0]['id']
+        )
+        self.assertEqual(aluno.user.username, 'novo0')
+        self.assertEqual(aluno.user.email, 'novo0@example.com')
+        self.assertTrue(aluno.user.check_password('senha12345'))
+        self.assertFalse(aluno.user.is_staff)
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.MD5PasswordHasher'
+    ])
+    def test_inserts_em_lote(self):
+        # usernames + emails + (savepoint, users, alunos, release) por lote
+        with self.assertNumQueries(6):
+            self.client.post(self.url, self.linhas(5), format='json')
+        # O SQLite limita parâmetros por INSERT, mas segue longe de 1 por linha
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, self.linhas(400, 'b'), format='json')
+        self.assertLess(len(queries), 20)
+        self.assertEqual(
+            Aluno.objects.filter(nome__startswith='Aluno b').count(), 400
+        )
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.MD5PasswordHasher'
+    ])
+    def test_hash_em_pool_de_processos(self):
+        with mock.patch.object(bulk, 'MIN_LINHAS_POOL', 0):
+            resultados = bulk.importar_alunos(
+                self.linhas(6), workers=2, batch_size=4
+            )
+        self.assertEqual(len(resultados), 6)
+        user = User.objects.get(username='novo5')
+        self.assertTrue(user.check_password('senha12345'))
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.MD5PasswordHasher'
+    ])
+    def test_api_sem_pool_de_processos(self):
+        with mock.patch.object(bulk, 'MIN_LINHAS_POOL', 0), \
+                mock.patch.object(bulk, 'ProcessPoolExecutor') as pool:
+            response = self.client.post(self.url, self.linhas(6), format='json')
+        self.assertEqual(response.data['criados'], 6)
+        pool.assert_not_called()
+
+    def test_progresso_por_lote(self):
+        chamadas = []
+        bulk.importar_alunos(
+            self.linhas(5), workers=1, batch_size=2,
+            progresso=lambda feitos, total: chamadas.append((feitos, total))
+        )
+        self.assertEqual(chamadas, [(2, 5), (4, 5), (5, 5)])
+
+    def test_comando_importar_alunos(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as arquivo:
+            arquivo.write('username,password,nome,email\n')
+            arquivo.write('cmd1,senha12345,Cmd Um,cmd1@example.com\n')
+            arquivo.write('joao,senha12345,Repetido,outro@example.com\n')
+            arquivo.flush()
+            saida = io.StringIO()
+            call_command('importar_alunos', arquivo.name, stdout=saida)
+        self.assertIn('1 alunos importados, 1 erros', saida.getvalue())
+        self.assertTrue(Aluno.objects.filter(user__username='cmd1').exists())
+
+    def test_csv_fora_de_utf8(self):
+        conteudo = 'username,password,nome,email\nx,senha12345,Jo\xe3o,x@e.com\n'
+        response = self.client.post(
+            self.url, conteudo.encode('latin-1'), content_type='text/csv'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'O CSV deve estar em UTF-8.')
+
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv') as arquivo:
+            arquivo.write(conteudo.encode('latin-1'))
+            arquivo.flush()
+            with self.assertRaisesMessage(CommandError, 'UTF-8'):
+                call_command('importar_alunos', arquivo.name)
+
+    def test_aluno_criado_por_outra_requisicao(self):
+        usernames_existentes = bulk.usernames_existentes
+
+        def concorrente(usernames):
+            # Outra requisição cria novo0 após a validação
+            if not User.objects.filter(username='novo0').exists():
+                User.objects.create_user(username='novo0')
+                return set()
+            return usernames_existentes(usernames)
+
+        with mock.patch('classroom.bulk.usernames_existentes', concorrente):
+            response = self.client.post(
+                self.url, self.linhas(3), format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['criados'], 2)
+        self.assertEqual(
+            response.data['resultados'][0]['erro'], 'Username já existe.'
+        )
+        self.assertFalse(Aluno.objects.filter(user__username='novo0').exists())
+        self.assertTrue(Aluno.objects.filter(user__username='novo2').exists())
+
+    def test_importar_apenas_admin(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(self.url, self.linhas(1), format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.MD5PasswordHasher'
+])
+class GerarDadosTests(TestCase):
+    """Comando gerar_dados: escala, determinismo e dados de demonstração"""
+
+    def gerar(self, **opcoes):
+        opcoes = {
+            'alunos': 60, 'turmas': 12, 'seed': 7,
+            'hoje': date(2026, 3, 1), 'batch_size': 25, **opcoes
+        }
+        saida = io.StringIO()
+        call_command('gerar_dados', stdout=saida, **opcoes)
+        return saida.getvalue()
+
+    def retrato(self):
+        """Conteúdo gerado, sem depender dos ids"""
+        return {
+            'alunos': list(Aluno.objects.order_by('user__username').values_list(
+                'user__username', 'nome', 'email', 'telefone'
+            )),
+            'turmas': list(Turma.objects.order_by('nome').values_list(
+                'nome', 'treinamento__nome', 'data_inicio', 'data_conclusao'
+            )),
+            'recursos': list(Recurso.objects.order_by(
+                'turma__nome', 'ordem'
+            ).values_list('turma__nome', 'tipo_recurso', 'draft', 'acesso_previo')),
+            'matriculas': sorted(Matricula.objects.values_list(
+                'aluno__user__username', 'turma__nome', 'ativo'
+            )),
+        }
+
+    def test_gera_dados_na_escala_pedida(self):
+        saida = self.gerar()
+        self.assertIn('alunos: 60', saida)
+        self.assertEqual(Aluno.objects.count(), 60)
+        self.assertEqual(Turma.objects.count(), 12)
+        self.assertEqual(Treinamento.objects.count(), 3)
+        # Todo aluno tem ao menos uma matrícula
+        self.assertEqual(
+            Matricula.objects.values('aluno').distinct().count(), 60
+        )
+        self.assertTrue(Recurso.objects.filter(draft=True).exists())
+        self.assertTrue(Recurso.objects.filter(acesso_previo=True).exists())
+
+        hoje = date(2026, 3, 1)
+        self.assertTrue(Turma.objects.filter(data_conclusao__lt=hoje).exists())
+        self.assertTrue(Turma.objects.filter(data_inicio__gt=hoje).exists())
+        self.assertTrue(Turma.objects.filter(
+            data_inicio__lte=hoje, data_conclusao__gte=hoje
+        ).exists())
+
+    def test_alunos_de_demonstracao(self):
+        self.gerar()
+        for username in ('joao', 'maria', 'pedro', 'ana', 'aluno0000059'):
+            self.assertTrue(
+                User.objects.get(username=username).check_password('senha123')
+            )
+        self.assertEqual(
+            Matricula.objects.filter(aluno__user__username='joao').count(), 3
+        )
+
+    def test_deterministico(self):
+        self.gerar()
+        primeiro = self.retrato()
+        self.gerar(limpar=True)
+        self.assertEqual(self.retrato(), primeiro)
+        self.gerar(limpar=True, seed=8)
+        self.assertNotEqual(self.retrato()['matriculas'], primeiro['matriculas'])
+
+    def test_limpar_preserva_staff(self):
+        admin = User.objects.create_user(
+            username='admin', password='admin123', is_staff=True
+        )
+        self.gerar()
+        with self.assertRaises(CommandError):
+            self.gerar()
+        self.gerar(limpar=True)
+        self.assertTrue(User.objects.filter(pk=admin.pk).exists())
+        self.assertEqual(User.objects.count(), 61)
+
+    def test_senhas_distintas(self):
+        self.gerar(alunos=6, senhas_distintas=True, workers=1)
+        hashes = set(User.objects.values_list('password', flat=True))
+        self.assertEqual(len(hashes), 6)
+
+
+@override_settings(PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.MD5PasswordHasher'
+])
+class BenchmarkTests(TestCase):
+    """Suíte de benchmark: cobertura das rotas, medição e comparação"""
+
+    def test_todas_as_rotas_tem_caso(self):
+        def nomes(padroes):
+            for padrao in padroes:
+                if isinstance(padrao, URLResolver):
+                    yield from nomes(padrao.url_patterns)
+                else:
+                    yield padrao.name
+
+        rotas = set(nomes(classroom_urls.urlpatterns))
+        cobertas = {caso.rota for caso in benchmark.CASOS}
+        self.assertEqual(rotas - cobertas - set(benchmark.IGNORADAS), set())
+        self.assertEqual(cobertas - rotas, set())
+
+    def test_medir_rotas(self):
+        call_command('gerar_dados', alunos=10, stdout=io.StringIO())
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        with override_settings(MEDIA_ROOT=media):
+            resultados = benchmark.medir_rotas(repeticoes=2, aquecimento=0)
+
+        self.assertEqual(
+            set(resultados), {caso.nome for caso in benchmark.CASOS}
+        )
+        self.assertEqual(resultados['minhas-turmas']['queries'], 3)
+        self.assertEqual(
+            resultados['download-recurso']['bytes'], benchmark.TAMANHO_ARQUIVO
+        )
+        for medidas in resultados.values():
+            self.assertLessEqual(medidas['p50_ms'], medidas['p95_ms'])
+
+    def test_medir_renderizacao(self):
+        call_command('gerar_dados', alunos=10, turmas=8, stdout=io.StringIO())
+        resultados = benchmark.medir_renderizacao(tamanhos=(5,), repeticoes=2)
+
+        self.assertEqual(set(resultados), {'turmas:5', 'matriculas:5'})
+        for resultado in resultados.values():
+            self.assertEqual(resultado['linhas'], 5)
+            medidas = resultado['renderers']
+            self.assertTrue(medidas['orjson']['identico'])
+            self.assertEqual(medidas['orjson']['bytes'], medidas['json']['bytes'])
+
+    def test_comparar_com_baseline(self):
+        base = {'100': {
+            'rota': {
+                'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 3, 'bytes': 1000,
+                'referencia_ms': 2.0,
+            },
+        }}
+
+        def atual(**medidas):
+            return {'100': {'rota': {**base['100']['rota'], **medidas}}}
+
+        self.assertEqual(benchmark.comparar(atual(), base), [])
+        # Ruído dentro da tolerância/folga não é regressão; p95 não falha
+        self.assertEqual(
+            benchmark.comparar(
+                atual(p50_ms=14.9, p95_ms=80.0, queries=2), base
+            ),
+            []
+        )
+        regressoes = benchmark.comparar(
+            atual(p50_ms=16.0, queries=4, bytes=1200), base
+        )
+        self.assertEqual(len(regressoes), 3)
+        self.assertIn('100/rota: queries 3 -> 4', regressoes)
+        # Máquina duas vezes mais lenta: o p50 esperado dobra
+        self.assertEqual(
+            benchmark.comparar(atual(p50_ms=25.0, referencia_ms=4.0), base), []
+        )
+        # Caso sem baseline é só medido
+        self.assertEqual(benchmark.comparar({'1000': base['100']}, base), [])
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN do SQLite')
+class PlanoDeConsultaTests(ClassroomTestCase):
+    """
+    Captura o EXPLAIN QUERY PLAN das consultas críticas e falha se alguma
+    deixar de usar o índice esperado (ou voltar a varrer/ordenar a tabela).
+    """
+
+    def plano(self, queryset):
+        return queryset.explain()
+
+    def assertUsaIndice(self, plano, tabela, indice):
+        self.assertRegex(
+            plano,
+            rf'(SEARCH|SCAN) {tabela} USING (COVERING )?INDEX {indice}\b'
+        )
+
+    def assertSemVarredura(self, plano, tabela):
+        self.assertNotRegex(plano, re.compile(rf'SCAN {tabela}$', re.M))
+
+    def assertSemOrdenacaoTemporaria(self, plano):
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plano)
+
+    def queryset_da_view(self, view_class, user):
+        view = view_class()
+        view.request = SimpleNamespace(user=user, query_params={})
+        return view.get_queryset()
+
+    def test_matriculas_ativas_do_aluno(self):
+        plano = self.plano(
+            matriculas_ativas(self.aluno).order_by().values('turma_id')
+        )
+        self.assertUsaIndice(
+            plano, 'classroom_matricula', 'matricula_aluno_ativo_idx'
+        )
+        self.assertIn('COVERING INDEX', plano)
+
+    def test_lista_de_turmas_admin(self):
+        plano = self.plano(self.queryset_da_view(TurmaViewSet, self.admin))
+        self.assertUsaIndice(plano, 'classroom_turma', 'turma_data_inicio_idx')
+        # Total de alunos ativos pela subquery correlacionada
+        self.assertUsaIndice(plano, 'U0', 'matricula_turma_ativo_idx')
+        self.assertSemOrdenacaoTemporaria(plano)
+
+    def test_lista_de_turmas_aluno(self):
+        user = User.objects.get(pk=self.user.pk)
+        plano = self.plano(self.queryset_da_view(TurmaViewSet, user))
+        self.assertUsaIndice(plano, 'U0', 'matricula_aluno_ativo_idx')
+        self.assertSemVarredura(plano, 'classroom_turma')
+
+    def test_minhas_turmas(self):
+        # Mesmo queryset da view (os recursos vêm em uma query separada)
+        plano = self.plano(turmas_matriculadas(self.aluno))
+        self.assertUsaIndice(plano, 'U0', 'matricula_aluno_ativo_idx')
+        self.assertSemVarredura(plano, 'classroom_turma')
+
+    def test_recursos_visiveis_de_uma_turma(self):
+        queryset = prefetch_recursos_visiveis().queryset.filter(
+            turma=self.turma_ativa
+        )
+        plano = self.plano(queryset)
+        self.assertUsaIndice(plano, 'classroom_recurso', 'recurso_visivel_idx')
+        self.assertSemOrdenacaoTemporaria(plano)
+
+    def test_recursos_visiveis_do_aluno(self):
+        plano = self.plano(recursos_visiveis(self.aluno))
+        self.assertUsaIndice(plano, 'U0', 'matricula_aluno_ativo_idx')
+        self.assertSemVarredura(plano, 'classroom_recurso')
+
+    def test_download_resolve_acesso_por_indices(self):
+        plano = self.plano(recurso_com_acesso(1, self.aluno))
+        self.assertSemVarredura(plano, 'classroom_recurso')
+        self.assertSemVarredura(plano, 'U0')
+
+    def test_listagens_ordenadas_por_indice(self):
+        casos = [
+            (RecursoViewSet, 'classroom_recurso', 'recurso_ordem_idx'),
+            (MatriculaViewSet, 'classroom_matricula', 'matricula_data_idx'),
+            (AlunoViewSet, 'classroom_aluno', 'aluno_nome_idx'),
+        ]
+        for view_class, tabela, indice in casos:
+            with self.subTest(view_class.__name__):
+                queryset = self.queryset_da_view(view_class, self.admin)
+                # Ordenação padrão e ordenação da paginação por cursor
+                for ordering in (
+                    queryset.model._meta.ordering, view_class.keyset_ordering
+                ):
+                    plano = self.plano(queryset.order_by(*ordering))
+                    self.assertUsaIndice(plano, tabela, indice)
+                    self.assertSemOrdenacaoTemporaria(plano)
+
+    def test_contagem_de_matriculas_ativas_por_turma(self):
+        plano = self.plano(
+            Matricula.objects.filter(turma=self.turma_ativa, ativo=True)
+            .order_by().values('turma').annotate(total=Count('*'))
+        )
+        self.assertUsaIndice(
+            plano, 'classroom_matricula', 'matricula_turma_ativo_idx'
+        )
+
+
+class PerfilSqliteProducaoTests(unittest.TestCase):
+    """
+    Perfil de produção do SQLite: pragmas por conexão, conexões somente
+    leitura e teste de estresse com escrita e leituras concorrentes.
+
+    Usa bancos em arquivos temporários (fora do banco de teste), por isso
+    é um unittest.TestCase e não um TestCase do Django.
+    """
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio, ignore_errors=True)
+
+    def conexoes(self, databases):
+        handler = ConnectionHandler(databases)
+        self.addCleanup(handler.close_all)
+        return handler
+
+    def perfil_producao(self, nome='producao.sqlite3'):
+        return self.conexoes(sqlite_producao(f'{self.diretorio}/{nome}'))
+
+    def pragma(self, conexao, nome):
+        with conexao.cursor() as cursor:
+            cursor.execute(f'PRAGMA {nome}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_aplicados_em_toda_conexao(self):
+        conexoes = self.perfil_producao()
+        escrita, leitura = conexoes['default'], conexoes['leitura']
+        self.assertEqual(self.pragma(escrita, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(escrita, 'synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma(escrita, 'busy_timeout'), 20000)
+        self.assertEqual(self.pragma(escrita, 'cache_size'), -65536)
+        self.assertEqual(escrita.transaction_mode, 'IMMEDIATE')
+        self.assertEqual(escrita.settings_dict['CONN_MAX_AGE'], 600)
+        self.assertTrue(escrita.settings_dict['CONN_HEALTH_CHECKS'])
+        self.assertEqual(self.pragma(leitura, 'query_only'), 1)
+
+    def test_conexao_de_leitura_recusa_escrita(self):
+        conexoes = self.perfil_producao()
+        with conexoes['default'].cursor() as cursor:
+            cursor.execute('CREATE TABLE t (x INTEGER)')
+        with self.assertRaises(DatabaseError):
+            with conexoes['leitura'].cursor() as cursor:
+                cursor.execute('INSERT INTO t VALUES (1)')
+
+    def test_router(self):
+        router = LeituraEscritaRouter()
+        self.assertEqual(router.db_for_read(Turma), 'leitura')
+        self.assertEqual(router.db_for_write(Turma), 'default')
+        self.assertTrue(router.allow_migrate('default', 'classroom'))
+        self.assertFalse(router.allow_migrate('leitura', 'classroom'))
+        with mock.patch('classroom_project.routers.connections') as conexoes:
+            conexoes.__getitem__.return_value.in_atomic_block = True
+            self.assertEqual(router.db_for_read(Turma), 'default')
+
+    def latencia_leituras(self, conexoes, leitores=4, escrita_segundos=0.6):
+        """
+        Mantém uma transação de escrita aberta (com o lock exclusivo que o
+        escritor obtém ao gravar no arquivo) enquanto leitores consultam o
+        banco. Retorna a maior latência de leitura observada.
+        """
+        with conexoes['default'].cursor() as cursor:
+            cursor.execute('CREATE TABLE t (x INTEGER)')
+            cursor.execute('INSERT INTO t VALUES (1)')
+        conexoes['default'].close()
+
+        lock_obtido = threading.Event()
+        latencias = []
+
+        def escritor():
+            conexao = conexoes['default']
+            with conexao.cursor() as cursor:
+                cursor.execute('BEGIN EXCLUSIVE')
+                cursor.execute('INSERT INTO t VALUES (2)')
+                lock_obtido.set()
+                time.sleep(escrita_segundos)
+                cursor.execute('COMMIT')
+            conexao.close()
+
+        def leitor():
+            lock_obtido.wait()
+            conexao = conexoes['leitura']
+            for _ in range(5):
+                inicio = time.monotonic()
+                with conexao.cursor() as cursor:
+                    cursor.execute('SELECT COUNT(*) FROM t')
+                    cursor.fetchone()
+                latencias.append(time.monotonic() - inicio)
+            conexao.close()
+
+        threads = [threading.Thread(target=escritor)] + [
+            threading.Thread(target=leitor) for _ in range(leitores)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return max(latencias)
+
+    def test_leitores_nao_travam_durante_escrita(self):
+        caminho = f'{self.diretorio}/padrao.sqlite3'
+        padrao = self.conexoes({
+            alias: {
+                'ENGINE': 'django.db.backends.sqlite3', 'NAME': caminho,
+                'OPTIONS': {'timeout': 20},
+            }
+            for alias in ('default', 'leitura')
+        })
+        # Journal padrão (DELETE): leitores esperam o escritor terminar
+        self.assertGreaterEqual(self.latencia_leituras(padrao), 0.4)
+        # WAL: leitores seguem lendo o último snapshot commitado
+        self.assertLess(self.latencia_leituras(self.perfil_producao()), 0.2)
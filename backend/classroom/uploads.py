@@ -0,0 +1,169 @@
+"""
+Upload em partes (resumível) dos arquivos de recursos.
+
+Fluxo:
+
+1. ``POST /api/uploads/`` cria a sessão (recurso, nome do arquivo, tamanho).
+2. ``PATCH /api/uploads/<id>/`` envia uma parte a partir do cabeçalho
+   ``Upload-Offset``; o corpo é gravado direto em disco, em blocos.
+3. ``GET``/``HEAD /api/uploads/<id>/`` informa o offset atual para retomar.
+4. ``POST /api/uploads/<id>/finalizar/`` move o arquivo para
+   ``Recurso.arquivo``.
+
+Cada PATCH e o ``finalizar`` seguram uma trava exclusiva (``flock``) do
+arquivo parcial enquanto gravam o arquivo e a sessão; o offset e o
+``concluido`` são relidos do banco já com a trava. Uma segunda requisição
+na mesma sessão (ex.: o cliente repetiu a parte ainda em andamento) não
+espera: recebe 409 e consulta o offset.
+"""
+
+import os
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UploadRecurso
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava, use um único worker
+    fcntl = None
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+class OffsetInvalido(Exception):
+    """O offset enviado pelo cliente não confere com o da sessão"""
+
+
+class UploadEmAndamento(Exception):
+    """Outra requisição está gravando ou finalizando a mesma sessão"""
+
+
+class UploadConcluido(Exception):
+    """A sessão já foi finalizada"""
+
+
+class UploadIncompleto(Exception):
+    """O arquivo parcial ainda não tem o tamanho total da sessão"""
+
+
+class ArquivoTemporario(File):
+    """
+    Arquivo já em disco; ``temporary_file_path`` permite que o
+    FileSystemStorage apenas mova o arquivo em vez de copiá-lo.
+    """
+    def temporary_file_path(self):
+        return self.name
+
+
+def diretorio_temporario():
+    diretorio = getattr(
+        settings, 'RECURSO_UPLOAD_TEMP_DIR',
+        os.path.join(settings.MEDIA_ROOT, 'uploads_tmp')
+    )
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+
+def caminho_parcial(upload):
+    return os.path.join(diretorio_temporario(), f'{upload.id}.part')
+
+
+def abrir_parcial(upload):
+    """
+    Abre (ou cria, no primeiro envio) o arquivo parcial. Se ele sumiu com
+    a sessão ainda aberta, o envio recomeça do zero.
+    """
+    caminho = caminho_parcial(upload)
+    try:
+        return os.open(caminho, os.O_RDWR)
+    except FileNotFoundError:
+        pass
+    upload.refresh_from_db(fields=['offset', 'concluido'])
+    if upload.concluido:
+        raise UploadConcluido()
+    # Condicional: o finalizar pode ter acabado de mover o arquivo
+    if upload.offset and not UploadRecurso.objects.filter(
+        pk=upload.pk, offset=upload.offset, concluido=False
+    ).update(offset=0, atualizado_em=timezone.now()):
+        raise UploadConcluido()
+    return os.open(caminho, os.O_RDWR | os.O_CREAT, 0o600)
+
+
+@contextmanager
+def parcial_travado(upload):
+    """Arquivo parcial com trava exclusiva e a sessão relida do banco"""
+    with os.fdopen(abrir_parcial(upload), 'r+b') as arquivo:
+        if fcntl is not None:
+            try:
+                fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadEmAndamento()
+        upload.refresh_from_db(fields=['offset', 'concluido'])
+        if upload.concluido:
+            raise UploadConcluido()
+        yield arquivo
+
+
+def gravar_parte(upload, stream, offset, tamanho_parte):
+    """
+    Grava até ``tamanho_parte`` bytes do stream a partir de ``offset`` e
+    avança o offset da sessão.
+
+    A memória usada é limitada a CHUNK_SIZE independente do tamanho da
+    parte. Retorna o novo offset (bytes efetivamente gravados, mesmo se a
+    conexão cair no meio da parte).
+    """
+    with parcial_travado(upload) as arquivo:
+        if offset != upload.offset:
+            raise OffsetInvalido(upload.offset)
+
+        restante = min(tamanho_parte, upload.tamanho - offset)
+        arquivo.seek(offset)
+        while stream is not None and restante > 0:
+            bloco = stream.read(min(CHUNK_SIZE, restante))
+            if not bloco:
+                break
+            arquivo.write(bloco)
+            restante -= len(bloco)
+        # Descarta bytes além do offset (de uma parte interrompida antes)
+        arquivo.truncate()
+        novo_offset = arquivo.tell()
+        UploadRecurso.objects.filter(pk=upload.pk).update(
+            offset=novo_offset, atualizado_em=timezone.now()
+        )
+        upload.offset = novo_offset
+        return novo_offset
+
+
+def finalizar(upload):
+    """Move o arquivo completo para ``Recurso.arquivo``"""
+    with parcial_travado(upload) as arquivo:
+        tamanho = os.fstat(arquivo.fileno()).st_size
+        if upload.offset < upload.tamanho or tamanho != upload.tamanho:
+            raise UploadIncompleto(upload.offset)
+
+        recurso = upload.recurso
+        with transaction.atomic():
+            UploadRecurso.objects.filter(pk=upload.pk).update(
+                concluido=True, atualizado_em=timezone.now()
+            )
+            recurso.arquivo.save(
+                upload.nome_arquivo,
+                ArquivoTemporario(arquivo, name=caminho_parcial(upload)),
+                save=True
+            )
+        upload.concluido = True
+        return recurso
+
+
+def remover_parcial(upload):
+    try:
+        os.remove(caminho_parcial(upload))
+    except FileNotFoundError:
+        pass
@@ -1,10 +1,15 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .async_views import (
+    AsyncMeusDadosView, AsyncMinhasTurmasView, AsyncTurmaListView,
+    AsyncTurmaDetailView, AsyncRecursoListView, AsyncRecursoDetailView
+)
 from .views import (
     TreinamentoViewSet, TurmaViewSet, RecursoViewSet,
     AlunoViewSet, MatriculaViewSet, MeusDadosView,
-    MinhasTurmasView, RegistrationView, DownloadRecursoView
+    MinhasTurmasView, RegistrationView, DownloadRecursoView,
+    UploadRecursoViewSet, CacheEstatisticasView, MetricasView, BuscaView
 )
 
 router = DefaultRouter()
@@ -13,6 +18,7 @@ router.register(r'turmas', TurmaViewSet, basename='turma')
 router.register(r'recursos', RecursoViewSet, basename='recurso')
 router.register(r'alunos', AlunoViewSet, basename='aluno')
 router.register(r'matriculas', MatriculaViewSet, basename='matricula')
+router.register(r'uploads', UploadRecursoViewSet, basename='upload')
 
 urlpatterns = [
     # Autenticação JWT
@@ -27,6 +33,23 @@ urlpatterns = [
     # Download de recursos
     path('recursos/<int:recurso_id>/download/', DownloadRecursoView.as_view(), name='download-recurso'),  
     
+    # Endpoints de leitura assíncronos (ASGI), ver async_views.py
+    path('async/meus-dados/', AsyncMeusDadosView.as_view(), name='async-meus-dados'),
+    path('async/minhas-turmas/', AsyncMinhasTurmasView.as_view(), name='async-minhas-turmas'),
+    path('async/turmas/', AsyncTurmaListView.as_view(), name='async-turma-list'),
+    path('async/turmas/<int:pk>/', AsyncTurmaDetailView.as_view(), name='async-turma-detail'),
+    path('async/recursos/', AsyncRecursoListView.as_view(), name='async-recurso-list'),
+    path('async/recursos/<int:pk>/', AsyncRecursoDetailView.as_view(), name='async-recurso-detail'),
+    
+    # Busca textual no catálogo (FTS5), ver search.py
+    path('busca/', BuscaView.as_view(), name='busca'),
+    
+    # Estatísticas do cache de respostas (admin)
+    path('cache/estatisticas/', CacheEstatisticasView.as_view(), name='cache-estatisticas'),
+    
+    # Métricas no formato do Prometheus (admin)
+    path('_metrics', MetricasView.as_view(), name='metricas'),
+    
     # Rotas do router
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,13 +1,16 @@
-import os
+from collections import Counter
 from datetime import date
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.http import FileResponse, Http404
+from django.db import router
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
-from rest_framework import viewsets, permissions, status
+from django.utils import timezone
+from rest_framework import mixins, viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .models import Treinamento, Turma, Recurso, Aluno, Matricula
+from .models import Treinamento, Turma, Recurso, Aluno, Matricula, UploadRecurso
 from .serializers import (
     TreinamentoSerializer,
     TurmaSerializer,
@@ -15,91 +18,116 @@ from .serializers import (
     AlunoSerializer,
     MatriculaSerializer,
     UserRegistrationSerializer,
-    TurmaAlunoSerializer
+    TurmaAlunoSerializer,
+    UploadRecursoSerializer
 )
 from .permissions import IsAdminOrReadOnly, IsOwnerOrAdmin
 from .filters import TurmaFilter, RecursoFilter
+from .pagination import KeysetPagination
+from .response_cache import RespostaCacheMixin, estatisticas
+from .conditional import CondicionalMixin
+from .fieldsets import SelecaoQuerysetMixin, otimizar
+from .fastpath import LeituraRapidaMixin
+from .exports import ExportacaoMixin
+from . import search
+from .authentication import aluno_completo
+from . import access_cache, metrics
+from .bulk import (
+    STATUS_CRIADA, STATUS_CRIADO, STATUS_DUPLICADA, STATUS_ERRO,
+    CsvInvalido, importar_alunos, ler_csv, matricular_em_lote
+)
+from .downloads import servir_arquivo
+from .uploads import (
+    OffsetInvalido, UploadConcluido, UploadEmAndamento, UploadIncompleto,
+    finalizar, gravar_parte, remover_parcial
+)
+from .visibility import (
+    turmas_matriculadas, recurso_com_acesso, motivo_bloqueio
+)
+
+def linhas_da_requisicao(request, chave):
+    """
+    Linhas de uma operação em lote: lista JSON (ou ``{chave: [...]}``),
+    corpo ``text/csv`` ou arquivo CSV ``arquivo`` em multipart.
+    """
+    if request.content_type.startswith('text/csv'):
+        return ler_csv(request.body)
+    if 'arquivo' in request.FILES:
+        return ler_csv(request.FILES['arquivo'].read())
+    linhas = request.data
+    if isinstance(linhas, dict):
+        linhas = linhas.get(chave)
+    return linhas
+
+
+def validar_linhas(linhas, limite):
+    if not isinstance(linhas, list):
+        return Response(
+            {'error': 'Envie uma lista JSON ou um CSV'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(linhas) > limite:
+        return Response(
+            {'error': f'Máximo de {limite} linhas por lote'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return None
+
 
 class DownloadRecursoView(APIView):
     """Endpoint para download seguro de recursos"""
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, recurso_id):
-        recurso = get_object_or_404(Recurso, id=recurso_id)
-        
         # Verificar se o usuário tem permissão
         user = request.user
         
         # Admin pode baixar qualquer recurso
         if user.is_staff:
-            if not recurso.arquivo:
-                return Response(
-                    {'error': 'Recurso não possui arquivo'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-            file_path = recurso.arquivo.path
-            if os.path.exists(file_path):
-                return FileResponse(
-                    open(file_path, 'rb'),
-                    as_attachment=True,
-                    filename=os.path.basename(file_path)
-                )
-            raise Http404("Arquivo não encontrado")
+            recurso = get_object_or_404(Recurso, id=recurso_id)
+            return self.servir_arquivo(request, recurso)
         
-        # Aluno precisa validar permissões
-        try:
-            aluno = user.aluno
-            
-            # Verificar se está matriculado na turma
-            if not Matricula.objects.filter(
-                aluno=aluno,
-                turma=recurso.turma,
-                ativo=True
-            ).exists():
+        # Decisão em cache: nenhuma query para requisições repetidas
+        # (ex.: os vários Range de um player de vídeo)
+        decisao = access_cache.obter(user.id, recurso_id)
+        if decisao is None:
+            # Aluno precisa validar permissões
+            try:
+                aluno = user.aluno
+            except Aluno.DoesNotExist:
                 return Response(
-                    {'error': 'Você não está matriculado nesta turma'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            
-            # Aplicar regras de negócio
-            hoje = date.today()
-            turma_iniciou = hoje >= recurso.turma.data_inicio
-            
-            # Verificar se pode acessar
-            if recurso.draft:
-                return Response(
-                    {'error': 'Recurso não disponível'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            
-            if not turma_iniciou and not recurso.acesso_previo:
-                return Response(
-                    {'error': 'Recurso disponível apenas após início da turma'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            
-            # Permitir download
-            if not recurso.arquivo:
-                return Response(
-                    {'error': 'Recurso não possui arquivo'},
+                    {'error': 'Perfil de aluno não encontrado'},
                     status=status.HTTP_404_NOT_FOUND
                 )
-            
-            file_path = recurso.arquivo.path
-            if os.path.exists(file_path):
-                return FileResponse(
-                    open(file_path, 'rb'),
-                    as_attachment=True,
-                    filename=os.path.basename(file_path)
-                )
-            raise Http404("Arquivo não encontrado")
-            
-        except Aluno.DoesNotExist:
+
+            # Recurso, turma e matrícula resolvidos em uma única query
+            recurso = get_object_or_404(recurso_com_acesso(recurso_id, aluno))
+
+            # Aplicar regras de negócio
+            decisao = access_cache.registrar(
+                user.id, recurso, motivo_bloqueio(recurso, recurso.matriculado)
+            )
+
+        if decisao['motivo']:
             return Response(
-                {'error': 'Perfil de aluno não encontrado'},
+                {'error': decisao['motivo']},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        # Permitir download
+        return self.servir_arquivo(
+            request, access_cache.recurso_da_decisao(recurso_id, decisao)
+        )
+
+    def servir_arquivo(self, request, recurso):
+        if not recurso.arquivo:
+            return Response(
+                {'error': 'Recurso não possui arquivo'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        
+        # Range, 206 e requisições condicionais (ver downloads.py)
+        return servir_arquivo(request, recurso)
 
 class IsAdminUser(permissions.BasePermission):
     """Permissão apenas para administradores"""
@@ -107,10 +135,15 @@ class IsAdminUser(permissions.BasePermission):
         return request.user and request.user.is_staff
 
 
-class TreinamentoViewSet(viewsets.ModelViewSet):
+class TreinamentoViewSet(RespostaCacheMixin, CondicionalMixin,
+                         LeituraRapidaMixin, SelecaoQuerysetMixin,
+                         viewsets.ModelViewSet):
     queryset = Treinamento.objects.all()
     serializer_class = TreinamentoSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+    # Catálogo lido a cada dashboard, alterado poucas vezes por semana
+    cache_nome = 'treinamentos'
+    cache_modelos = (Treinamento,)
 
     def get_permissions(self):
         """Permite leitura para todos autenticados, escrita só admin"""
@@ -119,11 +152,19 @@ class TreinamentoViewSet(viewsets.ModelViewSet):
         return [permissions.IsAuthenticated(), IsAdminUser()]
 
 
-class TurmaViewSet(viewsets.ModelViewSet):
+class TurmaViewSet(RespostaCacheMixin, CondicionalMixin, LeituraRapidaMixin,
+                   SelecaoQuerysetMixin, viewsets.ModelViewSet):
     queryset = Turma.objects.all()
     serializer_class = TurmaSerializer
     permission_classes = [permissions.IsAuthenticated]
     filterset_class = TurmaFilter
+    condicional_relacoes = ('treinamento', 'recursos', 'matriculas')
+    cache_nome = 'turmas'
+    cache_modelos = (Turma, Treinamento, Recurso, Matricula)
+
+    def usar_cache(self, request):
+        """Apenas admins: para alunos a resposta depende das matrículas"""
+        return super().usar_cache(request) and request.user.is_staff
 
     def get_permissions(self):
         """Permite leitura para todos autenticados, escrita só admin"""
@@ -132,60 +173,219 @@ class TurmaViewSet(viewsets.ModelViewSet):
         return [permissions.IsAuthenticated(), IsAdminUser()]
 
     def get_queryset(self):
+        # Número fixo de queries: treinamento via JOIN, total de alunos
+        # anotado e recursos em um único prefetch (só os campos pedidos)
+        return self.otimizar_queryset(self.queryset_para(self.request.user))
+
+    @staticmethod
+    def queryset_para(user):
         """Admin vê tudo, aluno vê apenas suas turmas"""
-        user = self.request.user
         if user.is_staff:
             return Turma.objects.all()
-        
-        # Retorna turmas do aluno
+
         try:
-            aluno = user.aluno
-            return Turma.objects.filter(
-                matriculas__aluno=aluno,
-                matriculas__ativo=True
-            ).distinct()
+            return turmas_matriculadas(user.aluno)
         except Aluno.DoesNotExist:
             return Turma.objects.none()
 
 
-class RecursoViewSet(viewsets.ModelViewSet):
+class RecursoViewSet(CondicionalMixin, LeituraRapidaMixin, ExportacaoMixin,
+                     SelecaoQuerysetMixin, viewsets.ModelViewSet):
     queryset = Recurso.objects.all()
     serializer_class = RecursoSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdminUser]
     filterset_class = RecursoFilter 
+    condicional_relacoes = ('turma',)
+    pagination_class = KeysetPagination
+    keyset_ordering = ['ordem', '-criado_em', 'id']
+    exportacao_nome = 'recursos'
 
     def get_queryset(self):
+        # turma_nome é serializado: turma via JOIN (se pedido)
+        return self.otimizar_queryset(
+            self.queryset_para(self.request.query_params)
+        )
+
+    @staticmethod
+    def queryset_para(params):
         """Permite filtrar por turma"""
         queryset = Recurso.objects.all()
-        turma_id = self.request.query_params.get('turma', None)
+        turma_id = params.get('turma', None)
         if turma_id:
             queryset = queryset.filter(turma_id=turma_id)
         return queryset
 
 
-class AlunoViewSet(viewsets.ModelViewSet):
+class UploadRecursoViewSet(mixins.CreateModelMixin,
+                           mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin,
+                           viewsets.GenericViewSet):
+    """Upload em partes (resumível) de arquivos de recursos (ver uploads.py)"""
+    serializer_class = UploadRecursoSerializer
+    permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+
+    def get_queryset(self):
+        return UploadRecurso.objects.filter(usuario=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(usuario=self.request.user)
+
+    def perform_destroy(self, instance):
+        remover_parcial(instance)
+        instance.delete()
+
+    def retrieve(self, request, *args, **kwargs):
+        """Informa o offset atual para o cliente retomar o envio"""
+        response = super().retrieve(request, *args, **kwargs)
+        response['Upload-Offset'] = str(response.data['offset'])
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    def partial_update(self, request, pk=None):
+        """Recebe uma parte do arquivo a partir de ``Upload-Offset``"""
+        upload = self.get_object()
+        if upload.concluido:
+            return self.upload_finalizado()
+
+        try:
+            offset = int(request.META['HTTP_UPLOAD_OFFSET'])
+            tamanho_parte = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'Cabeçalho Upload-Offset ausente ou inválido'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        limite = settings.RECURSO_UPLOAD_CHUNK_MAX_SIZE
+        if tamanho_parte > limite:
+            return Response(
+                {'error': f'Parte excede o limite de {limite} bytes'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        # O corpo é lido direto do stream, sem passar pelos parsers do DRF
+        try:
+            novo_offset = gravar_parte(
+                upload, request.stream, offset, tamanho_parte
+            )
+        except UploadConcluido:
+            return self.upload_finalizado()
+        except OffsetInvalido:
+            return self.conflito(upload, 'Offset não confere com o do servidor')
+        except UploadEmAndamento:
+            return self.conflito(
+                upload, 'Outra parte deste upload está sendo gravada'
+            )
+
+        response = Response(status=status.HTTP_204_NO_CONTENT)
+        response['Upload-Offset'] = str(novo_offset)
+        return response
+
+    @staticmethod
+    def upload_finalizado():
+        return Response(
+            {'error': 'Upload já finalizado'},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    @staticmethod
+    def conflito(upload, mensagem):
+        """409 com o offset atual do servidor, para o cliente retomar"""
+        response = Response(
+            {'error': mensagem}, status=status.HTTP_409_CONFLICT
+        )
+        response['Upload-Offset'] = str(
+            UploadRecurso.objects.values_list('offset', flat=True)
+            .get(pk=upload.pk)
+        )
+        return response
+
+    @action(detail=True, methods=['post'])
+    def finalizar(self, request, pk=None):
+        """Move o arquivo completo para o recurso"""
+        upload = self.get_object()
+        if upload.concluido:
+            return self.upload_finalizado()
+
+        try:
+            recurso = finalizar(upload)
+        except UploadConcluido:
+            return self.upload_finalizado()
+        except UploadEmAndamento:
+            return Response(
+                {'error': 'Upload em andamento'},
+                status=status.HTTP_409_CONFLICT
+            )
+        except UploadIncompleto:
+            return Response(
+                {'error': 'Upload incompleto', 'offset': upload.offset},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(
+            RecursoSerializer(recurso, context={'request': request}).data
+        )
+
+
+class AlunoViewSet(CondicionalMixin, LeituraRapidaMixin, ExportacaoMixin,
+                   SelecaoQuerysetMixin, viewsets.ModelViewSet):
     queryset = Aluno.objects.all()
     serializer_class = AlunoSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ['nome', 'id']
+    exportacao_nome = 'alunos'
 
     def get_permissions(self):
         """Admin pode criar/editar, aluno pode ver próprio perfil"""
-        if self.action in ['list', 'create', 'destroy']:
+        if self.action in [
+                'list', 'create', 'destroy', 'importar', 'exportar']:
             return [permissions.IsAuthenticated(), IsAdminUser()]
         return [permissions.IsAuthenticated()]
 
     def get_queryset(self):
         """Admin vê todos, aluno vê apenas ele mesmo"""
         user = self.request.user
-        if user.is_staff:
-            return Aluno.objects.all()
-        return Aluno.objects.filter(user=user)
+        queryset = Aluno.objects.all()
+        if not user.is_staff:
+            queryset = queryset.filter(user=user)
+        return self.otimizar_queryset(queryset)
+
+    @action(detail=False, methods=['post'])
+    def importar(self, request):
+        """
+        Importação em massa de alunos (lista JSON ou CSV com
+        ``username,password,nome,email[,telefone]``). Ver bulk.py.
+        """
+        try:
+            linhas = linhas_da_requisicao(request, 'alunos')
+        except CsvInvalido as exc:
+            return Response(
+                {'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        erro = validar_linhas(linhas, settings.ALUNO_IMPORTACAO_MAX_LINHAS)
+        if erro:
+            return erro
 
+        # Hash no próprio processo: sem pool de processos no worker web
+        resultados = importar_alunos(linhas)
+        totais = Counter(resultado['status'] for resultado in resultados)
+        return Response({
+            'criados': totais[STATUS_CRIADO],
+            'erros': totais[STATUS_ERRO],
+            'resultados': resultados,
+        })
 
-class MatriculaViewSet(viewsets.ModelViewSet):
+
+class MatriculaViewSet(CondicionalMixin, LeituraRapidaMixin,
+                       ExportacaoMixin, SelecaoQuerysetMixin,
+                       viewsets.ModelViewSet):
     queryset = Matricula.objects.all()
     serializer_class = MatriculaSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+    condicional_relacoes = ('aluno', 'turma', 'turma__treinamento')
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-data_matricula', '-id']
+    exportacao_nome = 'matriculas'
 
     def get_queryset(self):
         """Permite filtrar por turma ou aluno"""
@@ -198,17 +398,50 @@ class MatriculaViewSet(viewsets.ModelViewSet):
         if aluno_id:
             queryset = queryset.filter(aluno_id=aluno_id)
         
-        return queryset
+        return self.otimizar_queryset(queryset)
 
+    @action(detail=False, methods=['post'], url_path='em-lote')
+    def em_lote(self, request):
+        """
+        Matrícula em lote. Aceita uma lista JSON de ``{turma, aluno, ativo}``
+        ou um CSV com cabeçalho ``turma,aluno[,ativo]`` (corpo ``text/csv``
+        ou arquivo ``arquivo`` em multipart).
+        """
+        try:
+            linhas = linhas_da_requisicao(request, 'matriculas')
+        except CsvInvalido as exc:
+            return Response(
+                {'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        erro = validar_linhas(linhas, settings.MATRICULA_LOTE_MAX_LINHAS)
+        if erro:
+            return erro
+
+        resultados = matricular_em_lote(linhas)
+        totais = Counter(resultado['status'] for resultado in resultados)
+        return Response({
+            'criadas': totais[STATUS_CRIADA],
+            'duplicadas': totais[STATUS_DUPLICADA],
+            'erros': totais[STATUS_ERRO],
+            'resultados': resultados,
+        })
 
-class MeusDadosView(APIView):
+
+class MeusDadosView(CondicionalMixin, APIView):
     """Endpoint para o aluno ver seus próprios dados"""
     permission_classes = [permissions.IsAuthenticated]
 
+    def escopo_condicional(self):
+        return Aluno.objects.filter(user=self.request.user)
+
     def get(self, request):
+        return self.responder_condicional(request, self.meus_dados)
+
+    def meus_dados(self, request):
         try:
-            aluno = request.user.aluno
-            serializer = AlunoSerializer(aluno)
+            # Com o usuário das claims o aluno só tem o id carregado
+            aluno = aluno_completo(request.user.aluno)
+            serializer = AlunoSerializer(aluno, context={'request': request})
             return Response(serializer.data)
         except Aluno.DoesNotExist:
             return Response(
@@ -217,19 +450,37 @@ class MeusDadosView(APIView):
             )
 
 
-class MinhasTurmasView(APIView):
+class MinhasTurmasView(CondicionalMixin, APIView):
     """Endpoint para o aluno ver suas turmas com regras de negócio"""
     permission_classes = [permissions.IsAuthenticated]
+    condicional_relacoes = ('treinamento', 'recursos', 'matriculas')
+
+    def escopo_condicional(self):
+        return Turma.objects.filter(id__in=Matricula.objects.filter(
+            aluno__user=self.request.user, ativo=True
+        ).values('turma_id'))
+
+    def extras_condicionais(self):
+        # Recursos visíveis e pode_acessar dependem da data
+        return (self.hoje,)
 
     def get(self, request):
+        self.hoje = date.today()
+        return self.responder_condicional(request, self.minhas_turmas)
+
+    def minhas_turmas(self, request):
         try:
             aluno = request.user.aluno
-            turmas = Turma.objects.filter(
-                matriculas__aluno=aluno,
-                matriculas__ativo=True
-            ).distinct()
+            contexto = {'hoje': self.hoje, 'request': request}
+            # Treinamento e recursos visíveis só se pedidos (ver fieldsets.py)
+            turmas = otimizar(
+                turmas_matriculadas(aluno),
+                TurmaAlunoSerializer(context=contexto)
+            )
             
-            serializer = TurmaAlunoSerializer(turmas, many=True)
+            serializer = TurmaAlunoSerializer(
+                turmas, many=True, context=contexto
+            )
             return Response(serializer.data)
         except Aluno.DoesNotExist:
             return Response(
@@ -250,4 +501,66 @@ class RegistrationView(APIView):
                 {'message': 'Usuário criado com sucesso'},
                 status=status.HTTP_201_CREATED
             )
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class BuscaView(APIView):
+    """Busca textual em treinamentos, turmas e recursos (ver search.py)"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if not search.busca_disponivel(router.db_for_read(Treinamento)):
+            return Response(
+                {'error': 'Busca disponível apenas com SQLite'},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        texto = request.query_params.get('q', '')
+        if search.expressao(texto) is None:
+            return Response(
+                {'error': 'Informe o texto da busca em q'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        tipo = request.query_params.get('tipo') or None
+        if tipo is not None and tipo not in search.TIPOS:
+            return Response(
+                {'error': f"Tipo inválido; use {', '.join(search.TIPOS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limite = int(request.query_params.get(
+                'limite', search.LIMITE_PADRAO
+            ))
+        except ValueError:
+            limite = 0
+        if limite < 1:
+            return Response(
+                {'error': 'limite deve ser um inteiro positivo'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limite = min(limite, search.LIMITE_MAXIMO)
+        return Response({'resultados': search.buscar(
+            texto, request.user, tipo=tipo, limite=limite
+        )})
+
+
+class CacheEstatisticasView(APIView):
+    """Contadores de hits/misses do cache de respostas do catálogo"""
+    permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        return Response(estatisticas([
+            TreinamentoViewSet.cache_nome, TurmaViewSet.cache_nome
+        ]))
+
+
+class MetricasView(APIView):
+    """Métricas por rota no formato texto do Prometheus (ver metrics.py)"""
+    permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        texto = metrics.formato_prometheus(estatisticas([
+            TreinamentoViewSet.cache_nome, TurmaViewSet.cache_nome
+        ]))
+        return HttpResponse(
+            texto, content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
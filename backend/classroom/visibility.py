@@ -0,0 +1,97 @@
+"""
+Regras de visibilidade de recursos para alunos.
+
+Centraliza as regras de negócio usadas pelo dashboard do aluno e pelo
+download de recursos:
+
+1. Recursos em rascunho (draft) nunca são visíveis para alunos.
+2. Antes do início da turma, apenas recursos com acesso prévio.
+3. Após o início da turma, todos os recursos que não são rascunho.
+"""
+
+from datetime import date
+
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Turma, Recurso, Matricula
+
+
+MOTIVO_NAO_MATRICULADO = 'Você não está matriculado nesta turma'
+MOTIVO_DRAFT = 'Recurso não disponível'
+MOTIVO_ANTES_INICIO = 'Recurso disponível apenas após início da turma'
+
+
+def filtro_recursos_visiveis(hoje=None):
+    """Retorna o Q com as regras de visibilidade de recursos"""
+    hoje = hoje or date.today()
+    return Q(draft=False) & (
+        Q(acesso_previo=True) | Q(turma__data_inicio__lte=hoje)
+    )
+
+
+def matriculas_ativas(aluno):
+    return Matricula.objects.filter(aluno=aluno, ativo=True)
+
+
+def total_alunos_ativos():
+    """
+    Total de matrículas ativas da turma, para ``annotate``. Subquery
+    correlacionada (sem GROUP BY): a ordenação das turmas continua usando
+    o índice de data_inicio e a contagem usa o índice (turma, ativo).
+    """
+    return Coalesce(Subquery(
+        Matricula.objects.filter(turma=OuterRef('pk'), ativo=True)
+        .order_by().values('turma').annotate(total=Count('*'))
+        .values('total')
+    ), 0)
+
+
+def turmas_matriculadas(aluno):
+    """Turmas com matrícula ativa do aluno (subquery, sem JOIN nem distinct)"""
+    return Turma.objects.filter(
+        id__in=matriculas_ativas(aluno).values('turma_id')
+    )
+
+
+def prefetch_recursos_visiveis(hoje=None, queryset=None):
+    """Prefetch dos recursos visíveis em ``turma.recursos_visiveis``"""
+    if queryset is None:
+        queryset = Recurso.objects.all()
+    return Prefetch(
+        'recursos',
+        queryset=queryset.filter(filtro_recursos_visiveis(hoje)),
+        to_attr='recursos_visiveis'
+    )
+
+
+def recursos_visiveis(aluno, hoje=None):
+    """Todos os recursos que o aluno pode ver agora, em uma única query"""
+    return Recurso.objects.filter(
+        filtro_recursos_visiveis(hoje),
+        turma_id__in=matriculas_ativas(aluno).values('turma_id')
+    )
+
+
+def recurso_com_acesso(recurso_id, aluno):
+    """
+    Carrega o recurso com a turma e a anotação ``matriculado`` indicando
+    se o aluno tem matrícula ativa na turma (uma única query).
+    """
+    return Recurso.objects.select_related('turma').annotate(
+        matriculado=Exists(
+            matriculas_ativas(aluno).filter(turma=OuterRef('turma_id'))
+        )
+    ).filter(id=recurso_id)
+
+
+def motivo_bloqueio(recurso, matriculado, hoje=None):
+    """Retorna o motivo pelo qual o aluno não pode acessar o recurso, ou None"""
+    hoje = hoje or date.today()
+    if not matriculado:
+        return MOTIVO_NAO_MATRICULADO
+    if recurso.draft:
+        return MOTIVO_DRAFT
+    if hoje < recurso.turma.data_inicio and not recurso.acesso_previo:
+        return MOTIVO_ANTES_INICIO
+    return None
@@ -0,0 +1,58 @@
+"""
+Perfil de produção para o SQLite.
+
+- WAL: leitores não bloqueiam o escritor e o escritor não bloqueia leitores.
+- PRAGMAs aplicados em toda conexão nova (``init_command``).
+- Transações ``BEGIN IMMEDIATE``: o lock de escrita é obtido no início da
+  transação, respeitando o busy_timeout, em vez de falhar com
+  "database is locked" ao tentar promover um lock de leitura.
+- Conexões persistentes (``CONN_MAX_AGE``) com health check.
+- Alias ``leitura`` com conexões somente leitura (``query_only``) no mesmo
+  arquivo, usado pelo ``LeituraEscritaRouter``.
+"""
+
+# Tempo máximo (s) esperando um lock antes de "database is locked"
+BUSY_TIMEOUT = 20
+
+PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    # Seguro com WAL: perde no máximo as últimas transações em queda de energia
+    'PRAGMA synchronous=NORMAL',
+    f'PRAGMA busy_timeout={BUSY_TIMEOUT * 1000}',
+    'PRAGMA mmap_size=268435456',  # 256MB
+    'PRAGMA cache_size=-65536',  # 64MB
+    'PRAGMA temp_store=MEMORY',
+]
+
+PRAGMAS_LEITURA = [
+    pragma for pragma in PRAGMAS if 'journal_mode' not in pragma
+] + ['PRAGMA query_only=ON']
+
+
+def sqlite_producao(caminho, conn_max_age=600):
+    """DATABASES com o perfil de produção para o arquivo ``caminho``"""
+    base = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': caminho,
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+    }
+    return {
+        'default': {
+            **base,
+            'OPTIONS': {
+                'timeout': BUSY_TIMEOUT,
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': ';'.join(PRAGMAS),
+            },
+        },
+        'leitura': {
+            **base,
+            'OPTIONS': {
+                'timeout': BUSY_TIMEOUT,
+                'init_command': ';'.join(PRAGMAS_LEITURA),
+            },
+            # Nos testes usa a mesma conexão do default
+            'TEST': {'MIRROR': 'default'},
+        },
+    }
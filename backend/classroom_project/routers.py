@@ -0,0 +1,26 @@
+from django.db import connections
+
+
+class LeituraEscritaRouter:
+    """
+    Envia leituras para o alias ``leitura`` (conexões somente leitura) e
+    escritas para ``default``. Dentro de uma transação no ``default`` as
+    leituras continuam nele, para enxergar o que ainda não foi commitado.
+    """
+    leitura = 'leitura'
+    escrita = 'default'
+
+    def db_for_read(self, model, **hints):
+        if connections[self.escrita].in_atomic_block:
+            return self.escrita
+        return self.leitura
+
+    def db_for_write(self, model, **hints):
+        return self.escrita
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Os dois aliases apontam para o mesmo arquivo
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == self.escrita
@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 
+from .database import sqlite_producao
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -48,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Métricas por rota e Server-Timing (ver classroom/metrics.py)
+    'classroom.metrics.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -88,6 +94,14 @@ DATABASES = {
     }
 }
 
+# Perfil de produção do SQLite (WAL, pragmas, conexões persistentes e
+# leituras em conexões somente leitura): CLASSROOM_DB_PROFILE=producao
+# Ver classroom_project/database.py
+DB_PROFILE = os.environ.get('CLASSROOM_DB_PROFILE', 'desenvolvimento')
+if DB_PROFILE == 'producao':
+    DATABASES = sqlite_producao(BASE_DIR / 'db.sqlite3')
+    DATABASE_ROUTERS = ['classroom_project.routers.LeituraEscritaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -140,19 +154,39 @@ CORS_ALLOW_CREDENTIALS = True
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'classroom.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'classroom.pagination.ClassroomPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # JSON com orjson, mesma saída do renderer padrão (ver classroom/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'classroom.renderers.OrjsonRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'classroom.renderers.OrjsonParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# MessagePack (Accept: application/msgpack) se o pacote msgpack estiver
+# instalado; JSON continua sendo o padrão
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append(
+        'classroom.renderers.MessagePackRenderer'
+    )
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append(
+        'classroom.renderers.MessagePackParser'
+    )
+
 # JWT Configuration
 from datetime import timedelta
 
@@ -164,11 +198,19 @@ SIMPLE_JWT = {
     'UPDATE_LAST_LOGIN': False,
     'ALGORITHM': 'HS256',
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Tokens com is_staff e aluno_id (ver classroom/authentication.py)
+    'TOKEN_OBTAIN_SERIALIZER': 'classroom.authentication.ClassroomTokenObtainPairSerializer',
+    # O refresh relê o usuário: desativado não renova, claims atualizadas
+    'TOKEN_REFRESH_SERIALIZER': 'classroom.authentication.ClassroomTokenRefreshSerializer',
     'AUTH_HEADER_NAME': 'HTTP_AUTHORIZATION',
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
 }
 
+# Com True o usuário/aluno do token é relido do banco a cada requisição
+# (desativação e perda de is_staff valem antes de o token expirar)
+JWT_VALIDACAO_ESTRITA = False
+
 # Media files (uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -177,9 +219,71 @@ MEDIA_ROOT = BASE_DIR / 'media'
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
-# Upload limits (50MB)
+# Cache
+# LocMemCache é por processo; em produção com vários workers use um
+# backend compartilhado (Redis/Memcached) para invalidação imediata.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache das decisões de acesso ao download (ver classroom/access_cache.py).
+# Com LocMemCache a invalidação não chega aos outros workers: um acesso
+# revogado pode valer até o timeout. Aumente só com backend compartilhado.
+RECURSO_ACESSO_CACHE_ALIAS = 'default'
+RECURSO_ACESSO_CACHE_TIMEOUT = 5
+
+# Cache de respostas do catálogo (ver classroom/response_cache.py)
+RESPOSTA_CACHE_ALIAS = 'default'
+RESPOSTA_CACHE_TIMEOUT = 3600
+
+# Cabeçalho Server-Timing nas respostas: expõe nº de queries e tempos a
+# qualquer cliente, use só em desenvolvimento. As métricas de
+# /api/_metrics são coletadas mesmo com False
+METRICAS_SERVER_TIMING = False
+
+# Listagens serializadas direto de .values(), sem instanciar models
+# (ver classroom/fastpath.py); False usa sempre os serializers
+LEITURA_RAPIDA = True
+
+# Linhas lidas do banco por lote nas exportações CSV/NDJSON
+# (ver classroom/exports.py)
+EXPORTACAO_LOTE = 2000
+
+# Pós-processamento dos arquivos de recursos (ver classroom/processing.py
+# e o comando processar_arquivos): threads do pool, tentativas por job e
+# segundos até um job em processamento voltar para a fila
+PROCESSAMENTO_WORKERS = 2
+PROCESSAMENTO_MAX_TENTATIVAS = 3
+PROCESSAMENTO_TIMEOUT = 600
+
+# Máximo de linhas por requisição de matrícula em lote
+MATRICULA_LOTE_MAX_LINHAS = 10000
+
+# Importação de alunos pela API (o comando importar_alunos não tem limite).
+# Na API o hash das senhas roda no próprio worker, uma a uma; importações
+# grandes devem usar o comando, que divide o hash entre processos.
+ALUNO_IMPORTACAO_MAX_LINHAS = 5000
+
+# Entrega de arquivos dos recursos (ver classroom/downloads.py)
+# 'django': streaming pelo próprio worker
+# 'x-accel': nginx via X-Accel-Redirect para RECURSO_DOWNLOAD_INTERNAL_URL
+# 'x-sendfile': Apache (mod_xsendfile) / lighttpd via X-Sendfile
+RECURSO_DOWNLOAD_MODE = 'django'
+RECURSO_DOWNLOAD_INTERNAL_URL = '/protected/'
+
+# Upload limits
+# Arquivos acima de 2.5MB vão para arquivo temporário em disco em vez de
+# ficarem na memória do worker. Arquivos grandes devem usar o upload em
+# partes de /api/uploads/ (ver classroom/uploads.py).
 DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800
-FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440
+
+# Upload em partes (resumível)
+RECURSO_UPLOAD_TEMP_DIR = BASE_DIR / 'uploads_tmp'
+RECURSO_UPLOAD_CHUNK_MAX_SIZE = 16 * 1024 * 1024  # 16MB por parte
+RECURSO_UPLOAD_MAX_SIZE = 5 * 1024 * 1024 * 1024  # 5GB por arquivo
 
 # Encoding UTF-8
 DEFAULT_CHARSET = 'utf-8'